@@ -0,0 +1,253 @@
+# library imports
+import numpy as np
+
+# project imports
+
+
+class AdjacencyIndex:
+    """
+    A compressed-sparse-row (CSR) index of one layer of the graph.
+    The out-neighbors of node i are targets[offsets[i]:offsets[i] + degrees[i]], slots of a row beyond its degree
+    are tombstones of removed edges until the index is compacted
+    """
+
+    # CONSTS #
+    # compact the index once this portion of its slots are tombstones
+    COMPACT_FRACTION = 0.25
+    # the arrays that hold the whole state of the index
+    STATE_FIELDS = ["offsets", "targets", "degrees"]
+    # END - CONSTS #
+
+    def __init__(self,
+                 offsets: np.ndarray,
+                 targets: np.ndarray,
+                 degrees: np.ndarray = None):
+        self.offsets = offsets
+        self.targets = targets
+        self.degrees = degrees if degrees is not None else np.diff(offsets).astype(np.int32)
+        # per-edge values aligned with the slots of the targets array (e.g., cached edge weights), by name.
+        # They move with their edges on removals and compaction
+        self.edge_columns = {}
+        # the in-neighbors index, built on the first removal
+        self._reverse = None
+
+    @staticmethod
+    def from_arrays(sources: np.ndarray,
+                    targets: np.ndarray,
+                    node_count: int):
+        """
+        Build the index from two aligned arrays of the edges' end points in a single vectorized pass.
+        The order of the edges of each node is kept
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if sources.shape != targets.shape:
+            raise ValueError("AdjacencyIndex.from_arrays: sources and targets must have the same shape")
+        if sources.size > 0 and (min(sources.min(), targets.min()) < 0 or max(sources.max(), targets.max()) >= node_count):
+            raise ValueError("AdjacencyIndex.from_arrays: edge end points must be node ids in [0, {})".format(node_count))
+        order = np.argsort(sources, kind="stable")
+        degrees = np.bincount(sources, minlength=node_count).astype(np.int32)
+        offsets = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(degrees, out=offsets[1:])
+        return AdjacencyIndex(offsets=offsets,
+                              targets=targets[order].astype(np.int32),
+                              degrees=degrees)
+
+    @staticmethod
+    def from_state(arrays: dict):
+        """
+        Rebuild an index from its STATE_FIELDS arrays (e.g., loaded from a snapshot)
+        """
+        return AdjacencyIndex(offsets=arrays["offsets"],
+                              targets=arrays["targets"],
+                              degrees=arrays["degrees"])
+
+    @staticmethod
+    def from_edges(edges: list,
+                   node_count: int):
+        """
+        Build the index from a list of Edge objects
+        """
+        return AdjacencyIndex.from_arrays(sources=np.fromiter((edge.s_id for edge in edges), dtype=np.int64, count=len(edges)),
+                                          targets=np.fromiter((edge.t_id for edge in edges), dtype=np.int64, count=len(edges)),
+                                          node_count=node_count)
+
+    def get_size(self) -> int:
+        return self.degrees.shape[0]
+
+    def get_edge_count(self) -> int:
+        return int(self.degrees.sum())
+
+    def neighbors(self,
+                  id: int) -> np.ndarray:
+        """
+        The out-neighbors of a node as a slice of the targets array (no copy)
+        """
+        start = self.offsets[id]
+        return self.targets[start:start + self.degrees[id]]
+
+    def gather_neighbors(self,
+                         ids: np.ndarray) -> np.ndarray:
+        """
+        The out-neighbors of all the given nodes, one node after the other
+        """
+        return self.targets[self.row_slots(ids=ids)]
+
+    def row_slots(self,
+                  ids: np.ndarray) -> np.ndarray:
+        """
+        The slots of the targets array that hold the out-edges of the given nodes, one node after the other
+        """
+        degrees = self.degrees[ids].astype(np.int64)
+        # the position of each edge in the answer, shifted to its slot in the targets array
+        row_starts = np.cumsum(degrees) - degrees
+        return np.repeat(self.offsets[ids] - row_starts, degrees) + np.arange(degrees.sum())
+
+    def sample_neighbors(self,
+                         ids: np.ndarray,
+                         uniforms: np.ndarray) -> tuple:
+        """
+        Pick one out-neighbor for each of the given nodes using the given U(0, 1) samples.
+        Return the picked ids and a mask of the nodes that have any neighbor at all (the others pick themselves)
+        """
+        degrees = self.degrees[ids]
+        has_neighbors = degrees > 0
+        picked = np.array(ids, dtype=np.int64, copy=True)
+        positions = self.offsets[ids[has_neighbors]] + (uniforms[has_neighbors] * degrees[has_neighbors]).astype(np.int64)
+        picked[has_neighbors] = self.targets[positions]
+        return picked, has_neighbors
+
+    def neighbor_sum(self,
+                     values: np.ndarray) -> np.ndarray:
+        """
+        The sum of the values of the out-neighbors of each node
+        """
+        values = np.asarray(values, dtype=np.float64)
+        sources, targets = self.live_edges()
+        answer = np.zeros(values.shape, dtype=np.float64)
+        np.add.at(answer, sources, values[targets])
+        return answer
+
+    def live_edges(self) -> tuple:
+        """
+        The (sources, targets) arrays of the edges of the index, without the tombstones
+        """
+        sources = np.repeat(np.arange(self.get_size(), dtype=np.int32), self.degrees)
+        return sources, self.targets[self.live_slots()]
+
+    def live_slots(self):
+        """
+        The slots of the targets array that hold the edges, in the order of live_edges
+        """
+        if self.get_tombstones_count() == 0:
+            return slice(0, self.offsets[-1])
+        slot_rows = np.repeat(np.arange(self.get_size()), np.diff(self.offsets))
+        return np.flatnonzero(np.arange(self.offsets[-1]) - self.offsets[slot_rows] < self.degrees[slot_rows])
+
+    def set_edge_column(self,
+                        name: str,
+                        values: np.ndarray):
+        """
+        Keep a value per edge (given in the order of live_edges) aligned with the edges from now on
+        """
+        column = np.zeros(self.targets.shape[0], dtype=values.dtype)
+        column[self.live_slots()] = values
+        self.edge_columns[name] = column
+
+    def get_edge_column(self,
+                        name: str) -> np.ndarray:
+        """
+        The values of a per-edge column in the order of live_edges, None if it was not set
+        """
+        if name not in self.edge_columns:
+            return None
+        return self.edge_columns[name][self.live_slots()]
+
+    def neighbor_edge_values(self,
+                             name: str,
+                             id: int) -> np.ndarray:
+        """
+        The values of a per-edge column of the out-edges of a node, aligned with neighbors(id) (no copy)
+        """
+        start = self.offsets[id]
+        return self.edge_columns[name][start:start + self.degrees[id]]
+
+    def get_tombstones_count(self) -> int:
+        return int(self.offsets[-1]) - self.get_edge_count()
+
+    def get_reverse(self):
+        """
+        The index of the in-neighbors of each node
+        """
+        if self._reverse is None:
+            sources, targets = self.live_edges()
+            self._reverse = AdjacencyIndex.from_arrays(sources=targets,
+                                                       targets=sources,
+                                                       node_count=self.get_size())
+        return self._reverse
+
+    def add_nodes(self,
+                  count: int):
+        """
+        Append rows without edges for new nodes
+        """
+        self.offsets = np.append(self.offsets, np.full(count, self.offsets[-1], dtype=np.int64))
+        self.degrees = np.append(self.degrees, np.zeros(count, dtype=np.int32))
+        if self._reverse is not None:
+            self._reverse.add_nodes(count=count)
+
+    def remove_node(self,
+                    id: int):
+        """
+        Remove all the edges into and out of a node, in time that depends only on the degrees around it
+        """
+        reverse = self.get_reverse()
+        for source in np.unique(reverse.neighbors(id=id)):
+            self._remove_target(row=source,
+                                target=id)
+        for target in np.unique(self.neighbors(id=id)):
+            reverse._remove_target(row=target,
+                                   target=id)
+        self.degrees[id] = 0
+        reverse.degrees[id] = 0
+
+    def _remove_target(self,
+                       row: int,
+                       target: int):
+        """
+        Drop a target from a row, keeping the order of the others and leaving tombstones at the end of the row
+        """
+        row_targets = self.neighbors(id=row)
+        kept = row_targets != target
+        keep = row_targets[kept]
+        row_targets[:keep.shape[0]] = keep
+        for name in self.edge_columns:
+            row_values = self.neighbor_edge_values(name=name,
+                                                   id=row)
+            row_values[:keep.shape[0]] = row_values[kept]
+        self.degrees[row] = keep.shape[0]
+
+    def compact(self,
+                force: bool = False):
+        """
+        Move the live slots together once there are enough tombstones. Done in place, so views of the arrays
+        (e.g., in shared memory) stay valid - the slots after offsets[-1] are unused capacity
+        """
+        tombstones = self.get_tombstones_count()
+        if tombstones == 0 or (not force and tombstones < AdjacencyIndex.COMPACT_FRACTION * self.offsets[-1]):
+            return
+        slots = self.live_slots()
+        targets = self.targets[slots]
+        self.targets[:targets.shape[0]] = targets
+        for column in self.edge_columns.values():
+            column[:targets.shape[0]] = column[slots]
+        np.cumsum(self.degrees, out=self.offsets[1:])
+        if self._reverse is not None:
+            self._reverse.compact(force=force)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<AdjacencyIndex: V={}, E={}>".format(self.get_size(),
+                                                     self.get_edge_count())
@@ -0,0 +1,104 @@
+# library imports
+import numpy as np
+
+# project imports
+from epidemiological_simulator.population import Population
+
+
+class Broadcasters:
+    """
+    Virtual sources of ideas (e.g., the bots of a disinformation campaign) kept out of the graph: each one has a fixed
+    idea vector and the array of its target agents, in CSR form - the targets of broadcaster b are
+    targets[offsets[b]:offsets[b + 1]].
+    In the social step a broadcaster is one more neighbor of each of its live targets, with a full personality
+    similarity (as the per-agent logic treats virtual agents), so it takes neither a node and an edge per target nor
+    any personality similarity work
+    """
+
+    # CONSTS #
+    # the arrays that hold the whole state of the broadcasters
+    STATE_FIELDS = ["ideas", "offsets", "targets"]
+    # END - CONSTS #
+
+    def __init__(self,
+                 ideas: np.ndarray = None,
+                 offsets: np.ndarray = None,
+                 targets: np.ndarray = None):
+        self.ideas = ideas if ideas is not None else np.zeros((0, Population.IDEAS_SIZE), dtype=np.float64)
+        self.offsets = offsets if offsets is not None else np.zeros(1, dtype=np.int64)
+        self.targets = targets if targets is not None else np.zeros(0, dtype=np.int32)
+        # the broadcaster of each target slot and the broadcasters of each agent, built on first use
+        self._sources = None
+        self._reverse = None
+
+    @staticmethod
+    def from_state(arrays: dict):
+        """
+        Rebuild the broadcasters from their STATE_FIELDS arrays (e.g., loaded from a snapshot)
+        """
+        return Broadcasters(ideas=arrays["ideas"],
+                            offsets=arrays["offsets"],
+                            targets=arrays["targets"])
+
+    def get_state_arrays(self) -> dict:
+        return {name: getattr(self, name) for name in Broadcasters.STATE_FIELDS}
+
+    def add(self,
+            ideas,
+            targets) -> int:
+        """
+        Add a broadcaster of the given ideas to the given agents (ids or a boolean mask over the agents) and return its id
+        """
+        targets = np.asarray(targets)
+        if targets.dtype == np.bool_:
+            targets = np.flatnonzero(targets)
+        self.ideas = np.vstack((self.ideas, np.asarray(ideas, dtype=np.float64).reshape(1, Population.IDEAS_SIZE)))
+        self.targets = np.concatenate((self.targets, targets.astype(np.int32)))
+        self.offsets = np.append(self.offsets, self.targets.shape[0])
+        self._sources = None
+        self._reverse = None
+        return self.get_count() - 1
+
+    def get_count(self) -> int:
+        return self.ideas.shape[0]
+
+    def get_pairs_count(self) -> int:
+        return self.targets.shape[0]
+
+    def pairs(self) -> tuple:
+        """
+        The (broadcasters, agents) arrays of all the (broadcaster, target) pairs
+        """
+        if self._sources is None:
+            self._sources = np.repeat(np.arange(self.get_count(), dtype=np.int32), np.diff(self.offsets))
+        return self._sources, self.targets
+
+    def of(self,
+           id: int) -> np.ndarray:
+        """
+        The broadcasters that target the agent
+        """
+        if self._reverse is None:
+            sources, targets = self.pairs()
+            order = np.argsort(targets, kind="stable")
+            self._reverse = (targets[order], sources[order])
+        targets, sources = self._reverse
+        return sources[np.searchsorted(targets, id, side="left"):np.searchsorted(targets, id, side="right")]
+
+    def tile(self,
+             replicas: int,
+             node_count: int):
+        """
+        The broadcasters of R replicas of the population (agent i of replica r is r * node_count + i), each one targets
+        its agents in all the replicas
+        """
+        return Broadcasters(ideas=self.ideas.copy(),
+                            offsets=self.offsets * replicas,
+                            targets=(np.arange(replicas, dtype=np.int64)[None, :] * node_count + self.targets[:, None]).ravel())
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<Broadcasters: {} broadcasters, {} targets>".format(self.get_count(),
+                                                                   self.get_pairs_count())
@@ -0,0 +1,161 @@
+# library imports
+import numpy as np
+
+# project imports
+from epidemiological_simulator.sweep import Sweep, ResultStore
+
+
+class ExperimentDesign:
+    """
+    Space-filling designs of sensitivity analysis points: each design is a list of parameter dicts over the given
+    bounds {name: (low, high)}, a parameter with integer bounds (e.g., edge counts) gets integer values.
+    The points can go to a Sweep (see Sweep.grid's parameters) or to a SequentialReplication
+    """
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def latin_hypercube(bounds: dict,
+                        count: int,
+                        seed: int = None) -> list:
+        """
+        A Latin hypercube: each parameter's range is split into count equal strata and each stratum has exactly one point
+        """
+        rng = np.random.default_rng(seed)
+        unit = (np.stack([rng.permutation(count) for _ in bounds], axis=1) + rng.random((count, len(bounds)))) / count
+        return ExperimentDesign.scale(unit=unit,
+                                      bounds=bounds)
+
+    @staticmethod
+    def sobol(bounds: dict,
+              count: int,
+              seed: int = None) -> list:
+        """
+        A scrambled Sobol sequence, low-discrepancy over the whole space (count should be a power of 2)
+        """
+        # scipy is needed only for this design
+        from scipy.stats import qmc
+        return ExperimentDesign.scale(unit=qmc.Sobol(d=len(bounds), scramble=True, seed=seed).random(count),
+                                      bounds=bounds)
+
+    @staticmethod
+    def scale(unit: np.ndarray,
+              bounds: dict) -> list:
+        """
+        Map points of the unit cube to parameter dicts
+        """
+        columns = {}
+        for column, (name, (low, high)) in enumerate(bounds.items()):
+            if isinstance(low, (int, np.integer)) and isinstance(high, (int, np.integer)):
+                values = np.minimum(np.floor(low + unit[:, column] * (high - low + 1)), high).astype(np.int64)
+            else:
+                values = low + unit[:, column] * (high - low)
+            columns[name] = values.tolist()
+        return [{name: columns[name][index] for name in bounds} for index in range(unit.shape[0])]
+
+
+class SequentialReplication:
+    """
+    Run each point of a design again and again (seeds 0, 1, 2, ...) until the standard error of its results falls below
+    a target, instead of a fixed number of repeats per point. All the points that need more runs are run together in
+    rounds (in parallel, see Sweep.run) and all the results go to a ResultStore, so a rerun only runs what is missing
+    """
+
+    # CONSTS #
+    MIN_REPLICATIONS = 3
+    MAX_REPLICATIONS = 50
+    # END - CONSTS #
+
+    def __init__(self,
+                 sim_generator_function,
+                 sim_info_extraction_function,
+                 target_standard_error: float,
+                 min_replications: int = MIN_REPLICATIONS,
+                 max_replications: int = MAX_REPLICATIONS,
+                 batch_size: int = None,
+                 fixed: dict = None,
+                 stop_early: bool = False):
+        self.sim_generator_function = sim_generator_function
+        self.sim_info_extraction_function = sim_info_extraction_function
+        self.target_standard_error = target_standard_error
+        self.min_replications = max(2, min_replications)
+        self.max_replications = max_replications
+        # the number of runs a point that is not done yet gets in each round, the minimum by default
+        self.batch_size = batch_size if batch_size is not None else self.min_replications
+        self.fixed = fixed or {}
+        self.stop_early = stop_early
+
+    def run(self,
+            points: list,
+            store: ResultStore,
+            workers: int = None,
+            progress: bool = True) -> list:
+        """
+        Replicate each of the points (parameter dicts) until it is done. Return a summary per point: its parameters,
+        the mean and standard error of its results and the number of runs
+        """
+        points = [dict(self.fixed, **parameters) for parameters in points]
+        replications = [0] * len(points)
+        while True:
+            summaries = [self.summary(parameters=parameters,
+                                      replications=replications[index],
+                                      store=store) for index, parameters in enumerate(points)]
+            next_points = []
+            for index, parameters in enumerate(points):
+                more = self.more_replications(summary=summaries[index])
+                next_points.extend((parameters, seed) for seed in range(replications[index], replications[index] + more))
+                replications[index] += more
+            if len(next_points) == 0:
+                return summaries
+            if progress:
+                print("SequentialReplication: {} runs for {}/{} points".format(len(next_points),
+                                                                               sum(self.more_replications(summary=summary) > 0 for summary in summaries),
+                                                                               len(points)))
+            self.sweep(points=next_points).run(store=store,
+                                               workers=workers,
+                                               progress=progress)
+
+    def more_replications(self,
+                          summary: dict) -> int:
+        """
+        The stopping rule: the number of extra runs a point needs, 0 once it is done
+        """
+        count = summary["replications"]
+        if count < self.min_replications:
+            return self.min_replications - count
+        if count >= self.max_replications or summary["standard_error"] <= self.target_standard_error:
+            return 0
+        return min(self.batch_size, self.max_replications - count)
+
+    def summary(self,
+                parameters: dict,
+                replications: int,
+                store: ResultStore) -> dict:
+        """
+        The mean and the standard error of the results of the first replications of a point (NaN results, e.g., a
+        mean R0 of a run with a single day, are not counted)
+        """
+        values = np.asarray(self.sweep(points=[(parameters, seed) for seed in range(replications)]).values(store=store,
+                                                                                                          parameters=parameters),
+                            dtype=np.float64)
+        values = values[np.isfinite(values)]
+        return {"parameters": parameters,
+                "mean": float(values.mean()) if values.shape[0] > 0 else np.nan,
+                "standard_error": float(values.std(ddof=1) / np.sqrt(values.shape[0])) if values.shape[0] > 1 else np.inf,
+                "replications": replications}
+
+    def sweep(self,
+              points: list) -> Sweep:
+        return Sweep(sim_generator_function=self.sim_generator_function,
+                     sim_info_extraction_function=self.sim_info_extraction_function,
+                     points=points,
+                     stop_early=self.stop_early)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<SequentialReplication: SE <= {}, {}-{} runs>".format(self.target_standard_error,
+                                                                      self.min_replications,
+                                                                      self.max_replications)
@@ -21,6 +21,9 @@ class Edge:
                     t_id=self.t_id,
                     w=self.w)
 
+    def __eq__(self, other):
+        return isinstance(other, Edge) and self.s_id == other.s_id and self.t_id == other.t_id
+
     def __hash__(self):
         return (self.s_id, self.t_id).__hash__()
 
@@ -0,0 +1,171 @@
+# library imports
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import numpy as np
+
+# project imports
+from epidemiological_simulator.adjacency import AdjacencyIndex
+
+
+class EdgeListLoader:
+    """
+    Load edge-list files (SNAP-style "source target" lines or Matrix Market coordinate files, optionally gzipped)
+    into an AdjacencyIndex. The first load parses the file in bulk and writes a binary CSR cache keyed by the file's
+    content hash, later loads memory-map the cache
+    """
+
+    # CONSTS #
+    # bump when the cache layout changes, older caches are then ignored
+    FORMAT_VERSION = 1
+    CACHE_FOLDER_NAME = ".edge_cache"
+    HASH_BLOCK_SIZE = 2 ** 20
+    COMMENT_CHARS = b"#%"
+    MATRIX_MARKET_HEADER = b"%%MatrixMarket"
+    # END - CONSTS #
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def load(path: str,
+             cache_folder: str = None,
+             use_cache: bool = True) -> AdjacencyIndex:
+        """
+        The adjacency index of the file's edges. The index's arrays are copy-on-write memory maps of the cache, so
+        removals during a simulation never change the cache
+        """
+        if not use_cache:
+            sources, targets, node_count = EdgeListLoader.parse(path=path)
+            return AdjacencyIndex.from_arrays(sources=sources,
+                                              targets=targets,
+                                              node_count=node_count)
+        cache_path = EdgeListLoader.cache_path(path=path,
+                                               cache_folder=cache_folder)
+        if not os.path.exists(os.path.join(cache_path, "manifest.json")):
+            sources, targets, node_count = EdgeListLoader.parse(path=path)
+            EdgeListLoader.write_cache(cache_path=cache_path,
+                                       index=AdjacencyIndex.from_arrays(sources=sources,
+                                                                        targets=targets,
+                                                                        node_count=node_count),
+                                       source_path=path)
+        return AdjacencyIndex(offsets=np.load(os.path.join(cache_path, "offsets.npy"), mmap_mode="c"),
+                              targets=np.load(os.path.join(cache_path, "targets.npy"), mmap_mode="c"))
+
+    @staticmethod
+    def parse(path: str) -> tuple:
+        """
+        Parse the whole file at once, return the (sources, targets) arrays and the number of nodes
+        """
+        data = EdgeListLoader.read(path=path)
+        if data.startswith(EdgeListLoader.MATRIX_MARKET_HEADER):
+            return EdgeListLoader.parse_matrix_market(data=data)
+        values = EdgeListLoader.parse_numbers(data=EdgeListLoader.skip_comments(data=data))
+        if values.shape[0] == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), 0
+        # extra columns (e.g., weights) are ignored
+        sources, targets = values[:, 0], values[:, 1]
+        return sources, targets, int(max(sources.max(), targets.max())) + 1
+
+    @staticmethod
+    def parse_matrix_market(data: bytes) -> tuple:
+        """
+        A coordinate Matrix Market file: 1-based entries, symmetric files list each undirected edge once
+        """
+        symmetric = b"symmetric" in data[:data.find(b"\n")].lower()
+        body = EdgeListLoader.skip_comments(data=data)
+        end_of_size_line = body.find(b"\n")
+        rows, columns, entries = [int(value) for value in body[:end_of_size_line if end_of_size_line >= 0 else len(body)].split()[:3]]
+        values = EdgeListLoader.parse_numbers(data=body[end_of_size_line + 1:] if end_of_size_line >= 0 else b"")
+        if values.shape[0] != entries:
+            raise ValueError("EdgeListLoader.parse_matrix_market: expected {} entries, found {}".format(entries, values.shape[0]))
+        sources = values[:, 0] - 1 if entries > 0 else np.zeros(0, dtype=np.int64)
+        targets = values[:, 1] - 1 if entries > 0 else np.zeros(0, dtype=np.int64)
+        if symmetric:
+            off_diagonal = sources != targets
+            sources, targets = np.concatenate((sources, targets[off_diagonal])), np.concatenate((targets, sources[off_diagonal]))
+        return sources, targets, max(rows, columns)
+
+    @staticmethod
+    def read(path: str) -> bytes:
+        with open(path, "rb") as data_file:
+            is_gzip = data_file.read(2) == b"\x1f\x8b"
+        with (gzip.open(path, "rb") if is_gzip else open(path, "rb")) as data_file:
+            return data_file.read()
+
+    @staticmethod
+    def skip_comments(data: bytes) -> bytes:
+        """
+        Drop the comment (and empty) lines at the head of the file
+        """
+        start = 0
+        while start < len(data) and (data[start:start + 1] in (b"\n", b"\r") or data[start] in EdgeListLoader.COMMENT_CHARS):
+            end = data.find(b"\n", start)
+            start = len(data) if end < 0 else end + 1
+        return data[start:]
+
+    @staticmethod
+    def parse_numbers(data: bytes) -> np.ndarray:
+        """
+        All the whitespace separated integers of the data as a (lines, columns) array, in a single bulk conversion
+        """
+        first_line = data[:data.find(b"\n")] if data.find(b"\n") >= 0 else data
+        columns = len(first_line.split())
+        # parsed in C without a Python object per token, as floats so weight columns parse as well
+        values = np.fromstring(data, dtype=np.float64, sep=" ")
+        if columns == 0 or values.shape[0] == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+        if values.shape[0] % columns != 0:
+            raise ValueError("EdgeListLoader.parse_numbers: all the lines must have {} columns".format(columns))
+        return values.reshape(-1, columns)[:, :2].astype(np.int64)
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as data_file:
+            for block in iter(lambda: data_file.read(EdgeListLoader.HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def cache_path(path: str,
+                   cache_folder: str = None) -> str:
+        """
+        The cache of a file is a folder named by its content hash and the format version
+        """
+        if cache_folder is None:
+            cache_folder = os.path.join(os.path.dirname(os.path.abspath(path)), EdgeListLoader.CACHE_FOLDER_NAME)
+        return os.path.join(cache_folder, "{}-v{}".format(EdgeListLoader.file_hash(path=path),
+                                                          EdgeListLoader.FORMAT_VERSION))
+
+    @staticmethod
+    def write_cache(cache_path: str,
+                    index: AdjacencyIndex,
+                    source_path: str):
+        """
+        Write the CSR arrays and a manifest into a temporary folder and move it into place, so a crash never leaves
+        a partial cache behind
+        """
+        temp_path = "{}.tmp{}".format(cache_path, os.getpid())
+        os.makedirs(temp_path, exist_ok=True)
+        np.save(os.path.join(temp_path, "offsets.npy"), index.offsets)
+        np.save(os.path.join(temp_path, "targets.npy"), index.targets)
+        with open(os.path.join(temp_path, "manifest.json"), "w") as manifest_file:
+            json.dump({"version": EdgeListLoader.FORMAT_VERSION,
+                       "source": os.path.basename(source_path),
+                       "node_count": index.get_size(),
+                       "edge_count": index.get_edge_count()},
+                      manifest_file)
+        try:
+            os.rename(temp_path, cache_path)
+        except OSError:
+            # another process wrote the same cache first
+            shutil.rmtree(temp_path, ignore_errors=True)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<EdgeListLoader>"
@@ -0,0 +1,137 @@
+# library imports
+import numpy as np
+import concurrent.futures
+
+# project imports
+from epidemiological_simulator.epidemiological_state import EpidemiologicalState
+
+
+class Engine:
+    """
+    An abstract class for the way a simulation step is computed.
+    The default runs the simulator's per-agent logic, one agent at a time
+    """
+
+    # CONSTS #
+    NAME = "python"
+    # END - CONSTS #
+
+    def __init__(self):
+        pass
+
+    def epidemiological(self,
+                        sim) -> list:
+        """
+        Run the epidemiological step of all the agents, return the ids of the agents that died in this step
+        """
+        if sim.recorder is not None:
+            population = sim.graph.population
+            real = population.real_mask()
+            # each susceptible agent reads the neighbor it picked
+            Engine.count_work(sim=sim,
+                              phase="epidemiological",
+                              agents=np.count_nonzero(real),
+                              edges=np.count_nonzero(real & (population.e_state == EpidemiologicalState.S)))
+        deads_ids = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=sim.WORKERS) as executor:
+            future_to_url = [executor.submit(sim.epidemiological_single, agent) for agent in sim.graph.nodes if not agent.is_virtual]
+            for future in concurrent.futures.as_completed(future_to_url):
+                feture_result = future.result()
+                if feture_result[0]:
+                    deads_ids.append(feture_result[1])
+        return deads_ids
+
+    def social(self,
+               sim):
+        """
+        Run the social step of all the agents
+        """
+        new_ideas = {}
+        # cache the personality similarities of the edges before the threads read them
+        sim.graph.socio_personality(personality_reject=sim.params.personality_reject)
+        if sim.recorder is not None:
+            real = sim.graph.population.real_mask()
+            Engine.count_work(sim=sim,
+                              phase="social",
+                              agents=np.count_nonzero(real),
+                              edges=sim.graph.get_socio_index().degrees[real].sum() + Engine.broadcast_pairs_count(sim=sim))
+        # compute the new ideas vectors
+        with concurrent.futures.ThreadPoolExecutor(max_workers=sim.WORKERS) as executor:
+            future_to_url = [executor.submit(sim.social_single, agent) for agent in sim.graph.nodes if not agent.is_virtual]
+            for future in concurrent.futures.as_completed(future_to_url):
+                feture_result = future.result()
+                new_ideas[feture_result[0]] = feture_result[1]
+
+        # allocate them back only here to avoid miss compute in the previous loop
+        population = sim.graph.population
+        real = population.real_mask()
+        ideas = population.ideas.copy()
+        for agent_id, agent_ideas in new_ideas.items():
+            ideas[agent_id] = agent_ideas
+        population.ideas[real] = np.clip(ideas[real], 0, 1)
+        # check the status of the PIP of this agent
+        population.update_pips_from_ideas(mask=real)
+
+    @staticmethod
+    def count_work(sim,
+                   phase: str,
+                   agents: int,
+                   edges: int):
+        """
+        Add the agents touched and the edges scanned by a phase of the step to the simulator's recorder, callers check
+        that it records (see StepRecorder)
+        """
+        sim.recorder.count(name="{}.agents".format(phase),
+                           value=agents)
+        sim.recorder.count(name="{}.edges".format(phase),
+                           value=edges)
+
+    @staticmethod
+    def broadcast_pairs_count(sim) -> int:
+        """
+        The number of (broadcaster, target) pairs the social step scans (see Broadcasters)
+        """
+        return sim.graph.broadcasters.get_pairs_count() if sim.graph.broadcasters is not None else 0
+
+    def is_social_converged(self,
+                            sim) -> bool:
+        """
+        True when the engine knows the social step would not change any agent's ideas, so it can be skipped
+        """
+        return False
+
+    def sync(self,
+             sim):
+        """
+        Write the population columns the engine keeps up to date lazily (e.g., timers) into the population store
+        """
+        pass
+
+    def reset(self):
+        """
+        Drop what the engine keeps about the population (it is rebuilt from the population store on the next step),
+        e.g., after the simulator advanced the population by itself
+        """
+        pass
+
+    def get_state_arrays(self) -> dict:
+        """
+        The arrays of the engine's own state (e.g., random streams) needed to resume a simulation, by name
+        """
+        return {}
+
+    def set_state_arrays(self,
+                         arrays: dict):
+        pass
+
+    def close(self):
+        """
+        Free the resources held by the engine, if any
+        """
+        pass
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<Engine: {}>".format(self.NAME)
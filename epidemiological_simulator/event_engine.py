@@ -0,0 +1,206 @@
+# library imports
+import numpy as np
+
+# project imports
+from epidemiological_simulator.params import SimulationParameters
+from epidemiological_simulator.vectorized_engine import VectorizedEngine
+from epidemiological_simulator.epidemiological_state import EpidemiologicalState
+
+
+class TimerWheel:
+    """
+    A calendar queue of agent ids by the day they are due: a ring of buckets, one per day of the horizon.
+    Every event must be due less than a horizon after the current day
+    """
+
+    def __init__(self,
+                 horizon: int):
+        self.horizon = horizon
+        self.buckets = [[] for _ in range(horizon)]
+
+    def schedule(self,
+                 ids: np.ndarray,
+                 days: np.ndarray):
+        """
+        File each of the agents in the bucket of its due day
+        """
+        if ids.shape[0] == 0:
+            return
+        if (days == days[0]).all():
+            self.buckets[int(days[0]) % self.horizon].append(ids)
+            return
+        order = np.argsort(days, kind="stable")
+        ids = ids[order]
+        days = days[order]
+        starts = np.flatnonzero(np.concatenate(([True], days[1:] != days[:-1])))
+        for start, end in zip(starts, np.append(starts[1:], days.shape[0])):
+            self.buckets[int(days[start]) % self.horizon].append(ids[start:end])
+
+    def pop(self,
+            day: int) -> np.ndarray:
+        """
+        Take out all the agents filed for the given day
+        """
+        bucket = self.buckets[day % self.horizon]
+        self.buckets[day % self.horizon] = []
+        if len(bucket) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(bucket)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<TimerWheel: {} days, {} events>".format(self.horizon,
+                                                        sum(ids.shape[0] for bucket in self.buckets for ids in bucket))
+
+
+class EventEngine(VectorizedEngine):
+    """
+    The vectorized engine with the timed transitions scheduled as events. All the states but S are left only once the
+    agent's timer reaches a threshold, so on entering such a state the day the agent leaves it is filed in a timer wheel,
+    and each day only the agents that are due (and the susceptible ones) are touched instead of ticking and checking
+    every agent.
+    The timers are kept as the day each agent's timer was zero and written to the population store only for the
+    touched agents and in sync() (e.g., before a snapshot). The random draws are made in the same order as the
+    vectorized engine, so both give the same run for the same seed
+    """
+
+    # CONSTS #
+    NAME = "events"
+    # the timer threshold of each timed state, by the name of its parameter
+    THRESHOLDS = {EpidemiologicalState.E: "phi",
+                  EpidemiologicalState.Ia: "gamma_a",
+                  EpidemiologicalState.Is: "gamma_s",
+                  EpidemiologicalState.Rf: "chi_f",
+                  EpidemiologicalState.Rp: "chi_p"}
+    # END - CONSTS #
+
+    def __init__(self):
+        VectorizedEngine.__init__(self)
+        self.population = None
+        self.params = None
+        self.wheel = None
+        # the step at which each agent's timer was zero (its timer on step t is t - zero_step) and its due step
+        self.zero_step = None
+        self.due_step = None
+        # the last step this engine ran
+        self.last_step = None
+
+    def prepare(self,
+                sim):
+        """
+        (Re)build the schedule from the population's timers if the population, its size or the parameters changed or
+        the simulator's steps did not run here
+        """
+        population = sim.graph.population
+        if self.population is population and self.params is sim.params and self.last_step == sim.step - 1 and \
+                self.zero_step.shape[0] == population.get_size():
+            return
+        self.sync(sim=sim)
+        step = sim.step
+        real = population.real_mask()
+        timer = population.timer.astype(np.int64)
+        self.population = population
+        self.params = sim.params
+        self.wheel = TimerWheel(horizon=max(max(getattr(sim.params, name) for name in EventEngine.THRESHOLDS.values()), 1) + 1)
+        # the timers tic at the beginning of each step, so a timer of k now is k + 1 on this step
+        self.zero_step = step - 1 - timer
+        self.due_step = np.full(population.get_size(), -1, dtype=np.int64)
+        for state, name in EventEngine.THRESHOLDS.items():
+            ids = np.flatnonzero(real & (population.e_state == state))
+            self.due_step[ids] = step + np.maximum(getattr(sim.params, name) - timer[ids] - 1, 0)
+            self.wheel.schedule(ids=ids,
+                                days=self.due_step[ids])
+        self.last_step = step - 1
+
+    def sync(self,
+             sim):
+        if self.population is not None and self.population is sim.graph.population:
+            real = self.population.real_mask()
+            self.population.timer[real] = self.last_step - self.zero_step[real]
+
+    def reset(self):
+        self.population = None
+
+    def epidemiological(self,
+                        sim) -> list:
+        self.prepare(sim=sim)
+        population = sim.graph.population
+        rng = sim.rng
+        params = sim.params
+        step = sim.step
+        self.last_step = step
+        e_state = population.e_state
+
+        # the agents whose timed transition is due today, by increasing id (as the vectorized engine draws them)
+        due = self.wheel.pop(day=step)
+        due = np.sort(due[self.due_step[due] == step])
+        due_state = e_state[due]
+
+        # S -> E (or another vaccine dose)
+        s_ids = self.susceptible_ids(sim=sim)
+        population.timer[s_ids] = step - self.zero_step[s_ids]
+        infected, vaccinate = self.infection(population=population,
+                                             e_state=e_state,
+                                             s_ids=s_ids,
+                                             picked=sim.graph.get_epi_index().sample_neighbors(ids=s_ids,
+                                                                                               uniforms=rng.random(s_ids.size))[0],
+                                             infect_chance=rng.random(s_ids.size),
+                                             params=params)
+        vaccinate_ids = s_ids[vaccinate]
+        population.vaccine_count[vaccinate_ids] += 1
+        population.last_vaccinated_time[vaccinate_ids] = population.timer[vaccinate_ids]
+        if sim.recorder is not None:
+            VectorizedEngine.count_work(sim=sim,
+                                        phase="epidemiological",
+                                        agents=due.size + s_ids.size,
+                                        edges=s_ids.size)
+
+        # the transitions of the due agents, decided on the states of the beginning of the day
+        e_ids = due[due_state == EpidemiologicalState.E]
+        to_is = rng.random(e_ids.size) < params.eta
+        is_ids = due[due_state == EpidemiologicalState.Is]
+        chance = rng.random(is_ids.size)
+        to_d = (params.psi_2 < chance) & (chance <= params.psi_3)
+        to_rp = (params.psi_1 < chance) & (chance <= params.psi_2)
+        self.enter(population=population, params=params, step=step, ids=s_ids[infected], new_e_state=EpidemiologicalState.E)
+        self.enter(population=population, params=params, step=step, ids=e_ids[to_is], new_e_state=EpidemiologicalState.Is)
+        self.enter(population=population, params=params, step=step, ids=e_ids[~to_is], new_e_state=EpidemiologicalState.Ia)
+        self.enter(population=population, params=params, step=step, ids=due[due_state == EpidemiologicalState.Ia],
+                   new_e_state=EpidemiologicalState.Rf)
+        self.enter(population=population, params=params, step=step, ids=is_ids[to_d], new_e_state=EpidemiologicalState.D)
+        self.enter(population=population, params=params, step=step, ids=is_ids[to_rp], new_e_state=EpidemiologicalState.Rp)
+        self.enter(population=population, params=params, step=step, ids=is_ids[~to_d & ~to_rp], new_e_state=EpidemiologicalState.Rf)
+        self.enter(population=population, params=params, step=step,
+                   ids=due[(due_state == EpidemiologicalState.Rf) | (due_state == EpidemiologicalState.Rp)],
+                   new_e_state=EpidemiologicalState.S)
+        return is_ids[to_d].tolist()
+
+    def susceptible_ids(self,
+                        sim) -> np.ndarray:
+        """
+        The susceptible agents that draw an infection (or a vaccine dose) today, by increasing id
+        """
+        population = sim.graph.population
+        return np.flatnonzero(population.real_mask() & (population.e_state == EpidemiologicalState.S))
+
+    def enter(self,
+              population,
+              params: SimulationParameters,
+              step: int,
+              ids: np.ndarray,
+              new_e_state: EpidemiologicalState):
+        """
+        Move the agents to a new state and file the day they leave it, if it is a timed state
+        """
+        VectorizedEngine.set_e_state(population=population,
+                                     ids=ids,
+                                     new_e_state=new_e_state)
+        self.zero_step[ids] = step
+        if new_e_state in EventEngine.THRESHOLDS:
+            self.due_step[ids] = step + max(getattr(params, EventEngine.THRESHOLDS[new_e_state]), 1)
+            self.wheel.schedule(ids=ids,
+                                days=self.due_step[ids])
+        else:
+            self.due_step[ids] = -1
@@ -0,0 +1,98 @@
+# library imports
+import numpy as np
+
+# project imports
+from epidemiological_simulator.event_engine import EventEngine
+from epidemiological_simulator.adjacency import AdjacencyIndex
+from epidemiological_simulator.epidemiological_state import EpidemiologicalState
+
+
+class FrontierEngine(EventEngine):
+    """
+    The event engine with the infection draws made only over the "at-risk" frontier: the susceptible agents with at
+    least one infectious (Ia / Is) out-neighbor in the epidemiological layer. Any other susceptible agent would pick a
+    neighbor that cannot infect it, so only its vaccine dose is checked.
+    The number of infectious neighbors of each agent is updated through the reverse index as agents enter or leave the
+    infectious states, and the frontier is the agents whose count went up from zero, so a day costs in proportion to
+    the prevalence instead of the population.
+    The draws are made for fewer agents than in the vectorized engine, so a run has the same distribution but not the
+    same random sequence. Implicit topologies (where everyone is near everyone) use the event engine's draws
+    """
+
+    # CONSTS #
+    NAME = "frontier"
+    INFECTIOUS = (EpidemiologicalState.Ia, EpidemiologicalState.Is)
+    # END - CONSTS #
+
+    def __init__(self):
+        EventEngine.__init__(self)
+        self.epi_index = None
+        # the number of infectious out-neighbors of each agent and the agents that may have any (with repeats)
+        self.infected_neighbors = None
+        self.frontier = None
+        # the in-neighbor edges scanned to update the counts in the current step
+        self.scanned_edges = 0
+
+    def prepare(self,
+                sim):
+        population = sim.graph.population
+        index = sim.graph.get_epi_index()
+        rebuild = self.population is not population or self.params is not sim.params or \
+            self.last_step != sim.step - 1 or self.zero_step.shape[0] != population.get_size() or self.epi_index is not index
+        EventEngine.prepare(self, sim=sim)
+        if not rebuild:
+            return
+        self.epi_index = index
+        if not isinstance(index, AdjacencyIndex):
+            self.infected_neighbors = None
+            return
+        # the counts are updated through the in-neighbors, build their index now rather than on the first infection
+        index.get_reverse()
+        infectious = population.real_mask() & np.isin(population.e_state, FrontierEngine.INFECTIOUS)
+        self.infected_neighbors = np.rint(index.neighbor_sum(values=infectious)).astype(np.int32)
+        self.frontier = np.flatnonzero(self.infected_neighbors > 0)
+
+    def epidemiological(self,
+                        sim) -> list:
+        self.scanned_edges = 0
+        deads_ids = EventEngine.epidemiological(self, sim=sim)
+        if sim.recorder is not None:
+            sim.recorder.count(name="epidemiological.edges",
+                               value=self.scanned_edges)
+        return deads_ids
+
+    def susceptible_ids(self,
+                        sim) -> np.ndarray:
+        """
+        The susceptible agents of the frontier and the vaccinated susceptible agents (for their vaccine doses)
+        """
+        if self.infected_neighbors is None:
+            return EventEngine.susceptible_ids(self, sim=sim)
+        population = sim.graph.population
+        # drop the agents that have no infectious neighbor any more, they re-enter when their count goes up again
+        self.frontier = np.unique(self.frontier[self.infected_neighbors[self.frontier] > 0])
+        candidates = np.union1d(self.frontier, np.flatnonzero(population.vaccinated))
+        return candidates[(population.e_state[candidates] == EpidemiologicalState.S) & ~population.is_virtual[candidates]]
+
+    def enter(self,
+              population,
+              params,
+              step: int,
+              ids: np.ndarray,
+              new_e_state: EpidemiologicalState):
+        if self.infected_neighbors is not None and ids.shape[0] > 0:
+            was_infectious = np.isin(population.e_state[ids], FrontierEngine.INFECTIOUS)
+            is_infectious = new_e_state in FrontierEngine.INFECTIOUS
+            changed = ids[was_infectious != is_infectious]
+            if changed.shape[0] > 0:
+                in_neighbors = self.epi_index.get_reverse().gather_neighbors(ids=changed)
+                self.scanned_edges += in_neighbors.shape[0]
+                np.add.at(self.infected_neighbors, in_neighbors, 1 if is_infectious else -1)
+                if is_infectious:
+                    self.frontier = np.concatenate((self.frontier, in_neighbors))
+        EventEngine.enter(self,
+                          population=population,
+                          params=params,
+                          step=step,
+                          ids=ids,
+                          new_e_state=new_e_state)
@@ -0,0 +1,75 @@
+# library imports
+import os
+import mmap
+import tempfile
+import numpy as np
+
+# project imports
+
+
+class FrozenArrays:
+    """
+    A set of named NumPy arrays frozen into a single file (in memory where the platform allows it).
+    Each map of the file is private (copy-on-write): all the maps share the same pages until one of them writes to a
+    page, which is then copied for that map only
+    """
+
+    # CONSTS #
+    ALIGNMENT = 64
+    # END - CONSTS #
+
+    def __init__(self,
+                 data_file,
+                 layout: dict,
+                 size: int):
+        self.data_file = data_file
+        # name -> (offset, shape, dtype)
+        self.layout = layout
+        self.size = size
+
+    @staticmethod
+    def freeze(arrays: dict):
+        """
+        Copy the given arrays into a new file, one after the other
+        """
+        layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            layout[name] = (offset, array.shape, array.dtype.str)
+            offset += -(-array.nbytes // FrozenArrays.ALIGNMENT) * FrozenArrays.ALIGNMENT
+        data_file = FrozenArrays._new_file()
+        data_file.truncate(max(offset, 1))
+        for name, array in arrays.items():
+            data_file.seek(layout[name][0])
+            data_file.write(np.ascontiguousarray(array).tobytes())
+        data_file.flush()
+        return FrozenArrays(data_file=data_file,
+                            layout=layout,
+                            size=max(offset, 1))
+
+    @staticmethod
+    def _new_file():
+        # an anonymous in-memory file on Linux, an unlinked temporary file elsewhere
+        if hasattr(os, "memfd_create"):
+            return os.fdopen(os.memfd_create("frozen_arrays"), "w+b")
+        return tempfile.TemporaryFile()
+
+    def map(self) -> dict:
+        """
+        A private, writeable copy-on-write view of the arrays
+        """
+        buffer = mmap.mmap(self.data_file.fileno(), self.size, access=mmap.ACCESS_COPY)
+        return {name: np.frombuffer(buffer, dtype=np.dtype(dtype), count=int(np.prod(shape)), offset=offset).reshape(shape)
+                for name, (offset, shape, dtype) in self.layout.items()}
+
+    def close(self):
+        """
+        Close the file, existing maps stay valid
+        """
+        self.data_file.close()
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<FrozenArrays: {}>".format(", ".join(self.layout))
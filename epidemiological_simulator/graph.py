@@ -1,9 +1,15 @@
 # library imports
-import random
+import numpy as np
 
 # project imports
-from epidemiological_simulator.node import Node
+from epidemiological_simulator.node import Node, NodeViews
 from epidemiological_simulator.edge import Edge
+from epidemiological_simulator.population import Population
+from epidemiological_simulator.adjacency import AdjacencyIndex
+from epidemiological_simulator.topology import BlockTopology
+from epidemiological_simulator.broadcasters import Broadcasters
+from epidemiological_simulator.random_graphs import RandomGraphs
+from epidemiological_simulator.math_utils import cosine_similarity_rows
 
 
 class Graph:
@@ -11,65 +17,281 @@ class Graph:
     A graph object
     """
 
+    # CONSTS #
+    # the edge columns of the social index cached by socio_personality
+    PERSONALITY_SIMILARITY = "personality_similarity"
+    PERSONALITY_SIDE = "personality_side"
+    # the most edges of an implicit topology that are listed as Edge objects
+    MAX_IMPLICIT_EDGES = 10 ** 7
+    # END - CONSTS #
+
     def __init__(self,
                  nodes: list,
                  epi_edges: list,
-                 socio_edges: list):
+                 socio_edges: list,
+                 population: Population = None):
         self.nodes = nodes
-        self.epi_edges = epi_edges
-        self.socio_edges = socio_edges
+        # None for graphs built from arrays, the edge lists are then made from the adjacency indexes on first access
+        self._epi_edges = epi_edges
+        self._socio_edges = socio_edges
+
+        # the agents' state as columns, the nodes are views over it
+        self._population = population if population is not None else Population.from_nodes(nodes=nodes)
+
+        # tombstones - removed nodes are False, their edges leave the edge lists in a single batch on the next access
+        self.alive = np.ones(len(nodes), dtype=np.bool_)
+        self._pending_removals = set()
+
+        self._locked_epi_index = None
+        self._locked_socio_index = None
+        # the personality reject threshold the social index's PERSONALITY_SIDE column was computed for
+        self._personality_reject = None
+        # the virtual sources of ideas outside the graph (see Broadcasters), None if there are none
+        self.broadcasters = None
+
+    @property
+    def population(self) -> Population:
+        # nodes appended directly to the list are not in the store yet, re-bind all of them
+        if self._population.get_size() != len(self.nodes):
+            self._population = Population.from_nodes(nodes=self.nodes)
+            self.alive = np.append(self.alive, np.ones(len(self.nodes) - self.alive.shape[0], dtype=np.bool_))
+        return self._population
+
+    @staticmethod
+    def from_indexes(population: Population,
+                     epi_index,
+                     socio_index):
+        """
+        Build a graph over a population store from the index of each layer - an AdjacencyIndex or an implicit
+        topology (e.g., BlockTopology) - without creating an Edge object per edge
+        """
+        graph = Graph(nodes=NodeViews(population=population),
+                      epi_edges=None,
+                      socio_edges=None,
+                      population=population)
+        graph._locked_epi_index = epi_index
+        graph._locked_socio_index = socio_index
+        return graph
 
-        self._locked_next_nodes_epi = None
-        self._locked_next_nodes_social = None
+    @staticmethod
+    def from_arrays(population: Population,
+                    epi_sources: np.ndarray,
+                    epi_targets: np.ndarray,
+                    socio_sources: np.ndarray,
+                    socio_targets: np.ndarray):
+        """
+        Build a graph over a population store straight from the (sources, targets) arrays of both layers
+        """
+        return Graph.from_indexes(population=population,
+                                  epi_index=AdjacencyIndex.from_arrays(sources=epi_sources,
+                                                                       targets=epi_targets,
+                                                                       node_count=population.get_size()),
+                                  socio_index=AdjacencyIndex.from_arrays(sources=socio_sources,
+                                                                         targets=socio_targets,
+                                                                         node_count=population.get_size()))
+
+    @property
+    def epi_edges(self) -> list:
+        if self._epi_edges is None:
+            self._epi_edges = Graph.edges_of(index=self._locked_epi_index)
+        self.compact_edges()
+        return self._epi_edges
+
+    @epi_edges.setter
+    def epi_edges(self, edges: list):
+        self._epi_edges = edges
+        self._locked_epi_index = None
+
+    @property
+    def socio_edges(self) -> list:
+        if self._socio_edges is None:
+            self._socio_edges = Graph.edges_of(index=self._locked_socio_index)
+        self.compact_edges()
+        return self._socio_edges
+
+    @socio_edges.setter
+    def socio_edges(self, edges: list):
+        self._socio_edges = edges
+        self._locked_socio_index = None
+
+    def remove_nodes(self,
+                     ids: list):
+        """
+        Disconnect the given nodes from both layers. The adjacency indexes are updated right away in time that depends
+        on the degrees around the nodes, the edge lists are compacted later in a single batch
+        """
+        ids = [id for id in ids if self.alive[id]]
+        if len(ids) == 0:
+            return
+        self.alive[ids] = False
+        self._pending_removals.update(ids)
+        for index in (self._locked_epi_index, self._locked_socio_index):
+            if index is not None:
+                [index.remove_node(id=id) for id in ids]
+                index.compact()
+
+    def compact_edges(self):
+        """
+        Drop the edges of all the nodes removed since the last compaction from the edge lists, in a single scan
+        """
+        if len(self._pending_removals) == 0:
+            return
+        removed = self._pending_removals
+        self._pending_removals = set()
+        for edges in (self._epi_edges, self._socio_edges):
+            if edges is not None:
+                edges[:] = [edge for edge in edges if edge.s_id not in removed and edge.t_id not in removed]
+
+    @staticmethod
+    def edges_of(index: AdjacencyIndex) -> list:
+        """
+        The live edges of an index as Edge objects. Implicit topologies have O(n^2) edges, listing a large one
+        raises instead of exhausting the memory
+        """
+        if isinstance(index, BlockTopology) and index.get_edge_count() > Graph.MAX_IMPLICIT_EDGES:
+            raise ValueError("Graph.edges_of: cannot list the {} edges of an implicit topology (more than {})".format(index.get_edge_count(),
+                                                                                                                Graph.MAX_IMPLICIT_EDGES))
+        sources, targets = index.live_edges()
+        return [Edge(s_id=s_id, t_id=t_id, w=1) for s_id, t_id in zip(sources.tolist(), targets.tolist())]
+
+    def add_epi_edges(self,
+                      sources: np.ndarray,
+                      targets: np.ndarray):
+        """
+        Add a batch of edges to the epidemiological layer
+        """
+        if self._epi_edges is not None:
+            self._epi_edges.extend(Edge(s_id=s_id, t_id=t_id, w=1) for s_id, t_id in zip(sources.tolist(), targets.tolist()))
+        if self._locked_epi_index is not None:
+            self._locked_epi_index = Graph.extend_index(index=self._locked_epi_index,
+                                                        sources=sources,
+                                                        targets=targets)
+
+    def add_socio_edges(self,
+                        sources: np.ndarray,
+                        targets: np.ndarray):
+        """
+        Add a batch of edges to the social layer
+        """
+        if self._socio_edges is not None:
+            self._socio_edges.extend(Edge(s_id=s_id, t_id=t_id, w=1) for s_id, t_id in zip(sources.tolist(), targets.tolist()))
+        if self._locked_socio_index is not None:
+            self._locked_socio_index = Graph.extend_index(index=self._locked_socio_index,
+                                                          sources=sources,
+                                                          targets=targets)
+
+    @staticmethod
+    def extend_index(index: AdjacencyIndex,
+                     sources: np.ndarray,
+                     targets: np.ndarray) -> AdjacencyIndex:
+        old_sources, old_targets = index.live_edges()
+        return AdjacencyIndex.from_arrays(sources=np.concatenate((old_sources, sources)),
+                                          targets=np.concatenate((old_targets, targets)),
+                                          node_count=index.get_size())
+
+    def add_node(self,
+                 node: Node):
+        """
+        Add a node to the graph and move its state into the population store
+        """
+        row = Population(size=1)
+        row.set_row(index=0,
+                    source=node.get_population(),
+                    source_index=node.get_index())
+        node.bind(population=self.population,
+                  index=self.population.extend(other=row))
+        self.nodes.append(node)
+        self.alive = np.append(self.alive, True)
+        for index in (self._locked_epi_index, self._locked_socio_index):
+            if index is not None:
+                index.add_nodes(count=1)
 
     def get_size(self) -> int:
         return len(self.nodes)
 
     def next_nodes_epi(self,
                        id: int):
-        if self._locked_next_nodes_epi is not None:
-            try:
-                return self._locked_next_nodes_epi[id]
-            except:
-                return []
-        else:
-            self.prepare_next_nodes_epi()
-            # now when the member is ready
-            try:
-                return self._locked_next_nodes_epi[id]
-            except:
-                return []
+        return self.get_epi_index().neighbors(id=id)
 
     def prepare_next_nodes_epi(self):
-        self._locked_next_nodes_epi = {}
-        for edge in self.epi_edges:
-            try:
-                self._locked_next_nodes_epi[edge.s_id].append(edge.t_id)
-            except:
-                self._locked_next_nodes_epi[edge.s_id] = [edge.t_id]
+        # graphs built from indexes keep them as the source of truth
+        if self._epi_edges is None or isinstance(self._locked_epi_index, BlockTopology):
+            return
+        self._locked_epi_index = AdjacencyIndex.from_edges(edges=self.epi_edges,
+                                                           node_count=len(self.nodes))
+
+    def get_epi_index(self) -> AdjacencyIndex:
+        if self._locked_epi_index is None:
+            self.prepare_next_nodes_epi()
+        return self._locked_epi_index
 
     def next_nodes_socio(self,
                          id: int):
-        if self._locked_next_nodes_social is not None:
-            try:
-                return self._locked_next_nodes_social[id]
-            except:
-                return []
-        else:
-            self.prepare_next_nodes_socio()
-            # now when the member is ready
-            try:
-                return self._locked_next_nodes_social[id]
-            except:
-                return []
+        return self.get_socio_index().neighbors(id=id)
 
     def prepare_next_nodes_socio(self):
-        self._locked_next_nodes_social = {}
-        for edge in self.socio_edges:
-            try:
-                self._locked_next_nodes_social[edge.s_id].append(edge.t_id)
-            except:
-                self._locked_next_nodes_social[edge.s_id] = [edge.t_id]
+        if self._socio_edges is None or isinstance(self._locked_socio_index, BlockTopology):
+            return
+        self._locked_socio_index = AdjacencyIndex.from_edges(edges=self.socio_edges,
+                                                             node_count=len(self.nodes))
+
+    def get_socio_index(self) -> AdjacencyIndex:
+        if self._locked_socio_index is None:
+            self.prepare_next_nodes_socio()
+        return self._locked_socio_index
+
+    def socio_personality(self,
+                          personality_reject: float) -> AdjacencyIndex:
+        """
+        The social index with the personality similarity of each edge (float32) and the side of the reject threshold it
+        is on (1 close enough, -1 too far, 0 on it - decided in float64) as edge columns.
+        The personality vectors do not change, so they are computed once per index (and threshold) and the index keeps
+        them aligned with its edges as agents die. None for implicit topologies
+        """
+        index = self.get_socio_index()
+        if not isinstance(index, AdjacencyIndex):
+            return None
+        if Graph.PERSONALITY_SIDE in index.edge_columns and self._personality_reject == personality_reject:
+            return index
+        sources, targets = index.live_edges()
+        personality = self.population.personality_vector
+        similarity = cosine_similarity_rows(personality[sources], personality[targets])
+        index.set_edge_column(name=Graph.PERSONALITY_SIMILARITY,
+                              values=similarity.astype(np.float32))
+        index.set_edge_column(name=Graph.PERSONALITY_SIDE,
+                              values=np.sign(personality_reject - (1 - similarity)).astype(np.int8))
+        self._personality_reject = personality_reject
+        return index
+
+    def add_broadcaster(self,
+                        ideas,
+                        targets) -> int:
+        """
+        Add a virtual source of the given ideas that influences the given agents, without a node or edges
+        (see Broadcasters), and return its id
+        """
+        if self.broadcasters is None:
+            self.broadcasters = Broadcasters()
+        return self.broadcasters.add(ideas=ideas,
+                                     targets=targets)
+
+    def unlock(self):
+        """
+        Drop the adjacency indexes so they are rebuilt from the edge lists on the next query
+        """
+        # graphs built from arrays keep their edges only in the indexes
+        if self._epi_edges is None:
+            self._epi_edges = Graph.edges_of(index=self._locked_epi_index)
+        if self._socio_edges is None:
+            self._socio_edges = Graph.edges_of(index=self._locked_socio_index)
+        self._locked_epi_index = None
+        self._locked_socio_index = None
+
+    def epi_degrees(self) -> np.ndarray:
+        return self.get_epi_index().degrees
+
+    def socio_degrees(self) -> np.ndarray:
+        return self.get_socio_index().degrees
 
     def get_items(self,
                   ids: list):
@@ -78,46 +300,90 @@ class Graph:
     @staticmethod
     def generate_random(node_count: int,
                         epi_edge_count: int,
-                        socio_edge_count: int):
-        """
-        Generate random graph with a given number of nodes and edges
-        """
-        nodes = [Node.create_random_mostly_s(id=id) for id in range(node_count)]
-        epi_edges = []
-        while len(epi_edges) < epi_edge_count:
-            s_id = random.randint(0, node_count - 1)
-            t_id = random.randint(0, node_count - 1)
-            if s_id != t_id and Edge(s_id=s_id, t_id=t_id, w=0) not in epi_edges:
-                epi_edges.append(Edge(s_id=s_id, t_id=t_id, w=1))
-        socio_edges = []
-        while len(socio_edges) < socio_edge_count:
-            s_id = random.randint(0, node_count - 1)
-            t_id = random.randint(0, node_count - 1)
-            if s_id != t_id and Edge(s_id=s_id, t_id=t_id, w=0) not in socio_edges:
-                socio_edges.append(Edge(s_id=s_id, t_id=t_id, w=1))
-        return Graph(nodes=nodes,
-                     epi_edges=epi_edges,
-                     socio_edges=socio_edges)
+                        socio_edge_count: int,
+                        rng: np.random.Generator = None):
+        """
+        Generate random graph with a given number of nodes and edges (Erdos-Renyi G(n, m) in both layers)
+        """
+        rng = RandomGraphs.default_rng(rng=rng)
+        epi_sources, epi_targets = RandomGraphs.erdos_renyi(node_count=node_count,
+                                                            edge_count=epi_edge_count,
+                                                            rng=rng)
+        socio_sources, socio_targets = RandomGraphs.erdos_renyi(node_count=node_count,
+                                                                edge_count=socio_edge_count,
+                                                                rng=rng)
+        return Graph.from_arrays(population=Population.random_mostly_s(size=node_count,
+                                                                       rng=rng),
+                                 epi_sources=epi_sources,
+                                 epi_targets=epi_targets,
+                                 socio_sources=socio_sources,
+                                 socio_targets=socio_targets)
 
     @staticmethod
-    def fully_connected(node_count: int):
-        """
-        Generate a fully connected graph with a given number of nodes
-        """
-        nodes = [Node.create_random_mostly_s(id=id) for id in range(node_count)]
-        epi_edges = []
-        socio_edges = []
-        for i in range(node_count):
-            for j in range(node_count):
-                if i != j:
-                    epi_edges.append(Edge(s_id=i, t_id=j, w=1))
-        for i in range(node_count):
-            for j in range(node_count):
-                if i != j:
-                    socio_edges.append(Edge(s_id=i, t_id=j, w=1))
-        return Graph(nodes=nodes,
-                     epi_edges=epi_edges,
-                     socio_edges=socio_edges)
+    def configuration_model(epi_degrees: np.ndarray,
+                            socio_degrees: np.ndarray,
+                            rng: np.random.Generator = None):
+        """
+        Generate a random graph with (about) the given degree of each node in each layer
+        """
+        rng = RandomGraphs.default_rng(rng=rng)
+        epi_sources, epi_targets = RandomGraphs.configuration_model(degrees=epi_degrees,
+                                                                    rng=rng)
+        socio_sources, socio_targets = RandomGraphs.configuration_model(degrees=socio_degrees,
+                                                                        rng=rng)
+        return Graph.from_arrays(population=Population.random_mostly_s(size=len(epi_degrees),
+                                                                       rng=rng),
+                                 epi_sources=epi_sources,
+                                 epi_targets=epi_targets,
+                                 socio_sources=socio_sources,
+                                 socio_targets=socio_targets)
+
+    @staticmethod
+    def preferential_attachment(node_count: int,
+                                epi_edges_per_node: int,
+                                socio_edges_per_node: int,
+                                rng: np.random.Generator = None):
+        """
+        Generate a scale-free (Barabasi-Albert) random graph with a given number of nodes
+        """
+        rng = RandomGraphs.default_rng(rng=rng)
+        epi_sources, epi_targets = RandomGraphs.preferential_attachment(node_count=node_count,
+                                                                        edges_per_node=epi_edges_per_node,
+                                                                        rng=rng)
+        socio_sources, socio_targets = RandomGraphs.preferential_attachment(node_count=node_count,
+                                                                            edges_per_node=socio_edges_per_node,
+                                                                            rng=rng)
+        return Graph.from_arrays(population=Population.random_mostly_s(size=node_count,
+                                                                       rng=rng),
+                                 epi_sources=epi_sources,
+                                 epi_targets=epi_targets,
+                                 socio_sources=socio_sources,
+                                 socio_targets=socio_targets)
+
+    @staticmethod
+    def fully_connected(node_count: int,
+                        rng: np.random.Generator = None):
+        """
+        Generate a fully connected graph with a given number of nodes, as implicit complete topologies (O(n) memory)
+        """
+        rng = RandomGraphs.default_rng(rng=rng)
+        return Graph.from_indexes(population=Population.random_mostly_s(size=node_count,
+                                                                        rng=rng),
+                                  epi_index=BlockTopology.complete(node_count=node_count),
+                                  socio_index=BlockTopology.complete(node_count=node_count))
+
+    def __setstate__(self, state: dict):
+        """
+        Unpickle a graph. A graph pickled before the population store has only its nodes and edge lists, rebuild the
+        store and the indexes from them
+        """
+        if "_population" in state:
+            self.__dict__.update(state)
+            return
+        Graph.__init__(self,
+                       nodes=state["nodes"],
+                       epi_edges=state["epi_edges"],
+                       socio_edges=state["socio_edges"])
 
     def __hash__(self):
         return (self.nodes, self.epi_edges, self.socio_edges).__hash__()
@@ -127,5 +393,5 @@ class Graph:
 
     def __str__(self):
         return "<Graph: V={}, E_e={}, E_s={}>".format(len(self.nodes),
-                                                      len(self.epi_edges),
-                                                      len(self.socio_edges))
+                                                      self.get_epi_index().get_edge_count(),
+                                                      self.get_socio_index().get_edge_count())
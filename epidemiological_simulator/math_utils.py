@@ -19,3 +19,22 @@ def cosine_similarity_numba(u: np.ndarray, v: np.ndarray):
         cos_theta = uv / np.sqrt(uu * vv)
     return cos_theta
 
+
+def cosine_similarity_matrix(u: np.ndarray,
+                             v: np.ndarray) -> np.ndarray:
+    """
+    The cosine similarity of each row of u with each row of v, 1 when either vector is all zeros (as cosine_similarity_numba)
+    """
+    norms = np.outer((u * u).sum(axis=1), (v * v).sum(axis=1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(norms != 0, (u @ v.T) / np.sqrt(norms), 1.0)
+
+
+def cosine_similarity_rows(u: np.ndarray,
+                           v: np.ndarray) -> np.ndarray:
+    """
+    The cosine similarity of each pair of matching rows (over the last axis), 1 when either vector is all zeros
+    """
+    norms = (u * u).sum(axis=-1) * (v * v).sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(norms != 0, (u * v).sum(axis=-1) / np.sqrt(norms), 1.0)
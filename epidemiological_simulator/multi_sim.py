@@ -1,7 +1,85 @@
 # library imports
 import os
+import copy
+import random
+import numpy as np
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # project imports
+from epidemiological_simulator.sim import Simulator
+from epidemiological_simulator.snapshot import Snapshot
+from epidemiological_simulator.params import SimulationParameters
+from epidemiological_simulator.shared_arrays import SharedArrays
+from epidemiological_simulator.process_engine import ProcessEngine
+
+
+# the shared simulator of the ensemble, set once in each worker process
+ENSEMBLE = {}
+
+
+def init_ensemble_worker(layout: dict,
+                         index_kinds: dict,
+                         pip,
+                         max_time: int,
+                         engine: str,
+                         step: int,
+                         params: SimulationParameters,
+                         debug: bool):
+    """
+    Keep the layout of the shared simulator in the worker, the arrays are mapped per replica
+    """
+    Simulator.DEBUG = debug
+    ENSEMBLE.update(layout=layout,
+                    index_kinds=index_kinds,
+                    pip=pip,
+                    max_time=max_time,
+                    engine=engine,
+                    step=step,
+                    params=params)
+
+
+def run_ensemble_replica(seed_sequence: np.random.SeedSequence,
+                         sim_info_extraction_function,
+                         stop_early: bool):
+    """
+    Run a single replica of the shared simulator over a private copy-on-write map of its arrays
+    """
+    sim = Simulator(graph=Snapshot.build_graph(arrays=SharedArrays.attach_private(layout=ENSEMBLE["layout"]),
+                                               index_kinds=ENSEMBLE["index_kinds"]),
+                    pip=copy.deepcopy(ENSEMBLE["pip"]),
+                    max_time=ENSEMBLE["max_time"],
+                    engine=ENSEMBLE["engine"],
+                    params=ENSEMBLE["params"])
+    sim.step = ENSEMBLE["step"]
+    MultiSim.seed(sim=sim,
+                  seed_sequence=seed_sequence)
+    return MultiSim.run_and_extract(sim=sim,
+                                    sim_info_extraction_function=sim_info_extraction_function,
+                                    stop_early=stop_early)
+
+
+def run_generated_replica(seed_sequence: np.random.SeedSequence,
+                          sim_generator_function,
+                          sim_info_extraction_function,
+                          generator_arguments: dict,
+                          params: SimulationParameters,
+                          stop_early: bool,
+                          debug: bool):
+    """
+    Generate a simulator (with its own random graph) and run it with the given model parameters
+    """
+    Simulator.DEBUG = debug
+    # the generators draw from the 'random' module
+    MultiSim.seed(sim=None,
+                  seed_sequence=seed_sequence)
+    sim = sim_generator_function(**generator_arguments)
+    sim.params = params
+    MultiSim.seed(sim=sim,
+                  seed_sequence=seed_sequence)
+    return MultiSim.run_and_extract(sim=sim,
+                                    sim_info_extraction_function=sim_info_extraction_function,
+                                    stop_early=stop_early)
 
 
 class MultiSim:
@@ -36,3 +114,134 @@ class MultiSim:
             sim.run()
             answer.append(sim_info_extraction_function(sim))
         return answer
+
+    @staticmethod
+    def run_parallel(sim_generator_function,
+                     sim_info_extraction_function,
+                     repeat_times: int,
+                     node_count: int,
+                     edge_count: int,
+                     max_time: int,
+                     control_units: int,
+                     population_count: int,
+                     workers: int = None,
+                     seed: int = None,
+                     stop_early: bool = False,
+                     progress: bool = True) -> list:
+        """
+        MultiSim.run over a pool of worker processes, each replica generates its own simulator.
+        Both functions are sent to the workers, so they must be module-level functions (not lambdas)
+        """
+        generator_arguments = {"node_count": node_count,
+                               "edge_count": edge_count,
+                               "max_time": max_time,
+                               "control_units": control_units,
+                               "population_count": population_count}
+        return MultiSim.collect(results=MultiSim.stream(task=run_generated_replica,
+                                                        tasks_arguments=[(seed_sequence, sim_generator_function, sim_info_extraction_function,
+                                                                          generator_arguments, SimulationParameters.default(), stop_early, Simulator.DEBUG)
+                                                                         for seed_sequence in np.random.SeedSequence(seed).spawn(repeat_times)],
+                                                        workers=workers,
+                                                        progress=progress))
+
+    @staticmethod
+    def run_ensemble(sim: Simulator,
+                     sim_info_extraction_function,
+                     repeat_times: int,
+                     workers: int = None,
+                     seed: int = None,
+                     stop_early: bool = False,
+                     progress: bool = True) -> list:
+        """
+        Run replicas of a simulator (with a fixed graph) from its current state over a pool of worker processes,
+        the answers are in the order of the replicas
+        """
+        return MultiSim.collect(results=MultiSim.stream_ensemble(sim=sim,
+                                                                 sim_info_extraction_function=sim_info_extraction_function,
+                                                                 repeat_times=repeat_times,
+                                                                 workers=workers,
+                                                                 seed=seed,
+                                                                 stop_early=stop_early,
+                                                                 progress=progress))
+
+    @staticmethod
+    def stream_ensemble(sim: Simulator,
+                        sim_info_extraction_function,
+                        repeat_times: int,
+                        workers: int = None,
+                        seed: int = None,
+                        stop_early: bool = False,
+                        progress: bool = True):
+        """
+        Yield (replica index, extracted info) of replicas of a simulator as each one finishes.
+        The simulator's arrays are published once in shared memory and each replica maps them copy-on-write, so the
+        graph is not built or copied per replica. Replica i gets the i-th seed spawned from the seed
+        """
+        shared = SharedArrays.create(arrays={name: values for name, values in Snapshot.collect_arrays(sim=sim).items()
+                                             if not name.startswith("engine.")})
+        try:
+            yield from MultiSim.stream(task=run_ensemble_replica,
+                                       tasks_arguments=[(seed_sequence, sim_info_extraction_function, stop_early)
+                                                        for seed_sequence in np.random.SeedSequence(seed).spawn(repeat_times)],
+                                       workers=workers,
+                                       progress=progress,
+                                       initializer=init_ensemble_worker,
+                                       initargs=(shared.layout, Snapshot.index_kinds(sim=sim), sim.pip, sim.max_time,
+                                                 sim.engine.NAME, sim.step, sim.params, Simulator.DEBUG))
+        finally:
+            shared.close()
+            shared.unlink()
+
+    @staticmethod
+    def stream(task,
+               tasks_arguments: list,
+               workers: int = None,
+               progress: bool = True,
+               initializer=None,
+               initargs: tuple = ()):
+        """
+        Run the task once per arguments tuple on a pool of worker processes and yield (index, answer) as each one
+        finishes
+        """
+        workers = workers if workers is not None else os.cpu_count()
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(tasks_arguments))),
+                                 mp_context=multiprocessing.get_context(ProcessEngine.START_METHOD),
+                                 initializer=initializer,
+                                 initargs=initargs) as executor:
+            futures = {executor.submit(task, *arguments): index for index, arguments in enumerate(tasks_arguments)}
+            for done, future in enumerate(as_completed(futures)):
+                if progress:
+                    print("MultiSim: replica #{} done, {}/{} ({:.2f})".format(futures[future] + 1,
+                                                                             done + 1,
+                                                                             len(futures),
+                                                                             (done + 1) * 100 / len(futures)))
+                yield futures[future], future.result()
+
+    @staticmethod
+    def collect(results) -> list:
+        """
+        The answers of a stream of (index, answer), in the order of the indexes
+        """
+        answer = {}
+        for index, value in results:
+            answer[index] = value
+        return [answer[index] for index in range(len(answer))]
+
+    @staticmethod
+    def seed(sim,
+             seed_sequence: np.random.SeedSequence):
+        """
+        Seed the 'random' module (the per-agent logic and the generators) and the simulator's random stream
+        """
+        random.seed(int(seed_sequence.generate_state(1, dtype=np.uint64)[0]))
+        if sim is not None:
+            sim.rng = np.random.default_rng(seed_sequence)
+
+    @staticmethod
+    def run_and_extract(sim: Simulator,
+                        sim_info_extraction_function,
+                        stop_early: bool):
+        sim.run(stop_early=stop_early)
+        answer = sim_info_extraction_function(sim)
+        sim.close()
+        return answer
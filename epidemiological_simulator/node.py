@@ -3,6 +3,7 @@ import random
 import numpy as np
 
 # project imports
+from epidemiological_simulator.population import Population
 from epidemiological_simulator.epidemiological_state import EpidemiologicalState
 
 
@@ -12,8 +13,8 @@ class Node:
     """
 
     # CONSTS #
-    PERSONALITY_SIZE = 10
-    IDEAS_SIZE = 3
+    PERSONALITY_SIZE = Population.PERSONALITY_SIZE
+    IDEAS_SIZE = Population.IDEAS_SIZE
 
     # END - CONSTS #
 
@@ -29,16 +30,21 @@ class Node:
                  vaccinated: bool = False,
                  vaccine_count: int = 0,
                  last_vaccinated_time: int = 0):
-        self.e_state = epidimiological_state
-        self.personality_vector = np.asarray(personality_vector)
-        self.ideas = np.asarray(ideas)
         self.id = id
+        # a node is a view over a single row of a population store, a stand-alone node owns a store of size one
+        self._population = Population(size=1)
+        self._index = 0
+
+        self.e_state = epidimiological_state
+        # virtual nodes have no personality, keep the zero vector for them
+        if len(personality_vector) > 0:
+            self.personality_vector = personality_vector
+        self.ideas = ideas
         self.timer = timer
         self.is_virtual = is_virtual
 
         # records
-        self.e_state_counts = [0 for _ in range(EpidemiologicalState.STATE_COUNT)]
-        self.e_state_counts[self.e_state] = 1
+        self._population.e_state_counts[self._index, self.e_state] = 1
 
         # pips
         self.wearing_mask = wearing_mask
@@ -48,6 +54,121 @@ class Node:
         self.vaccine_count = vaccine_count
         self.last_vaccinated_time = last_vaccinated_time
 
+    def bind(self,
+             population: Population,
+             index: int):
+        """
+        Make this node a view over the given row of a population store
+        """
+        self._population = population
+        self._index = index
+
+    @staticmethod
+    def view(population: Population,
+             index: int):
+        """
+        A node over an existing row of a population store (its id is the row), without allocating a store of its own
+        """
+        answer = Node.__new__(Node)
+        answer.id = index
+        answer.bind(population=population,
+                    index=index)
+        return answer
+
+    def get_population(self) -> Population:
+        return self._population
+
+    def get_index(self) -> int:
+        return self._index
+
+    # population view #
+
+    @property
+    def e_state(self) -> EpidemiologicalState:
+        return EpidemiologicalState(self._population.e_state[self._index])
+
+    @e_state.setter
+    def e_state(self, value: EpidemiologicalState):
+        self._population.e_state[self._index] = value
+
+    @property
+    def timer(self) -> int:
+        return int(self._population.timer[self._index])
+
+    @timer.setter
+    def timer(self, value: int):
+        self._population.timer[self._index] = value
+
+    @property
+    def personality_vector(self) -> np.ndarray:
+        return self._population.personality_vector[self._index]
+
+    @personality_vector.setter
+    def personality_vector(self, value):
+        self._population.personality_vector[self._index] = value
+
+    @property
+    def ideas(self) -> np.ndarray:
+        return self._population.ideas[self._index]
+
+    @ideas.setter
+    def ideas(self, value):
+        self._population.ideas[self._index] = value
+
+    @property
+    def is_virtual(self) -> bool:
+        return bool(self._population.is_virtual[self._index])
+
+    @is_virtual.setter
+    def is_virtual(self, value: bool):
+        self._population.is_virtual[self._index] = value
+
+    @property
+    def wearing_mask(self) -> bool:
+        return bool(self._population.wearing_mask[self._index])
+
+    @wearing_mask.setter
+    def wearing_mask(self, value: bool):
+        self._population.wearing_mask[self._index] = value
+
+    @property
+    def social_distance(self) -> bool:
+        return bool(self._population.social_distance[self._index])
+
+    @social_distance.setter
+    def social_distance(self, value: bool):
+        self._population.social_distance[self._index] = value
+
+    @property
+    def vaccinated(self) -> bool:
+        return bool(self._population.vaccinated[self._index])
+
+    @vaccinated.setter
+    def vaccinated(self, value: bool):
+        self._population.vaccinated[self._index] = value
+
+    @property
+    def vaccine_count(self) -> int:
+        return int(self._population.vaccine_count[self._index])
+
+    @vaccine_count.setter
+    def vaccine_count(self, value: int):
+        self._population.vaccine_count[self._index] = value
+
+    @property
+    def last_vaccinated_time(self) -> int:
+        return int(self._population.last_vaccinated_time[self._index])
+
+    @last_vaccinated_time.setter
+    def last_vaccinated_time(self, value: int):
+        self._population.last_vaccinated_time[self._index] = value
+
+    @property
+    def e_state_counts(self) -> np.ndarray:
+        return self._population.e_state_counts[self._index]
+
+    # end - population view #
+
     @staticmethod
     def create_random(id: int):
         return Node(epidimiological_state=random.choice([EpidemiologicalState.S,
@@ -71,17 +192,22 @@ class Node:
                     timer=0)
 
     def copy(self):
-        return Node(epidimiological_state=self.e_state,
-                    personality_vector=self.personality_vector.copy(),
-                    ideas=self.ideas.copy(),
-                    id=self.id,
-                    timer=self.timer,
-                    is_virtual=self.is_virtual,
-                    wearing_mask=self.wearing_mask,
-                    social_distance=self.social_distance,
-                    vaccinated=self.vaccinated,
-                    vaccine_count=self.vaccine_count,
-                    last_vaccinated_time=self.last_vaccinated_time)
+        """
+        A stand-alone copy of the node, not bound to the population store of the original
+        """
+        answer = Node(epidimiological_state=self.e_state,
+                      personality_vector=self.personality_vector.copy(),
+                      ideas=self.ideas.copy(),
+                      id=self.id,
+                      timer=self.timer,
+                      is_virtual=self.is_virtual,
+                      wearing_mask=self.wearing_mask,
+                      social_distance=self.social_distance,
+                      vaccinated=self.vaccinated,
+                      vaccine_count=self.vaccine_count,
+                      last_vaccinated_time=self.last_vaccinated_time)
+        answer.e_state_counts[:] = self.e_state_counts
+        return answer
 
     def tic(self):
         self.timer += 1
@@ -94,6 +220,28 @@ class Node:
         # record change
         self.e_state_counts[self.e_state] += 1
 
+    def __setstate__(self, state: dict):
+        """
+        Unpickle a node. A node pickled before the population store holds its state as attributes, move it into a
+        store of its own
+        """
+        if "_population" in state:
+            self.__dict__.update(state)
+            return
+        Node.__init__(self,
+                      epidimiological_state=state["e_state"],
+                      personality_vector=state["personality_vector"],
+                      ideas=state["ideas"],
+                      id=state["id"],
+                      timer=state["timer"],
+                      is_virtual=state["is_virtual"],
+                      wearing_mask=state["wearing_mask"],
+                      social_distance=state["social_distance"],
+                      vaccinated=state["vaccinated"],
+                      vaccine_count=state["vaccine_count"],
+                      last_vaccinated_time=state["last_vaccinated_time"])
+        self.e_state_counts[:] = state["e_state_counts"]
+
     def __hash__(self):
         return self.id.__hash__()
 
@@ -106,3 +254,42 @@ class Node:
                                                                                         self.personality_vector,
                                                                                         self.ideas,
                                                                                         self.is_virtual)
+
+
+class NodeViews:
+    """
+    The nodes of a population store as a list-like sequence. A node view is made on its first access, so a graph over
+    millions of agents does not create millions of objects up front
+    """
+
+    def __init__(self,
+                 population: Population):
+        self.population = population
+        self._nodes = [None] * population.get_size()
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self._nodes)))]
+        node = self._nodes[index]
+        if node is None:
+            node = Node.view(population=self.population,
+                             index=index % len(self._nodes))
+            self._nodes[index] = node
+        return node
+
+    def __iter__(self):
+        for index in range(len(self._nodes)):
+            yield self[index]
+
+    def append(self,
+               node: Node):
+        self._nodes.append(node)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<NodeViews: {}>".format(len(self._nodes))
@@ -0,0 +1,274 @@
+# library imports
+import numba
+import numpy as np
+from numba import njit, prange
+
+# project imports
+from epidemiological_simulator.graph import Graph
+from epidemiological_simulator.params import SimulationParameters
+from epidemiological_simulator.topology import BlockTopology
+from epidemiological_simulator.scheduler import DegreeScheduler
+from epidemiological_simulator.math_utils import cosine_similarity_numba
+from epidemiological_simulator.vectorized_engine import VectorizedEngine
+from epidemiological_simulator.epidemiological_state import EpidemiologicalState
+
+
+# the order of the model parameters in the array handed to the kernels (see SimulationParameters.to_array)
+PARAMETERS_ORDER = list(SimulationParameters._fields)
+(BETA, PHI, GAMMA_A, GAMMA_S, PSI_1, PSI_2, PSI_3, ETA, LAMDA, CHI_F, CHI_P, PERSONALITY_REJECT, IDEAS_REJECT,
+ MASK_S_REDUCE_FACTOR, MASK_I_REDUCE_FACTOR, MASK_SI_REDUCE_FACTOR, SOCIAL_DISTANCE_REDUCE_FACTOR,
+ VACCINATE_DELTA_TIME) = range(len(PARAMETERS_ORDER))
+
+# the epidemiological states, as plain ints for the kernels
+S, E, IA, IS, RF, RP, D = 0, 1, 2, 3, 4, 5, 6
+
+
+@njit(cache=True)
+def next_uniform(rng_states: np.ndarray, stream: int) -> float:
+    """
+    A splitmix64 step of the given random stream, return a U[0, 1) sample
+    """
+    state = rng_states[stream] + np.uint64(0x9E3779B97F4A7C15)
+    rng_states[stream] = state
+    z = (state ^ (state >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)) * (1.0 / 9007199254740992.0)
+
+
+@njit(cache=True)
+def vaccine_reduction_numba(vaccine_count: int, time_since_vaccine: float) -> float:
+    if vaccine_count == 0:
+        return 1.0
+    elif vaccine_count == 1:
+        return max(0.8 + time_since_vaccine / 60, 1.0)
+    elif vaccine_count == 2:
+        return max(0.1 + time_since_vaccine / 90, 1.0)
+    elif vaccine_count == 3:
+        return max(0.05 + time_since_vaccine / 90, 1.0)
+    return max(time_since_vaccine / 90, 1.0)
+
+
+@njit(cache=True)
+def set_e_state_numba(i, new_e_state, e_state, timer, e_state_counts):
+    e_state[i] = new_e_state
+    timer[i] = 0
+    e_state_counts[i, new_e_state] += 1
+
+
+@njit(parallel=True, cache=True)
+def epidemiological_kernel(e_state_old, e_state, timer, is_virtual, wearing_mask, social_distance, vaccinated,
+                           vaccine_count, last_vaccinated_time, e_state_counts, offsets, targets, degrees,
+                           chunk_starts, rng_states, params, dead):
+    """
+    One SEIIRRD day of all the agents. Chunk c of the agents is computed by a single thread using random stream c,
+    all the agents read the states of the beginning of the day (e_state_old)
+    """
+    for chunk in prange(chunk_starts.shape[0] - 1):
+        for i in range(chunk_starts[chunk], chunk_starts[chunk + 1]):
+            dead[i] = False
+            if is_virtual[i]:
+                continue
+            timer[i] += 1
+            state = e_state_old[i]
+            if state == S:
+                # pick a neighbor agent in random, or the agent itself if it has no neighbors
+                picked = i
+                if degrees[i] > 0:
+                    picked = targets[offsets[i] + int(next_uniform(rng_states, chunk) * degrees[i])]
+                infect_chance = next_uniform(rng_states, chunk)
+                # masks, social distance and vaccination PIPs
+                if wearing_mask[picked] and wearing_mask[i]:
+                    infect_chance *= params[MASK_SI_REDUCE_FACTOR]
+                elif wearing_mask[i]:
+                    infect_chance *= params[MASK_S_REDUCE_FACTOR]
+                elif wearing_mask[picked]:
+                    infect_chance *= params[MASK_I_REDUCE_FACTOR]
+                if social_distance[i] or social_distance[picked]:
+                    infect_chance *= params[SOCIAL_DISTANCE_REDUCE_FACTOR]
+                infect_chance *= vaccine_reduction_numba(vaccine_count[i], timer[i] - last_vaccinated_time[i])
+                # check if infected
+                picked_state = e_state_old[picked]
+                if (picked_state == IS or picked_state == IA) and infect_chance <= params[BETA]:
+                    set_e_state_numba(i, E, e_state, timer, e_state_counts)
+                elif vaccinated[i] and (timer[i] - last_vaccinated_time[i] > params[VACCINATE_DELTA_TIME] or last_vaccinated_time[i] == 0):
+                    vaccine_count[i] += 1
+                    last_vaccinated_time[i] = timer[i]
+            elif state == E and timer[i] >= params[PHI]:
+                if next_uniform(rng_states, chunk) < params[ETA]:
+                    set_e_state_numba(i, IS, e_state, timer, e_state_counts)
+                else:
+                    set_e_state_numba(i, IA, e_state, timer, e_state_counts)
+            elif state == IA and timer[i] >= params[GAMMA_A]:
+                set_e_state_numba(i, RF, e_state, timer, e_state_counts)
+            elif state == IS and timer[i] >= params[GAMMA_S]:
+                chance = next_uniform(rng_states, chunk)
+                if params[PSI_2] < chance <= params[PSI_3]:
+                    set_e_state_numba(i, D, e_state, timer, e_state_counts)
+                    dead[i] = True
+                elif params[PSI_1] < chance <= params[PSI_2]:
+                    set_e_state_numba(i, RP, e_state, timer, e_state_counts)
+                else:
+                    set_e_state_numba(i, RF, e_state, timer, e_state_counts)
+            elif state == RF and timer[i] >= params[CHI_F]:
+                set_e_state_numba(i, S, e_state, timer, e_state_counts)
+            elif state == RP and timer[i] >= params[CHI_P]:
+                set_e_state_numba(i, S, e_state, timer, e_state_counts)
+
+
+@njit(parallel=True, cache=True, error_model="numpy")
+def social_kernel(ideas, is_virtual, offsets, targets, degrees, similarities, sides, chunk_starts, params, new_ideas):
+    """
+    The new (clipped) idea vector of every agent given the ideas of its social neighbors at the beginning of the day.
+    The personality similarity of each edge and its side of the reject threshold are the social index's edge columns
+    (see Graph.socio_personality), the virtual agents keep their ideas
+    """
+    for chunk in prange(chunk_starts.shape[0] - 1):
+        score = np.zeros(ideas.shape[1])
+        for i in range(chunk_starts[chunk], chunk_starts[chunk + 1]):
+            if is_virtual[i] or degrees[i] == 0:
+                new_ideas[i, :] = ideas[i, :]
+                continue
+            score[:] = 0
+            total_influence = 0.0
+            for position in range(offsets[i], offsets[i] + degrees[i]):
+                other = targets[position]
+                # if people are too different, the ideas of one person is causing negative reaction
+                idea_similarity = 1 - cosine_similarity_numba(ideas[i], ideas[other])
+                personality_similarity = similarities[position]
+                side = sides[position]
+                sign = 0
+                if idea_similarity < params[IDEAS_REJECT] and side > 0:
+                    sign = 1
+                elif idea_similarity < params[IDEAS_REJECT] and side < 0:
+                    sign = -1
+                elif idea_similarity > params[IDEAS_REJECT] and side > 0:
+                    sign = -1
+                if sign != 0:
+                    for k in range(score.shape[0]):
+                        score[k] += sign * personality_similarity * ideas[other, k]
+                    total_influence += personality_similarity
+            for k in range(score.shape[0]):
+                value = ideas[i, k] + params[LAMDA] * score[k] / total_influence
+                # clip to [0, 1], keeping NaN as the per-agent logic does
+                if value < 0:
+                    value = 0.0
+                elif value > 1:
+                    value = 1.0
+                new_ideas[i, k] = value
+
+
+class NumbaEngine(VectorizedEngine):
+    """
+    Run the epidemiological and social steps as compiled kernels that use all the cores (numba's prange).
+    In the epidemiological step the agents are split into equal chunks, each computed by a single thread with its own
+    random stream. In the social step the chunks are weighted by the agents' social degree
+    """
+
+    # CONSTS #
+    NAME = "numba"
+    CHUNK_SIZE = 256
+    # END - CONSTS #
+
+    def __init__(self):
+        VectorizedEngine.__init__(self)
+        self.scheduler = DegreeScheduler()
+        self.chunk_starts = None
+        self.rng_states = None
+        self.social_chunk_starts = None
+        self._social_index = None
+
+    def prepare(self,
+                sim):
+        """
+        Split the agents into chunks and seed a random stream per chunk, if not done yet for this population size
+        """
+        size = sim.graph.population.get_size()
+        if self.chunk_starts is None or self.chunk_starts[-1] != size:
+            self.chunk_starts = np.append(np.arange(0, size, NumbaEngine.CHUNK_SIZE, dtype=np.int64), size)
+            self.rng_states = sim.rng.integers(0, np.iinfo(np.uint64).max, size=self.chunk_starts.shape[0] - 1,
+                                               dtype=np.uint64, endpoint=True)
+        socio_index = sim.graph.get_socio_index()
+        if self._social_index is not socio_index or self.social_chunk_starts[-1] != size:
+            self.social_chunk_starts = self.scheduler.chunk_starts(degrees=socio_index.degrees,
+                                                                   workers_count=self.get_workers_count(sim=sim))
+            self._social_index = socio_index
+
+    def get_workers_count(self,
+                          sim) -> int:
+        return numba.get_num_threads()
+
+    def get_state_arrays(self) -> dict:
+        if self.chunk_starts is None:
+            return {}
+        return {"chunk_starts": self.chunk_starts,
+                "rng_states": self.rng_states}
+
+    def set_state_arrays(self,
+                         arrays: dict):
+        if "chunk_starts" in arrays:
+            self.chunk_starts = np.array(arrays["chunk_starts"])
+            self.rng_states = np.array(arrays["rng_states"])
+
+    @staticmethod
+    def count_epidemiological_work(sim):
+        """
+        The kernels touch all the agents and each susceptible one reads the neighbor it picked, if recording
+        """
+        if sim.recorder is None:
+            return
+        population = sim.graph.population
+        real = population.real_mask()
+        VectorizedEngine.count_work(sim=sim,
+                                    phase="epidemiological",
+                                    agents=np.count_nonzero(real),
+                                    edges=np.count_nonzero(real & (population.e_state == EpidemiologicalState.S)))
+
+    @staticmethod
+    def count_social_work(sim):
+        """
+        The kernels update all the agents from all their edges, if recording
+        """
+        if sim.recorder is None:
+            return
+        VectorizedEngine.count_work(sim=sim,
+                                    phase="social",
+                                    agents=np.count_nonzero(sim.graph.population.real_mask()),
+                                    edges=sim.graph.get_socio_index().get_edge_count())
+
+    @staticmethod
+    def pack_parameters(params: SimulationParameters) -> np.ndarray:
+        return params.to_array()
+
+    def epidemiological(self,
+                        sim) -> list:
+        # implicit topologies have no CSR arrays for the kernels
+        if isinstance(sim.graph.get_epi_index(), BlockTopology):
+            return VectorizedEngine.epidemiological(self, sim=sim)
+        self.prepare(sim=sim)
+        population = sim.graph.population
+        index = sim.graph.get_epi_index()
+        NumbaEngine.count_epidemiological_work(sim=sim)
+        dead = np.zeros(population.get_size(), dtype=np.bool_)
+        epidemiological_kernel(population.e_state.copy(), population.e_state, population.timer,
+                               population.is_virtual, population.wearing_mask, population.social_distance,
+                               population.vaccinated, population.vaccine_count, population.last_vaccinated_time,
+                               population.e_state_counts, index.offsets, index.targets, index.degrees,
+                               self.chunk_starts, self.rng_states, NumbaEngine.pack_parameters(params=sim.params), dead)
+        return np.flatnonzero(dead).tolist()
+
+    def social(self,
+               sim):
+        # the kernel knows nothing of the broadcasters, the vectorized step adds them
+        if isinstance(sim.graph.get_socio_index(), BlockTopology) or sim.graph.broadcasters is not None:
+            return VectorizedEngine.social(self, sim=sim)
+        self.prepare(sim=sim)
+        population = sim.graph.population
+        index = sim.graph.socio_personality(personality_reject=sim.params.personality_reject)
+        NumbaEngine.count_social_work(sim=sim)
+        new_ideas = np.empty_like(population.ideas)
+        social_kernel(population.ideas, population.is_virtual, index.offsets, index.targets, index.degrees,
+                      index.edge_columns[Graph.PERSONALITY_SIMILARITY], index.edge_columns[Graph.PERSONALITY_SIDE],
+                      self.social_chunk_starts, NumbaEngine.pack_parameters(params=sim.params), new_ideas)
+        population.ideas[:] = new_ideas
+        population.update_pips_from_ideas(mask=population.real_mask())
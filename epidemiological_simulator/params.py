@@ -1,4 +1,6 @@
 # library imports
+import numpy as np
+from typing import NamedTuple
 
 # project imports
 
@@ -25,3 +27,58 @@ class ModelParameter:
     mask_si_reduce_factor = 0.84
     social_distance_reduce_factor = 0.33
     vaccinate_delta_time = 90
+
+
+class SimulationParameters(NamedTuple):
+    """
+    The parameters values of the SEIRD model of a single simulator - an immutable value, so simulators with different
+    parameters can run side by side in one process. The defaults are taken from ModelParameter
+    """
+    beta: float
+    phi: int
+    gamma_a: int
+    gamma_s: int
+    psi_1: float
+    psi_2: float
+    psi_3: float
+    eta: float
+    lamda: float
+    chi_f: int
+    chi_p: int
+    personality_reject: float
+    ideas_reject: float
+    mask_s_reduce_factor: float
+    mask_i_reduce_factor: float
+    mask_si_reduce_factor: float
+    social_distance_reduce_factor: float
+    vaccinate_delta_time: int
+
+    @staticmethod
+    def default():
+        """
+        The current values of ModelParameter
+        """
+        return SimulationParameters(**{name: getattr(ModelParameter, name) for name in SimulationParameters._fields})
+
+    @staticmethod
+    def from_array(values: np.ndarray):
+        """
+        The parameters packed by to_array
+        """
+        return SimulationParameters(*[field_type(value) for field_type, value in zip(SimulationParameters.__annotations__.values(), values)])
+
+    def to_array(self) -> np.ndarray:
+        """
+        The values as a float array in the order of the fields (e.g., for the compiled kernels)
+        """
+        return np.array(self, dtype=np.float64)
+
+    def replace(self,
+                **changes):
+        """
+        A copy with some of the values changed
+        """
+        unknown = set(changes) - set(SimulationParameters._fields)
+        if len(unknown) > 0:
+            raise ValueError("SimulationParameters: unknown parameters {}".format(sorted(unknown)))
+        return self._replace(**changes)
@@ -0,0 +1,126 @@
+# library imports
+import numpy as np
+
+# project imports
+from epidemiological_simulator.epidemiological_state import EpidemiologicalState
+
+
+class Population:
+    """
+    A structure-of-arrays store of the agents' state, indexed by the node id.
+    Each field is a contiguous typed column so the whole population can be updated with array operations
+    """
+
+    # CONSTS #
+    PERSONALITY_SIZE = 10
+    IDEAS_SIZE = 3
+
+    # the name of every column in the store, in a fixed order
+    COLUMNS = ["e_state",
+               "timer",
+               "ideas",
+               "personality_vector",
+               "is_virtual",
+               "wearing_mask",
+               "social_distance",
+               "vaccinated",
+               "vaccine_count",
+               "last_vaccinated_time",
+               "e_state_counts"]
+    # END - CONSTS #
+
+    def __init__(self,
+                 size: int):
+        self.e_state = np.zeros(size, dtype=np.int8)
+        self.timer = np.zeros(size, dtype=np.int32)
+        self.ideas = np.zeros((size, Population.IDEAS_SIZE), dtype=np.float64)
+        self.personality_vector = np.zeros((size, Population.PERSONALITY_SIZE), dtype=np.float64)
+        self.is_virtual = np.zeros(size, dtype=np.bool_)
+
+        # pips
+        self.wearing_mask = np.zeros(size, dtype=np.bool_)
+        self.social_distance = np.zeros(size, dtype=np.bool_)
+        self.vaccinated = np.zeros(size, dtype=np.bool_)
+        self.vaccine_count = np.zeros(size, dtype=np.int32)
+        self.last_vaccinated_time = np.zeros(size, dtype=np.int32)
+
+        # records
+        self.e_state_counts = np.zeros((size, EpidemiologicalState.STATE_COUNT), dtype=np.int32)
+
+    @staticmethod
+    def from_nodes(nodes: list):
+        """
+        Build a store holding the state of the given nodes and re-bind each node as a view into it
+        """
+        population = Population(size=len(nodes))
+        for index, node in enumerate(nodes):
+            population.set_row(index=index,
+                               source=node.get_population(),
+                               source_index=node.get_index())
+        for index, node in enumerate(nodes):
+            node.bind(population=population,
+                      index=index)
+        return population
+
+    @staticmethod
+    def random_mostly_s(size: int,
+                        rng: np.random.Generator):
+        """
+        A store of agents drawn as Node.create_random_mostly_s does, in a single vectorized pass
+        """
+        population = Population(size=size)
+        population.e_state[:] = np.where(rng.random(size) < 0.95, EpidemiologicalState.S, EpidemiologicalState.Is)
+        population.personality_vector[:] = rng.random((size, Population.PERSONALITY_SIZE))
+        population.ideas[:] = rng.random((size, Population.IDEAS_SIZE))
+        population.e_state_counts[np.arange(size), population.e_state] = 1
+        return population
+
+    def set_row(self,
+                index: int,
+                source,
+                source_index: int):
+        """
+        Copy a single agent's state from another store
+        """
+        for column in Population.COLUMNS:
+            getattr(self, column)[index] = getattr(source, column)[source_index]
+
+    def extend(self,
+               other):
+        """
+        Append the rows of another store at the end of this one, return the index of the first appended row
+        """
+        start = self.get_size()
+        for column in Population.COLUMNS:
+            setattr(self, column, np.concatenate((getattr(self, column), getattr(other, column)), axis=0))
+        return start
+
+    def copy(self):
+        answer = Population(size=0)
+        for column in Population.COLUMNS:
+            setattr(answer, column, getattr(self, column).copy())
+        return answer
+
+    def get_size(self) -> int:
+        return self.e_state.shape[0]
+
+    def real_mask(self) -> np.ndarray:
+        """
+        The agents that take part in the dynamics (i.e., not virtual nodes)
+        """
+        return ~self.is_virtual
+
+    def update_pips_from_ideas(self,
+                               mask: np.ndarray):
+        """
+        Set the PIP flags of the agents in the mask according to their current ideas
+        """
+        self.wearing_mask[mask] = self.ideas[mask, 0] > 0.5
+        self.social_distance[mask] = self.ideas[mask, 1] > 0.5
+        self.vaccinated[mask] = self.ideas[mask, 2] > 0.5
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<Population: size={}>".format(self.get_size())
@@ -0,0 +1,317 @@
+# library imports
+import time
+import numba
+import weakref
+import threading
+import traceback
+import numpy as np
+import multiprocessing
+import multiprocessing.connection
+
+# project imports
+from epidemiological_simulator.graph import Graph
+from epidemiological_simulator.population import Population
+from epidemiological_simulator.topology import BlockTopology
+from epidemiological_simulator.vectorized_engine import VectorizedEngine
+from epidemiological_simulator.shared_arrays import SharedArrays
+from epidemiological_simulator.scheduler import DegreeScheduler, WorkStealingQueue
+from epidemiological_simulator.numba_engine import NumbaEngine, epidemiological_kernel, social_kernel
+
+
+# the commands the main process hands to the workers
+EPIDEMIOLOGICAL = 1
+SOCIAL = 2
+STOP = 3
+# the bytes of the shared slot a failing worker writes its traceback to
+ERROR_SIZE = 8192
+
+
+def run_chunk(shared: SharedArrays,
+              command: int,
+              chunk: int):
+    """
+    Run a single chunk of a phase, chunk c of the epidemiological phase always uses random stream c
+    """
+    if command == EPIDEMIOLOGICAL:
+        epidemiological_kernel(shared["e_state_old"], shared["e_state"], shared["timer"], shared["is_virtual"],
+                               shared["wearing_mask"], shared["social_distance"], shared["vaccinated"],
+                               shared["vaccine_count"], shared["last_vaccinated_time"], shared["e_state_counts"],
+                               shared["epi_offsets"], shared["epi_targets"], shared["epi_degrees"],
+                               shared["chunk_starts"][chunk:chunk + 2], shared["rng_states"][chunk:chunk + 1],
+                               shared["params"], shared["dead"])
+    elif command == SOCIAL:
+        social_kernel(shared["ideas"], shared["is_virtual"],
+                      shared["socio_offsets"], shared["socio_targets"], shared["socio_degrees"],
+                      shared["socio_personality_similarity"], shared["socio_personality_side"],
+                      shared["social_chunk_starts"][chunk:chunk + 2], shared["params"], shared["new_ideas"])
+
+
+def process_worker(layout: dict,
+                   rank: int,
+                   barrier,
+                   locks: list):
+    """
+    The loop of a single worker: wait for a phase, run the chunks of its own range and then steal from the others,
+    report back its timing
+    """
+    # the parallelism is between the processes
+    numba.set_num_threads(1)
+    shared = SharedArrays.attach(layout=layout)
+    queue = WorkStealingQueue(ranges=shared["queue_ranges"],
+                              locks=locks)
+    while True:
+        barrier.wait()
+        command = shared["control"][0]
+        if command == STOP:
+            break
+        start = time.perf_counter()
+        chunks_done = 0
+        chunks_stolen = 0
+        try:
+            chunk, stolen = queue.take(rank=rank)
+            while chunk >= 0:
+                run_chunk(shared=shared,
+                          command=command,
+                          chunk=chunk)
+                chunks_done += 1
+                chunks_stolen += stolen
+                chunk, stolen = queue.take(rank=rank)
+        except Exception:
+            shared["control"][1] = rank + 1
+            error = traceback.format_exc().encode()[-ERROR_SIZE:]
+            shared["error"][:] = 0
+            shared["error"][:len(error)] = np.frombuffer(error, dtype=np.uint8)
+        shared["worker_stats"][rank] = (time.perf_counter() - start, chunks_done, chunks_stolen)
+        barrier.wait()
+    shared.close()
+
+
+class ProcessEngine(NumbaEngine):
+    """
+    Run the steps on a persistent pool of worker processes that lives as long as the simulator.
+    The population columns and the adjacency indexes sit in shared memory, each worker owns a contiguous
+    partition of the agents' chunks (stealing from the others once done) and the processes meet at a barrier once per phase
+    """
+
+    # CONSTS #
+    NAME = "process"
+    INDEX_FIELDS = ["offsets", "targets", "degrees"]
+    # the edge columns of the social index the social kernel reads (see Graph.socio_personality)
+    SOCIO_EDGE_COLUMNS = [Graph.PERSONALITY_SIMILARITY, Graph.PERSONALITY_SIDE]
+    # numba's threading layers are not fork-safe, so the workers do not inherit the main process' memory
+    START_METHOD = "forkserver"
+    # the longest the main process waits for the workers at a barrier, in seconds
+    BARRIER_TIMEOUT = 3600
+    # END - CONSTS #
+
+    def __init__(self):
+        NumbaEngine.__init__(self)
+        self.workers = []
+        self.barrier = None
+        self.locks = None
+        self.queue = None
+        self.shared = None
+        self.population = None
+        self.indexes = None
+        self._finalizer = None
+        # per phase: the time, number of chunks and number of stolen chunks of each worker in the last step
+        self.worker_stats = {}
+
+    def get_workers_count(self,
+                          sim) -> int:
+        return max(1, sim.WORKERS)
+
+    def prepare(self,
+                sim):
+        NumbaEngine.prepare(self, sim=sim)
+        indexes = (sim.graph.get_epi_index(), sim.graph.socio_personality(personality_reject=sim.params.personality_reject))
+        # (re)start the pool if the population columns, the indexes or the social edge columns were replaced since it
+        # was started
+        if self.shared is None or sim.graph.population.e_state is not self.shared["e_state"] or \
+                self.indexes[0] is not indexes[0] or self.indexes[1] is not indexes[1] or \
+                any(indexes[1].edge_columns[name] is not self.shared["socio_{}".format(name)] for name in ProcessEngine.SOCIO_EDGE_COLUMNS):
+            self.start(sim=sim)
+        self.shared["params"][:] = NumbaEngine.pack_parameters(params=sim.params)
+
+    @staticmethod
+    def is_implicit(sim) -> bool:
+        """
+        The pool shares CSR arrays, graphs with an implicit topology in either layer run in the main process
+        """
+        return isinstance(sim.graph.get_epi_index(), BlockTopology) or isinstance(sim.graph.get_socio_index(), BlockTopology)
+
+    def start(self,
+              sim):
+        """
+        Move the state into shared memory and start the workers
+        """
+        self.close()
+        population = sim.graph.population
+        epi_index = sim.graph.get_epi_index()
+        socio_index = sim.graph.get_socio_index()
+        workers_count = self.get_workers_count(sim=sim)
+        arrays = {column: getattr(population, column) for column in Population.COLUMNS}
+        for prefix, index in (("epi", epi_index), ("socio", socio_index)):
+            arrays.update({"{}_{}".format(prefix, field): getattr(index, field) for field in ProcessEngine.INDEX_FIELDS})
+        arrays.update({"socio_{}".format(name): socio_index.edge_columns[name] for name in ProcessEngine.SOCIO_EDGE_COLUMNS})
+        arrays.update({"e_state_old": population.e_state,
+                       "new_ideas": population.ideas,
+                       "dead": np.zeros(population.get_size(), dtype=np.bool_),
+                       "chunk_starts": self.chunk_starts,
+                       "social_chunk_starts": self.social_chunk_starts,
+                       "queue_ranges": np.zeros((workers_count, 2), dtype=np.int64),
+                       "worker_stats": np.zeros((workers_count, 3), dtype=np.float64),
+                       "rng_states": self.rng_states,
+                       "params": NumbaEngine.pack_parameters(params=sim.params),
+                       "control": np.zeros(2, dtype=np.int64),
+                       "error": np.zeros(ERROR_SIZE, dtype=np.uint8)})
+        self.shared = SharedArrays.create(arrays=arrays)
+
+        # from now on the simulator works on the shared copies
+        for column in Population.COLUMNS:
+            setattr(population, column, self.shared[column])
+        for prefix, index in (("epi", epi_index), ("socio", socio_index)):
+            for field in ProcessEngine.INDEX_FIELDS:
+                setattr(index, field, self.shared["{}_{}".format(prefix, field)])
+        for name in ProcessEngine.SOCIO_EDGE_COLUMNS:
+            socio_index.edge_columns[name] = self.shared["socio_{}".format(name)]
+        self.rng_states = self.shared["rng_states"]
+        self.population = population
+        self.indexes = (epi_index, socio_index)
+
+        context = multiprocessing.get_context(ProcessEngine.START_METHOD)
+        self.barrier = context.Barrier(workers_count + 1)
+        self.locks = [context.Lock() for _ in range(workers_count)]
+        self.queue = WorkStealingQueue(ranges=self.shared["queue_ranges"],
+                                       locks=self.locks)
+        self.workers = [context.Process(target=process_worker,
+                                        args=(self.shared.layout, rank, self.barrier, self.locks),
+                                        daemon=True)
+                        for rank in range(workers_count)]
+        [worker.start() for worker in self.workers]
+        stopping = threading.Event()
+        threading.Thread(target=ProcessEngine.watch_workers,
+                         args=(self.workers, self.barrier, stopping),
+                         daemon=True).start()
+        self._finalizer = weakref.finalize(self, ProcessEngine.stop_workers, self.workers, self.barrier, self.shared, stopping)
+
+    @staticmethod
+    def watch_workers(workers: list,
+                      barrier,
+                      stopping: threading.Event):
+        """
+        Break the barrier once a worker exits (e.g., it crashed), so the main process does not wait for it forever
+        """
+        multiprocessing.connection.wait([worker.sentinel for worker in workers])
+        if not stopping.is_set():
+            barrier.abort()
+
+    def wait_workers(self):
+        """
+        Meet the workers at the barrier, raise if one of them exited or they did not arrive in time
+        """
+        try:
+            self.barrier.wait(timeout=ProcessEngine.BARRIER_TIMEOUT)
+        except threading.BrokenBarrierError:
+            exit_codes = [worker.exitcode for worker in self.workers]
+            self.close()
+            raise RuntimeError("ProcessEngine: the workers did not reach the barrier (exit codes {})".format(exit_codes))
+
+    def run_phase(self,
+                  command: int,
+                  chunk_starts: np.ndarray):
+        self.queue.reset(owners=DegreeScheduler.owners(chunks_count=chunk_starts.shape[0] - 1,
+                                                       workers_count=len(self.workers)))
+        self.shared["control"][:] = (command, 0)
+        # release the workers, then wait for all of them to finish
+        self.wait_workers()
+        self.wait_workers()
+        if self.shared["control"][1] != 0:
+            rank = self.shared["control"][1] - 1
+            error = self.shared["error"].tobytes().rstrip(b"\0").decode(errors="replace")
+            raise RuntimeError("ProcessEngine: worker #{} failed\n{}".format(rank, error))
+        stats = self.shared["worker_stats"]
+        self.worker_stats[command] = {"time": stats[:, 0].copy(),
+                                      "chunks": stats[:, 1].astype(np.int64),
+                                      "stolen": stats[:, 2].astype(np.int64)}
+
+    def get_worker_stats(self) -> dict:
+        """
+        The per-worker timing of the last step, by phase name
+        """
+        return {name: self.worker_stats[command] for name, command in (("epidemiological", EPIDEMIOLOGICAL), ("social", SOCIAL))
+                if command in self.worker_stats}
+
+    def epidemiological(self,
+                        sim) -> list:
+        if self.is_implicit(sim=sim):
+            return VectorizedEngine.epidemiological(self, sim=sim)
+        self.prepare(sim=sim)
+        NumbaEngine.count_epidemiological_work(sim=sim)
+        self.shared["e_state_old"][:] = self.shared["e_state"]
+        self.run_phase(command=EPIDEMIOLOGICAL,
+                       chunk_starts=self.chunk_starts)
+        return np.flatnonzero(self.shared["dead"]).tolist()
+
+    def social(self,
+               sim):
+        if self.is_implicit(sim=sim) or sim.graph.broadcasters is not None:
+            return VectorizedEngine.social(self, sim=sim)
+        self.prepare(sim=sim)
+        NumbaEngine.count_social_work(sim=sim)
+        self.run_phase(command=SOCIAL,
+                       chunk_starts=self.social_chunk_starts)
+        population = sim.graph.population
+        population.ideas[:] = self.shared["new_ideas"]
+        population.update_pips_from_ideas(mask=population.real_mask())
+
+    @staticmethod
+    def stop_workers(workers: list,
+                     barrier,
+                     shared: SharedArrays,
+                     stopping: threading.Event):
+        stopping.set()
+        if any(worker.is_alive() for worker in workers) and not barrier.broken:
+            shared["control"][0] = STOP
+            try:
+                barrier.wait(timeout=10)
+            except Exception:
+                pass
+        for worker in workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+        shared.unlink()
+
+    def close(self):
+        """
+        Stop the workers and move the state back to private memory
+        """
+        if self.shared is None:
+            return
+        for column in Population.COLUMNS:
+            setattr(self.population, column, getattr(self.population, column).copy())
+        for index in self.indexes:
+            for field in ProcessEngine.INDEX_FIELDS:
+                setattr(index, field, getattr(index, field).copy())
+        for name in ProcessEngine.SOCIO_EDGE_COLUMNS:
+            self.indexes[1].edge_columns[name] = self.indexes[1].edge_columns[name].copy()
+        self.rng_states = self.rng_states.copy()
+        self._finalizer()
+        self.shared.close()
+        self.shared = None
+        self.workers = []
+        self.barrier = None
+        self.locks = None
+        self.queue = None
+        self.population = None
+        self.indexes = None
+
+    def __getstate__(self):
+        # the pool is not part of the state, it is restarted on the next step
+        state = self.__dict__.copy()
+        state.update({"workers": [], "barrier": None, "locks": None, "queue": None, "shared": None, "population": None,
+                      "indexes": None, "_finalizer": None})
+        if self.rng_states is not None:
+            state["rng_states"] = self.rng_states.copy()
+        return state
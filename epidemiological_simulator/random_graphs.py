@@ -0,0 +1,166 @@
+# library imports
+import random
+import numpy as np
+from numba import njit
+
+# project imports
+
+
+@njit(cache=True)
+def preferential_attachment_numba(node_count: int, edges_per_node: int, seed: int):
+    """
+    Batagelj-Brandes linear time preferential attachment: picking a uniform end point of the edges so far
+    is picking a node with probability proportional to its degree
+    """
+    np.random.seed(seed)
+    seed_size = edges_per_node + 1
+    # the first nodes are connected as a clique
+    clique_edges = seed_size * (seed_size - 1) // 2
+    edge_count = clique_edges + (node_count - seed_size) * edges_per_node
+    sources = np.empty(edge_count, dtype=np.int64)
+    targets = np.empty(edge_count, dtype=np.int64)
+    position = 0
+    for i in range(seed_size):
+        for j in range(i):
+            sources[position] = i
+            targets[position] = j
+            position += 1
+    for node in range(seed_size, node_count):
+        for _ in range(edges_per_node):
+            end_point = np.random.randint(0, 2 * position)
+            sources[position] = node
+            targets[position] = sources[end_point // 2] if end_point % 2 == 0 else targets[end_point // 2]
+            position += 1
+    return sources, targets
+
+
+class RandomGraphs:
+    """
+    Vectorized random edge generators that emit (sources, targets) arrays of directed edges without self-loops or
+    duplicates, ready for an AdjacencyIndex
+    """
+
+    # CONSTS #
+    # sample a bit more than needed in each batch, as some candidates are dropped
+    OVERSAMPLE = 1.1
+    # END - CONSTS #
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def default_rng(rng: np.random.Generator = None) -> np.random.Generator:
+        """
+        Without an explicit generator, derive one from the 'random' module so random.seed keeps graphs reproducible
+        """
+        return rng if rng is not None else np.random.default_rng(random.getrandbits(64))
+
+    @staticmethod
+    def pack(sources: np.ndarray,
+             targets: np.ndarray,
+             node_count: int) -> np.ndarray:
+        """
+        A single 64-bit key per edge
+        """
+        return sources.astype(np.uint64) * np.uint64(node_count) + targets.astype(np.uint64)
+
+    @staticmethod
+    def unpack(keys: np.ndarray,
+               node_count: int) -> tuple:
+        return (keys // np.uint64(node_count)).astype(np.int64), (keys % np.uint64(node_count)).astype(np.int64)
+
+    @staticmethod
+    def unique_edges(sources: np.ndarray,
+                     targets: np.ndarray,
+                     node_count: int) -> tuple:
+        """
+        Drop self-loops and repeated edges (keeping the first appearance of each edge, in order)
+        """
+        no_loops = sources != targets
+        keys = RandomGraphs.pack(sources=sources[no_loops],
+                                 targets=targets[no_loops],
+                                 node_count=node_count)
+        _, first = np.unique(keys, return_index=True)
+        return RandomGraphs.unpack(keys=keys[np.sort(first)],
+                                   node_count=node_count)
+
+    @staticmethod
+    def add_random_edges(node_count: int,
+                         edge_count: int,
+                         sources: np.ndarray = None,
+                         targets: np.ndarray = None,
+                         rng: np.random.Generator = None) -> tuple:
+        """
+        Keep the given (unique) edges and add uniformly random new ones until there are edge_count edges in total
+        """
+        rng = RandomGraphs.default_rng(rng=rng)
+        if edge_count > node_count * (node_count - 1):
+            raise ValueError("RandomGraphs.add_random_edges: {} nodes cannot have {} edges".format(node_count, edge_count))
+        keys = RandomGraphs.pack(sources=np.zeros(0, dtype=np.int64) if sources is None else np.asarray(sources),
+                                 targets=np.zeros(0, dtype=np.int64) if targets is None else np.asarray(targets),
+                                 node_count=node_count)
+        while keys.shape[0] < edge_count:
+            batch = int((edge_count - keys.shape[0]) * RandomGraphs.OVERSAMPLE) + 16
+            candidate_sources = rng.integers(0, node_count, size=batch)
+            candidate_targets = rng.integers(0, node_count, size=batch)
+            no_loops = candidate_sources != candidate_targets
+            candidates = RandomGraphs.pack(sources=candidate_sources[no_loops],
+                                           targets=candidate_targets[no_loops],
+                                           node_count=node_count)
+            # new and unique candidates only, in the order they were sampled
+            candidates = candidates[~np.isin(candidates, keys)]
+            _, first = np.unique(candidates, return_index=True)
+            candidates = candidates[np.sort(first)]
+            keys = np.concatenate((keys, candidates[:edge_count - keys.shape[0]]))
+        return RandomGraphs.unpack(keys=keys,
+                                   node_count=node_count)
+
+    @staticmethod
+    def erdos_renyi(node_count: int,
+                    edge_count: int,
+                    rng: np.random.Generator = None) -> tuple:
+        """
+        G(n, m): edge_count directed edges picked uniformly at random
+        """
+        return RandomGraphs.add_random_edges(node_count=node_count,
+                                             edge_count=edge_count,
+                                             rng=rng)
+
+    @staticmethod
+    def configuration_model(degrees: np.ndarray,
+                            rng: np.random.Generator = None) -> tuple:
+        """
+        The erased configuration model: the degree stubs are matched at random, self-loops and repeated edges are dropped.
+        Each matched pair is an edge in both directions
+        """
+        rng = RandomGraphs.default_rng(rng=rng)
+        degrees = np.asarray(degrees, dtype=np.int64)
+        stubs = np.repeat(np.arange(degrees.shape[0], dtype=np.int64), degrees)
+        rng.shuffle(stubs)
+        # an odd stub is left out
+        stubs = stubs[:stubs.shape[0] - stubs.shape[0] % 2].reshape(-1, 2)
+        return RandomGraphs.unique_edges(sources=np.concatenate((stubs[:, 0], stubs[:, 1])),
+                                         targets=np.concatenate((stubs[:, 1], stubs[:, 0])),
+                                         node_count=degrees.shape[0])
+
+    @staticmethod
+    def preferential_attachment(node_count: int,
+                                edges_per_node: int,
+                                rng: np.random.Generator = None) -> tuple:
+        """
+        Barabasi-Albert: every new node connects to edges_per_node nodes picked in proportion to their degree.
+        Repeated picks are dropped and each edge is in both directions
+        """
+        rng = RandomGraphs.default_rng(rng=rng)
+        if node_count <= edges_per_node:
+            raise ValueError("RandomGraphs.preferential_attachment: need more than {} nodes".format(edges_per_node))
+        sources, targets = preferential_attachment_numba(node_count, edges_per_node, int(rng.integers(0, 2 ** 31)))
+        return RandomGraphs.unique_edges(sources=np.concatenate((sources, targets)),
+                                         targets=np.concatenate((targets, sources)),
+                                         node_count=node_count)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<RandomGraphs>"
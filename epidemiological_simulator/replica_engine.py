@@ -0,0 +1,352 @@
+# library imports
+import numpy as np
+
+# project imports
+from epidemiological_simulator.graph import Graph
+from epidemiological_simulator.sim import Simulator
+from epidemiological_simulator.population import Population
+from epidemiological_simulator.vectorized_engine import VectorizedEngine
+from epidemiological_simulator.math_utils import cosine_similarity_rows
+from epidemiological_simulator.epidemiological_state import EpidemiologicalState
+
+
+class ReplicatedIndex:
+    """
+    R replicas of a layer of the graph over R * N agents, agent r * N + i is agent i of replica r.
+    The structure (an AdjacencyIndex or an implicit topology) is shared by all the replicas, the agents removed in
+    each replica are tracked with a mask and the live degrees
+    """
+
+    def __init__(self,
+                 base,
+                 replicas: int,
+                 rng: np.random.Generator,
+                 alive: np.ndarray = None):
+        self.base = base
+        self.replicas = replicas
+        self.node_count = base.get_size()
+        self.rng = rng
+        self.alive = alive if alive is not None else np.ones(replicas * self.node_count, dtype=np.bool_)
+        # the number of live out-neighbors of each agent in its replica
+        self.degrees = np.tile(base.degrees, replicas).astype(np.int32)
+        self.degrees[~self.alive] = 0
+        self._reverse = None
+
+    def get_size(self) -> int:
+        return self.replicas * self.node_count
+
+    def get_edge_count(self) -> int:
+        return int(self.degrees.sum())
+
+    def get_tombstones_count(self) -> int:
+        return 0
+
+    def neighbors(self,
+                  id: int) -> np.ndarray:
+        replica_start = (id // self.node_count) * self.node_count
+        answer = self.base.neighbors(id=id % self.node_count) + replica_start
+        return answer[self.alive[answer]]
+
+    def sample_neighbors(self,
+                         ids: np.ndarray,
+                         uniforms: np.ndarray) -> tuple:
+        """
+        Pick one live out-neighbor for each of the given agents, in its own replica. A pick of an agent removed in
+        that replica is drawn again, which keeps the pick uniform over the live neighbors
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        local = ids % self.node_count
+        replica_start = ids - local
+        has_neighbors = self.degrees[ids] > 0
+        picked = ids.copy()
+        picked[has_neighbors] = self.base.sample_neighbors(ids=local[has_neighbors],
+                                                           uniforms=uniforms[has_neighbors])[0] + replica_start[has_neighbors]
+        redo = np.flatnonzero(has_neighbors & ~self.alive[picked])
+        while redo.shape[0] > 0:
+            picked[redo] = self.base.sample_neighbors(ids=local[redo],
+                                                      uniforms=self.rng.random(redo.shape[0]))[0] + replica_start[redo]
+            redo = redo[~self.alive[picked[redo]]]
+        return picked, has_neighbors
+
+    def live_edges(self) -> tuple:
+        """
+        The (sources, targets) arrays of the live edges of all the replicas
+        """
+        sources, targets = self.base.live_edges()
+        replica_starts = np.repeat(np.arange(self.replicas, dtype=np.int64) * self.node_count, sources.shape[0])
+        sources = np.tile(sources.astype(np.int64), self.replicas) + replica_starts
+        targets = np.tile(targets.astype(np.int64), self.replicas) + replica_starts
+        live = self.alive[sources] & self.alive[targets]
+        return sources[live], targets[live]
+
+    def neighbor_sum(self,
+                     values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        sources, targets = self.live_edges()
+        answer = np.zeros(values.shape, dtype=np.float64)
+        np.add.at(answer, sources, values[targets])
+        return answer
+
+    def get_reverse(self):
+        if self._reverse is None:
+            self._reverse = ReplicatedIndex(base=self.base.get_reverse(),
+                                            replicas=self.replicas,
+                                            rng=self.rng,
+                                            alive=self.alive.copy())
+            self._reverse.update_degrees(ids=np.flatnonzero(~self.alive))
+        return self._reverse
+
+    def add_nodes(self,
+                  count: int):
+        raise ValueError("ReplicatedIndex: agents cannot be added to the replicas")
+
+    def remove_node(self,
+                    id: int):
+        """
+        Remove an agent from its replica: it and the live edges into it are no longer counted
+        """
+        if not self.alive[id]:
+            return
+        self.alive[id] = False
+        self.degrees[id] = 0
+        self.update_degrees(ids=np.array([id]))
+        if self._reverse is not None:
+            self._reverse.remove_node(id=id)
+
+    def update_degrees(self,
+                       ids: np.ndarray):
+        """
+        Decrease the live degree of the live in-neighbors of the given removed agents
+        """
+        reverse = self.base.get_reverse()
+        for id in ids:
+            replica_start = id - id % self.node_count
+            sources = reverse.neighbors(id=id % self.node_count) + replica_start
+            sources = sources[self.alive[sources]]
+            np.subtract.at(self.degrees, sources, 1)
+
+    def compact(self,
+                force: bool = False):
+        pass
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<ReplicatedIndex: {} x {}>".format(self.replicas,
+                                                   self.base)
+
+
+class ReplicaEngine(VectorizedEngine):
+    """
+    The vectorized engine over replicated graphs: the epidemiological step runs for all the replicas at once through
+    the replicated index, and the social step computes the edges of all the replicas in blocks, with the personality
+    similarity of each edge (shared by all the replicas) computed once
+    """
+
+    # CONSTS #
+    NAME = "replicas"
+    # the number of (replica, edge) pairs computed at once in the social step
+    BLOCK_ELEMENTS = 2 ** 22
+    # END - CONSTS #
+
+    def __init__(self):
+        VectorizedEngine.__init__(self)
+        self._edges = None
+        self._personality_similarity = None
+
+    def social(self,
+               sim):
+        index = sim.graph.get_socio_index()
+        population = sim.graph.population
+        replicas = index.replicas
+        node_count = index.node_count
+        if self._edges is None:
+            self._edges = index.base.live_edges()
+            personality = sim.base_population.personality_vector
+            # virtual agents take everyone's ideas as they are, as in the per-agent logic
+            self._personality_similarity = np.where(sim.base_population.is_virtual[self._edges[0]],
+                                                    1.0,
+                                                    cosine_similarity_rows(personality[self._edges[0]], personality[self._edges[1]]))
+        sources, targets = self._edges
+        ideas = population.ideas.reshape(replicas, node_count, Population.IDEAS_SIZE)
+        alive = index.alive.reshape(replicas, node_count)
+        new_ideas = population.ideas.copy().reshape(replicas, node_count, Population.IDEAS_SIZE)
+        if sim.recorder is not None:
+            VectorizedEngine.count_work(sim=sim,
+                                        phase="social",
+                                        agents=np.count_nonzero(population.real_mask()),
+                                        edges=sources.shape[0] * replicas + VectorizedEngine.broadcast_pairs_count(sim=sim))
+        broadcast_influence, broadcast_score, reached = None, None, None
+        if sim.graph.broadcasters is not None:
+            broadcast_influence, broadcast_score, reached = VectorizedEngine.broadcast_influence(population=population,
+                                                                                                 broadcasters=sim.graph.broadcasters,
+                                                                                                 alive=index.alive,
+                                                                                                 params=sim.params,
+                                                                                                 mask=population.real_mask())
+        block_size = max(1, ReplicaEngine.BLOCK_ELEMENTS // max(1, sources.shape[0]))
+        for start in range(0, replicas, block_size):
+            block = slice(start, min(start + block_size, replicas))
+            block_replicas = block.stop - block.start
+            target_ideas = ideas[block][:, targets]
+            sign = VectorizedEngine.influence_sign(idea_similarity=1 - cosine_similarity_rows(ideas[block][:, sources], target_ideas),
+                                                   personality_similarity=self._personality_similarity,
+                                                   params=sim.params)
+            # the edges of removed agents are not there any more
+            sign *= alive[block][:, targets] & alive[block][:, sources]
+            # ignored neighbors add nothing, even if their ideas are NaN
+            weights = sign * self._personality_similarity
+            target_ideas = np.where(sign[:, :, None] != 0, target_ideas, 0)
+            # a segment sum per (replica, source) agent
+            rows = (np.arange(block_replicas)[:, None] * node_count + sources).ravel()
+            total_influence = np.bincount(rows,
+                                          weights=np.where(sign != 0, self._personality_similarity, 0).ravel(),
+                                          minlength=block_replicas * node_count)
+            score = np.stack([np.bincount(rows, weights=(weights * target_ideas[:, :, k]).ravel(), minlength=block_replicas * node_count)
+                              for k in range(Population.IDEAS_SIZE)], axis=1)
+            updated = index.degrees.reshape(replicas, node_count)[block].ravel() > 0
+            if broadcast_influence is not None:
+                agents = slice(block.start * node_count, block.stop * node_count)
+                total_influence += broadcast_influence[agents]
+                score += broadcast_score[agents]
+                updated |= reached[agents]
+            block_ideas = ideas[block].reshape(-1, Population.IDEAS_SIZE)
+            # no influence at all gives NaN ideas, as in the per-agent logic
+            with np.errstate(divide="ignore", invalid="ignore"):
+                new_ideas[block].reshape(-1, Population.IDEAS_SIZE)[updated] = block_ideas[updated] + \
+                    sim.params.lamda * score[updated] / total_influence[updated, None]
+        real = population.real_mask()
+        population.ideas[real] = np.clip(new_ideas.reshape(-1, Population.IDEAS_SIZE)[real], 0, 1)
+        population.update_pips_from_ideas(mask=real)
+
+
+class ReplicaSimulator(Simulator):
+    """
+    R stochastic replicas of a simulator, from its current state, run together over the shared graph structure.
+    The state is a (replicas x agents) array per column (flattened in the population store) and each day's transitions
+    and social updates are computed for all the replicas in a single vectorized pass.
+    The personality vectors never change, so the population store of the replicas holds the N shared ones - only the
+    replica engine's social step reads them.
+    The trajectories are one row per replica per day, as (replicas, days, ...) arrays
+    """
+
+    def __init__(self,
+                 sim: Simulator,
+                 replicas: int,
+                 seed: int = None):
+        self.replicas = replicas
+        sim.engine.sync(sim=sim)
+        self.base_population = sim.graph.population
+        node_count = self.base_population.get_size()
+        population = Population(size=0)
+        for column in Population.COLUMNS:
+            values = getattr(self.base_population, column)
+            setattr(population, column, values if column == "personality_vector" else
+                    np.tile(values, (replicas,) + (1,) * (values.ndim - 1)))
+        rng = np.random.default_rng(seed)
+        alive = np.tile(sim.graph.alive, replicas)
+        graph = Graph.from_indexes(population=population,
+                                   epi_index=ReplicatedIndex(base=sim.graph.get_epi_index(),
+                                                             replicas=replicas,
+                                                             rng=rng,
+                                                             alive=alive.copy()),
+                                   socio_index=ReplicatedIndex(base=sim.graph.get_socio_index(),
+                                                               replicas=replicas,
+                                                               rng=rng,
+                                                               alive=alive.copy()))
+        graph.alive = alive
+        if sim.graph.broadcasters is not None:
+            graph.broadcasters = sim.graph.broadcasters.tile(replicas=replicas,
+                                                             node_count=node_count)
+        Simulator.__init__(self,
+                           graph=graph,
+                           pip=sim.pip,
+                           max_time=sim.max_time,
+                           params=sim.params)
+        self.engine = ReplicaEngine()
+        self.rng = rng
+        self.step = sim.step
+        self.node_count = node_count
+        # the number of recorded days of each replica (it stops recording once extinct, with stop_early), and per
+        # step the replicas that recorded its day twice (see run)
+        self.lengths = np.zeros(replicas, dtype=np.int64)
+        self.repeated = []
+
+    def run(self,
+            stop_early: bool = False,
+            checkpoint_path: str = None,
+            checkpoint_every: int = Simulator.CHECKPOINT_EVERY):
+        """
+        Run all the replicas until max_time. With stop_early, a replica stops recording once no agent is infected
+        and the run ends when all of them did. Without it, as in Simulator.run, a day with no infected agent is
+        recorded twice in the replica's trajectories
+        """
+        if checkpoint_path is not None:
+            raise ValueError("ReplicaSimulator: checkpoints are not supported")
+        stopped = np.zeros(self.replicas, dtype=np.bool_)
+        while self.step <= self.max_time and not stopped.all():
+            self.run_step()
+            last = self.epi_dist[-1]
+            extinct = (last[:, int(EpidemiologicalState.Is)] == 0) & (last[:, int(EpidemiologicalState.Ia)] == 0)
+            if stop_early:
+                self.lengths[~stopped] += 1
+                self.repeated.append(np.zeros(self.replicas, dtype=np.bool_))
+                stopped |= extinct
+            else:
+                self.lengths += 1 + extinct
+                self.repeated.append(extinct)
+
+    def gather_epi_state(self):
+        population = self.graph.population
+        real = population.real_mask()
+        replica = np.arange(population.get_size()) // self.node_count
+        return np.bincount(replica[real] * EpidemiologicalState.STATE_COUNT + population.e_state[real],
+                           minlength=self.replicas * EpidemiologicalState.STATE_COUNT).reshape(self.replicas, -1)
+
+    def gather_ideas_state(self):
+        real = self.base_population.real_mask()
+        ideas = self.graph.population.ideas.reshape(self.replicas, self.node_count, Population.IDEAS_SIZE)[:, real]
+        return np.nanmean(ideas, axis=1), np.nanstd(ideas, axis=1)
+
+    def get_trajectories(self) -> dict:
+        """
+        The (replicas, days, ...) arrays of the epidemiological states and the ideas' mean and std, each replica's days
+        as Simulator.run records them (see run). Days after a replica's last recorded day (see lengths) repeat it
+        """
+        steps = len(self.epi_dist)
+        repeated = np.stack(self.repeated, axis=1) if len(self.repeated) == steps else np.zeros((self.replicas, steps), dtype=np.bool_)
+        # the step of each recorded day of each replica
+        days = np.zeros((self.replicas, max(steps, int(self.lengths.max()))), dtype=np.int64)
+        for replica in range(self.replicas):
+            replica_days = np.repeat(np.arange(steps), 1 + repeated[replica])[:self.lengths[replica]]
+            days[replica, :replica_days.shape[0]] = replica_days
+            days[replica, replica_days.shape[0]:] = replica_days[-1]
+        rows = np.arange(self.replicas)[:, None]
+        return {name: np.stack(getattr(self, name), axis=1)[rows, days]
+                for name in ("epi_dist", "ideas_dist_mean", "ideas_dist_std")}
+
+    def get_max_infected(self) -> np.ndarray:
+        epi_dist = self.get_trajectories()["epi_dist"]
+        return (epi_dist[:, :, int(EpidemiologicalState.Ia)] + epi_dist[:, :, int(EpidemiologicalState.Is)]).max(axis=1)
+
+    def get_max_infected_portion(self) -> np.ndarray:
+        return self.get_max_infected() / self.node_count
+
+    def mean_r_zero(self) -> np.ndarray:
+        """
+        Simulator.mean_r_zero of each replica, over its recorded days
+        """
+        epi_dist = self.get_trajectories()["epi_dist"].astype(np.float64)
+        infected = epi_dist[:, :, int(EpidemiologicalState.Is)] + epi_dist[:, :, int(EpidemiologicalState.Ia)]
+        recovered = epi_dist[:, :, int(EpidemiologicalState.Rf)] + epi_dist[:, :, int(EpidemiologicalState.Rp)]
+        infected_change = np.diff(infected, axis=1)
+        recovered_change = np.diff(recovered, axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r_zero = np.where(recovered_change != 0, infected_change / recovered_change, infected_change)
+        recorded = np.arange(r_zero.shape[1])[None, :] < self.lengths[:, None] - 1
+        return np.where(recorded, r_zero, 0).sum(axis=1) / (self.lengths - 1)
+
+    def __str__(self):
+        return "<ReplicaSim: {} replicas, {}/{}>".format(self.replicas,
+                                                         self.step,
+                                                         self.max_time)
@@ -0,0 +1,101 @@
+# library imports
+import numpy as np
+
+# project imports
+
+
+class DegreeScheduler:
+    """
+    Split the agents into contiguous chunks of about the same amount of work, where the work of an agent grows with its
+    degree. A hub that is heavier than a whole chunk gets a chunk of its own
+    """
+
+    # CONSTS #
+    CHUNKS_PER_WORKER = 8
+    # END - CONSTS #
+
+    def __init__(self,
+                 chunks_per_worker: int = CHUNKS_PER_WORKER):
+        self.chunks_per_worker = chunks_per_worker
+
+    def chunk_starts(self,
+                     degrees: np.ndarray,
+                     workers_count: int) -> np.ndarray:
+        """
+        The first agent of each chunk (and the number of agents at the end), for the given number of workers
+        """
+        return DegreeScheduler.weighted_chunks(weights=degrees.astype(np.float64) + 1,
+                                               chunks_count=max(1, workers_count * self.chunks_per_worker))
+
+    @staticmethod
+    def weighted_chunks(weights: np.ndarray,
+                        chunks_count: int) -> np.ndarray:
+        """
+        Cut the agents into (at most) chunks_count contiguous ranges of about the same total weight
+        """
+        size = weights.shape[0]
+        if size == 0:
+            return np.zeros(1, dtype=np.int64)
+        cumulative = np.cumsum(weights)
+        cuts = np.searchsorted(cumulative, cumulative[-1] * np.arange(1, chunks_count) / chunks_count, side="right")
+        return np.unique(np.concatenate(([0], cuts, [size]))).astype(np.int64)
+
+    @staticmethod
+    def owners(chunks_count: int,
+               workers_count: int) -> np.ndarray:
+        """
+        The first chunk owned by each worker - contiguous ranges of about the same number of (equally heavy) chunks
+        """
+        return np.linspace(0, chunks_count, workers_count + 1).round().astype(np.int64)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<DegreeScheduler: {} chunks per worker>".format(self.chunks_per_worker)
+
+
+class WorkStealingQueue:
+    """
+    The chunks of a phase, as a range per worker in a (shared) array.
+    A worker takes chunks from the front of its own range and, once it is empty, steals from the back of the fullest range
+    """
+
+    def __init__(self,
+                 ranges: np.ndarray,
+                 locks: list):
+        # ranges[w] = (next chunk to take, end of the range) of worker w
+        self.ranges = ranges
+        self.locks = locks
+
+    def reset(self,
+              owners: np.ndarray):
+        self.ranges[:, 0] = owners[:-1]
+        self.ranges[:, 1] = owners[1:]
+
+    def take(self,
+             rank: int) -> tuple:
+        """
+        The next chunk for the worker and whether it was stolen, or (-1, False) when the phase is done
+        """
+        with self.locks[rank]:
+            if self.ranges[rank, 0] < self.ranges[rank, 1]:
+                chunk = self.ranges[rank, 0]
+                self.ranges[rank, 0] += 1
+                return int(chunk), False
+        while True:
+            # the fullest range is only a hint, it is checked again under the victim's lock
+            remaining = self.ranges[:, 1] - self.ranges[:, 0]
+            victim = int(np.argmax(remaining))
+            if remaining[victim] <= 0:
+                return -1, False
+            with self.locks[victim]:
+                if self.ranges[victim, 0] < self.ranges[victim, 1]:
+                    self.ranges[victim, 1] -= 1
+                    return int(self.ranges[victim, 1]), True
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<WorkStealingQueue: {} workers>".format(self.ranges.shape[0])
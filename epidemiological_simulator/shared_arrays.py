@@ -0,0 +1,126 @@
+# library imports
+import os
+import mmap
+import numpy as np
+from multiprocessing import shared_memory
+
+# project imports
+
+
+class SharedArrays:
+    """
+    A set of named NumPy arrays living in shared memory blocks.
+    The owner creates them, other processes attach to them by their layout without copying
+    """
+
+    # CONSTS #
+    # where the POSIX shared memory blocks are visible as files (Linux)
+    SHM_FOLDER = "/dev/shm"
+    # END - CONSTS #
+
+    def __init__(self,
+                 blocks: dict,
+                 arrays: dict,
+                 layout: dict,
+                 is_owner: bool):
+        self.blocks = blocks
+        self.arrays = arrays
+        self.layout = layout
+        self.is_owner = is_owner
+
+    @staticmethod
+    def create(arrays: dict):
+        """
+        Copy the given arrays into new shared memory blocks
+        """
+        blocks = {}
+        shared = {}
+        layout = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            # zero-size blocks are not allowed
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            shared[name] = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            shared[name][...] = array
+            blocks[name] = block
+            layout[name] = (block.name, array.shape, array.dtype.str)
+        return SharedArrays(blocks=blocks,
+                            arrays=shared,
+                            layout=layout,
+                            is_owner=True)
+
+    @staticmethod
+    def attach(layout: dict,
+               writeable: bool = True):
+        """
+        Map the arrays of a layout created by another process
+        """
+        blocks = {}
+        arrays = {}
+        for name, (block_name, shape, dtype) in layout.items():
+            blocks[name] = SharedArrays._open_block(name=block_name)
+            arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=blocks[name].buf)
+            arrays[name].flags.writeable = writeable
+        return SharedArrays(blocks=blocks,
+                            arrays=arrays,
+                            layout=dict(layout),
+                            is_owner=False)
+
+    @staticmethod
+    def attach_private(layout: dict) -> dict:
+        """
+        Private copy-on-write maps of the arrays of a layout created by another process: writes stay in this process
+        and never reach the blocks, and the pages no one writes to stay shared. Where the blocks are not visible as
+        files, each array is copied instead
+        """
+        arrays = {}
+        for name, (block_name, shape, dtype) in layout.items():
+            dtype = np.dtype(dtype)
+            count = int(np.prod(shape))
+            path = os.path.join(SharedArrays.SHM_FOLDER, block_name.lstrip("/"))
+            if count > 0 and os.path.exists(path):
+                with open(path, "rb") as block_file:
+                    buffer = mmap.mmap(block_file.fileno(), count * dtype.itemsize, access=mmap.ACCESS_COPY)
+                arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count).reshape(shape)
+            else:
+                attached = SharedArrays.attach(layout={name: layout[name]},
+                                               writeable=False)
+                arrays[name] = attached[name].copy()
+                attached.close()
+        return arrays
+
+    @staticmethod
+    def _open_block(name: str):
+        # only the owner should track (and eventually unlink) the block
+        try:
+            return shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            return shared_memory.SharedMemory(name=name)
+
+    def close(self):
+        """
+        Drop this process' mapping of the blocks, the arrays are not usable afterwards
+        """
+        self.arrays = {}
+        for block in self.blocks.values():
+            block.close()
+
+    def unlink(self):
+        """
+        Free the blocks themselves, only the owner should do it
+        """
+        if self.is_owner:
+            for block in self.blocks.values():
+                try:
+                    block.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<SharedArrays: {}>".format(", ".join(self.layout))
@@ -1,14 +1,26 @@
 # library imports
+import os
+import copy
 import time
 import pickle
 import random
-import concurrent.futures
+import contextlib
+import numpy as np
 
 # project imports
 from epidemiological_simulator.math_utils import *
 from epidemiological_simulator.graph import Graph
 from pips.pip import PIP
-from epidemiological_simulator.params import ModelParameter
+from epidemiological_simulator.engine import Engine
+from epidemiological_simulator.vectorized_engine import VectorizedEngine
+from epidemiological_simulator.numba_engine import NumbaEngine
+from epidemiological_simulator.process_engine import ProcessEngine
+from epidemiological_simulator.event_engine import EventEngine
+from epidemiological_simulator.frontier_engine import FrontierEngine
+from epidemiological_simulator.snapshot import Snapshot
+from epidemiological_simulator.trajectory import Trajectory
+from epidemiological_simulator.frozen_arrays import FrozenArrays
+from epidemiological_simulator.params import SimulationParameters
 from epidemiological_simulator.vaccine_reduction import vaccine_reduction
 from epidemiological_simulator.epidemiological_state import EpidemiologicalState
 
@@ -21,49 +33,140 @@ class Simulator:
     # CONSTS #
     WORKERS = 8
     DEBUG = True
+    CHECKPOINT_EVERY = 10
+    ENGINES = {Engine.NAME: Engine,
+               VectorizedEngine.NAME: VectorizedEngine,
+               NumbaEngine.NAME: NumbaEngine,
+               ProcessEngine.NAME: ProcessEngine,
+               EventEngine.NAME: EventEngine,
+               FrontierEngine.NAME: FrontierEngine}
     # END - CONSTS #
 
     def __init__(self,
                  graph: Graph,
                  pip: PIP,
-                 max_time: int):
+                 max_time: int,
+                 engine: str = Engine.NAME,
+                 seed: int = None,
+                 params: SimulationParameters = None):
         # sim settings
         self.graph = graph
         self.pip = pip
+        # the model parameters of this simulator, the current ModelParameter values by default
+        self.params = params if params is not None else SimulationParameters.default()
+        try:
+            self.engine = Simulator.ENGINES[engine]()
+        except KeyError:
+            raise ValueError("Simulator: unknown engine '{}', pick one of {}".format(engine, list(Simulator.ENGINES)))
+        # the random stream of the array-based engines (the per-agent logic uses the 'random' module)
+        self.rng = np.random.default_rng(seed)
 
         # technical
         self.max_time = max_time
+        # the per-step instrumentation (see StepRecorder), None does not record
+        self.recorder = None
 
         # operation
         self.step = 0
 
         # later analysis
-        self.epi_dist = []
-        self.ideas_dist_mean = []
-        self.ideas_dist_std = []
+        self.epi_dist = Trajectory()
+        self.ideas_dist_mean = Trajectory()
+        self.ideas_dist_std = Trajectory()
 
     # logic #
 
     def save(self,
              path: str):
-        with open(path, "wb") as sim_file:
-            pickle.dump(self, sim_file)
+        """
+        Write the simulator as a columnar snapshot folder. Saving again into the same folder only writes what changed
+        """
+        Snapshot.save(sim=self,
+                      path=path)
 
     @staticmethod
     def load(path: str):
-        with open(path, "rb") as sim_file:
-            answer = pickle.load(sim_file)
+        """
+        Load a snapshot folder (its arrays are memory-mapped), or a simulator pickled by older versions
+        """
+        if os.path.isfile(path):
+            with open(path, "rb") as sim_file:
+                return pickle.load(sim_file)
+        snapshot = Snapshot.read(path=path)
+        answer = Simulator(graph=snapshot.get_graph(),
+                           pip=snapshot.get_pip(),
+                           max_time=snapshot.manifest["max_time"],
+                           engine=snapshot.manifest["engine"],
+                           params=snapshot.get_params())
+        snapshot.restore(sim=answer)
         return answer
 
+    def fork(self):
+        """
+        A branch of the simulator from its current state (e.g., to try an intervention from this day on)
+        """
+        return self.fork_many(count=1)[0]
+
+    def fork_many(self,
+                  count: int) -> list:
+        """
+        Branches of the simulator from its current state. The state arrays are frozen once and each branch maps them
+        copy-on-write, so arrays no branch writes to (the graph structure, the personality vectors) exist once in
+        memory and the others are copied page by page as a branch writes to them. Each branch gets an independent
+        random stream seeded from this simulator's one (the 'random' module of the per-agent logic is global and
+        shared by all)
+        """
+        frozen = FrozenArrays.freeze(arrays={name: values for name, values in Snapshot.collect_arrays(sim=self).items()
+                                             if not name.startswith("engine.")})
+        index_kinds = Snapshot.index_kinds(sim=self)
+        answer = []
+        # a seed sequence drawn from this simulator's stream (Generator.spawn needs numpy 1.25)
+        for seed_sequence in np.random.SeedSequence(int(self.rng.integers(2 ** 63))).spawn(count):
+            rng = np.random.default_rng(seed_sequence)
+            branch = Simulator(graph=Snapshot.build_graph(arrays=frozen.map(),
+                                                          index_kinds=index_kinds),
+                               pip=copy.deepcopy(self.pip),
+                               max_time=self.max_time,
+                               engine=self.engine.NAME,
+                               params=self.params)
+            branch.rng = rng
+            branch.step = self.step
+            branch.epi_dist = Trajectory(rows=[list(value) for value in self.epi_dist])
+            branch.ideas_dist_mean = Trajectory(rows=[value.copy() for value in self.ideas_dist_mean])
+            branch.ideas_dist_std = Trajectory(rows=[value.copy() for value in self.ideas_dist_std])
+            answer.append(branch)
+        frozen.close()
+        return answer
+
+    def close(self):
+        """
+        Free the resources of the step engine (e.g., its worker processes) and of the recorder
+        """
+        self.engine.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
     def run(self,
-            stop_early: bool = False):
+            stop_early: bool = False,
+            checkpoint_path: str = None,
+            checkpoint_every: int = CHECKPOINT_EVERY,
+            fast_forward: bool = True):
+        """
+        Run the simulation until max_time. With a checkpoint path, the simulator is saved there every checkpoint_every
+        steps and at the end, and Simulator.load(checkpoint_path).run(...) resumes the run after a crash.
+        With fast_forward, once the epidemic is extinct (see is_extinct) the epidemiological step is advanced in closed
+        form and only the social step runs, and once the ideas stop changing the remaining days are filled at once
+        (see fill_steady_state). The trajectories are the same as without it, the random streams are not
+        """
+        extinct = False
         while self.step <= self.max_time:
+            ideas = self.graph.population.ideas.copy() if extinct else None
             if Simulator.DEBUG:
                 print("Performing step #{}".format(self.step))
-                time_calc = self.run_step()
+                time_calc = self.run_step(extinct=extinct)
                 print("Computing time: {} seconds".format(time_calc))
             else:
-                self.run_step()
+                self.run_step(extinct=extinct)
 
             # edge case
             if self.step > 0 and self.epi_dist[-1][int(EpidemiologicalState.Is)] == 0 and self.epi_dist[-1][int(EpidemiologicalState.Ia)] == 0:
@@ -74,53 +177,180 @@ class Simulator:
                     self.ideas_dist_mean.append(self.ideas_dist_mean[-1].copy())
                     self.ideas_dist_std.append(self.ideas_dist_std[-1].copy())
 
-    def run_step(self):
+            if checkpoint_path is not None and self.step % checkpoint_every == 0:
+                self.save(path=checkpoint_path)
+
+            # a social step that changed nothing will change nothing on any of the next days as well
+            if extinct and np.array_equal(ideas, self.graph.population.ideas, equal_nan=True):
+                self.fill_steady_state()
+            extinct = fast_forward and self.is_extinct()
+        self.engine.sync(sim=self)
+        if self.recorder is not None:
+            self.recorder.close()
+        if checkpoint_path is not None:
+            self.save(path=checkpoint_path)
+
+    def run_step(self,
+                 extinct: bool = False):
         """
-        The main logic of the class, make a single
+        The main logic of the class, make a single. With an extinct epidemic (see is_extinct), the epidemiological step
+        is advanced in closed form
         """
         # count step time
         start = time.time()
+        if self.recorder is not None:
+            self.recorder.begin_step(step=self.step,
+                                     e_state=self.graph.population.e_state)
         # run epidemiological dynamics
-        self.epidemiological()
+        if extinct:
+            with self.phase(name="epidemiological"):
+                self.advance_extinct_epidemic(days=1)
+        else:
+            self.epidemiological()
         # make the social interactions
-        self.social()
+        with self.phase(name="social"):
+            self.social()
         # PIP the population
-        self.pip.run(graph=self.graph)
+        with self.phase(name="pip"):
+            self.pip.run(graph=self.graph)
         # recall state for later
-        self.epi_dist.append(self.gather_epi_state())
-        mean, std = self.gather_ideas_state()
-        self.ideas_dist_mean.append(mean)
-        self.ideas_dist_std.append(std)
+        with self.phase(name="gather"):
+            self.epi_dist.append(self.gather_epi_state())
+            mean, std = self.gather_ideas_state()
+            self.ideas_dist_mean.append(mean)
+            self.ideas_dist_std.append(std)
         # count this step
         self.step += 1
         # count step time
-        return time.time() - start
+        duration = time.time() - start
+        if self.recorder is not None:
+            self.recorder.end_step(e_state=self.graph.population.e_state,
+                                   duration=duration)
+        return duration
+
+    def phase(self,
+              name: str):
+        """
+        Record a phase of the step (one of StepRecorder.PHASES), if recording
+        """
+        return self.recorder.phase(name=name) if self.recorder is not None else contextlib.nullcontext()
+
+    def is_extinct(self) -> bool:
+        """
+        No agent is exposed or infected (and the PIP does nothing), so no one will be infected any more and the rest
+        of the epidemiological dynamics has no random events
+        """
+        e_state = self.graph.population.e_state
+        return type(self.pip).run is PIP.run and not ((e_state == EpidemiologicalState.E) |
+                                                      (e_state == EpidemiologicalState.Ia) |
+                                                      (e_state == EpidemiologicalState.Is)).any()
+
+    def advance_extinct_epidemic(self,
+                                 days: int) -> np.ndarray:
+        """
+        Run the epidemiological steps of the next days of an extinct epidemic at once: the only transitions left are
+        the recovered agents going back to S (on the day their timer reaches the threshold) and the vaccine doses of
+        the vaccinated susceptible agents (every vaccinate_delta_time days), both known in advance.
+        Return the (days, states) counts of the real agents at the end of each of the days
+        """
+        self.engine.sync(sim=self)
+        self.engine.reset()
+        population = self.graph.population
+        params = self.params
+        real = population.real_mask()
+        e_state = population.e_state
+        timer = population.timer.astype(np.int64)
+
+        # the day each recovered agent goes back to S (the timers tic before the check), after the days if it stays
+        back = np.full(population.get_size(), days + 1, dtype=np.int64)
+        rows = np.tile(np.bincount(e_state[real], minlength=EpidemiologicalState.STATE_COUNT), (days, 1))
+        for state, threshold in ((EpidemiologicalState.Rf, params.chi_f), (EpidemiologicalState.Rp, params.chi_p)):
+            ids = np.flatnonzero(real & (e_state == state))
+            back[ids] = np.maximum(threshold - timer[ids], 1)
+            returned = np.cumsum(np.bincount(back[ids], minlength=days + 2)[1:days + 1])
+            rows[:, int(state)] -= returned
+            rows[:, int(EpidemiologicalState.S)] += returned
+
+        # the days each susceptible agent spends in S in this period and its timer when it starts them
+        back_ids = np.flatnonzero(back <= days)
+        s_ids = np.flatnonzero(real & (e_state == EpidemiologicalState.S))
+        ids = np.concatenate((s_ids, back_ids))
+        start_timer = np.concatenate((timer[s_ids], np.zeros(back_ids.shape[0], dtype=np.int64)))
+        period = np.concatenate((np.full(s_ids.shape[0], days, dtype=np.int64), days - back[back_ids]))
+
+        # vaccine doses: the first once the delay from the last one passed (right away if none), then every delay + 1
+        vaccinated = population.vaccinated[ids]
+        ids, start_timer, period = ids[vaccinated], start_timer[vaccinated], period[vaccinated]
+        last_vaccinated_time = population.last_vaccinated_time[ids].astype(np.int64)
+        first = np.where(last_vaccinated_time == 0,
+                         1,
+                         np.maximum(last_vaccinated_time + params.vaccinate_delta_time + 1 - start_timer, 1))
+        doses = np.where(first <= period, 1 + (period - first) // (params.vaccinate_delta_time + 1), 0)
+        dosed = doses > 0
+        population.vaccine_count[ids[dosed]] += doses[dosed]
+        population.last_vaccinated_time[ids[dosed]] = start_timer[dosed] + first[dosed] + (doses[dosed] - 1) * (params.vaccinate_delta_time + 1)
+
+        population.timer[real] += days
+        population.timer[back_ids] = days - back[back_ids]
+        population.e_state[back_ids] = EpidemiologicalState.S
+        population.e_state_counts[back_ids, int(EpidemiologicalState.S)] += 1
+        return rows
+
+    def fill_steady_state(self):
+        """
+        Finish the run of an extinct epidemic whose ideas stopped changing: advance the epidemiological state to the
+        end at once and record the remaining days (twice each, as the extinct days of a full run), the days after the
+        last recovered agent is back to S as a lazily repeated tail
+        """
+        days = self.max_time - self.step + 1
+        if days <= 0:
+            return
+        for name in ("epi_dist", "ideas_dist_mean", "ideas_dist_std"):
+            if not isinstance(getattr(self, name), Trajectory):
+                setattr(self, name, Trajectory(rows=getattr(self, name)))
+        rows = self.advance_extinct_epidemic(days=days)
+        # the rows change until the last day a recovered agent goes back to S
+        changes = np.flatnonzero((rows[1:] != rows[:-1]).any(axis=1))
+        steady = changes[-1] + 1 if changes.shape[0] > 0 else 0
+        for row in rows[:steady]:
+            self.epi_dist.append(row.tolist())
+            self.epi_dist.append(row.tolist())
+        self.epi_dist.repeat(row=rows[steady].tolist(),
+                             count=2 * (days - steady))
+        mean, std = self.gather_ideas_state()
+        self.ideas_dist_mean.repeat(row=mean,
+                                    count=2 * days)
+        self.ideas_dist_std.repeat(row=std,
+                                   count=2 * days)
+        self.step += days
 
     def epidemiological(self):
         """
         Run a single extended SIR-based model (SEIIRRD) step as the epidemiological model
         The model includes masks + social distance + vaccination
         """
-        deads_ids = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=Simulator.WORKERS) as executor:
-            future_to_url = [executor.submit(self.epidemiological_single, agent) for agent in self.graph.nodes if not agent.is_virtual]
-            for future in concurrent.futures.as_completed(future_to_url):
-                feture_result = future.result()
-                if feture_result[0]:
-                    deads_ids.append(feture_result[1])
-
+        with self.phase(name="epidemiological"):
+            deads_ids = self.engine.epidemiological(sim=self)
         # if an agent die, disconnect it from the graph
-        [self.remove_dead_from_network(dead_id=dead_id) for dead_id in deads_ids]
+        with self.phase(name="dead_removal"):
+            self.remove_deads_from_network(deads_ids=deads_ids)
+        if self.recorder is not None:
+            self.recorder.count(name="deaths",
+                                value=len(deads_ids))
 
     def remove_dead_from_network(self,
                                  dead_id: int):
         """
         Just remove all social and epidemiological edges of dead individuals
         """
-        remove_edges_epi = [edge for edge in self.graph.epi_edges if edge.s_id == dead_id or edge.t_id == dead_id]
-        [self.graph.epi_edges.remove(edge) for edge in remove_edges_epi]
-        remove_edges_socio = [edge for edge in self.graph.socio_edges if edge.s_id == dead_id or edge.t_id == dead_id]
-        [self.graph.socio_edges.remove(edge) for edge in remove_edges_socio]
+        self.graph.remove_nodes(ids=[dead_id])
+
+    def remove_deads_from_network(self,
+                                  deads_ids: list):
+        """
+        Remove all social and epidemiological edges of all the dead individuals of this step
+        """
+        self.graph.remove_nodes(ids=deads_ids)
 
     def epidemiological_single(self,
                                agent) -> tuple:
@@ -145,15 +375,15 @@ class Simulator:
             # ACTIVATE PIPS #
             # Masks PIP
             if pick_agent.wearing_mask and agent.wearing_mask:
-                infect_chance *= ModelParameter.mask_si_reduce_factor
+                infect_chance *= self.params.mask_si_reduce_factor
             elif agent.wearing_mask:
-                infect_chance *= ModelParameter.mask_s_reduce_factor
+                infect_chance *= self.params.mask_s_reduce_factor
             elif pick_agent.wearing_mask:
-                infect_chance *= ModelParameter.mask_i_reduce_factor
+                infect_chance *= self.params.mask_i_reduce_factor
 
             # social distance PIP
             if agent.social_distance or pick_agent.social_distance:
-                infect_chance *= ModelParameter.social_distance_reduce_factor
+                infect_chance *= self.params.social_distance_reduce_factor
 
             # vaccination PIP
             infect_chance *= vaccine_reduction(agent=agent)
@@ -161,33 +391,33 @@ class Simulator:
 
             # check if infected
             if (pick_agent.e_state == EpidemiologicalState.Is or pick_agent.e_state == EpidemiologicalState.Ia) and infect_chance <= float(
-                ModelParameter.beta):
+                self.params.beta):
                 agent.set_e_state(new_e_state=EpidemiologicalState.E)
             elif agent.vaccinated and (
-                    agent.timer - agent.last_vaccinated_time > ModelParameter.vaccinate_delta_time or agent.last_vaccinated_time == 0):
+                    agent.timer - agent.last_vaccinated_time > self.params.vaccinate_delta_time or agent.last_vaccinated_time == 0):
                 agent.vaccine_count += 1
                 agent.last_vaccinated_time = agent.timer
 
-        elif agent.e_state == EpidemiologicalState.E and agent.timer >= ModelParameter.phi:
-            if random.random() < ModelParameter.eta:
+        elif agent.e_state == EpidemiologicalState.E and agent.timer >= self.params.phi:
+            if random.random() < self.params.eta:
                 agent.set_e_state(new_e_state=EpidemiologicalState.Is)
             else:
                 agent.set_e_state(new_e_state=EpidemiologicalState.Ia)
 
-        elif agent.e_state == EpidemiologicalState.Ia and agent.timer >= ModelParameter.gamma_a:
+        elif agent.e_state == EpidemiologicalState.Ia and agent.timer >= self.params.gamma_a:
             agent.set_e_state(new_e_state=EpidemiologicalState.Rf)
-        elif agent.e_state == EpidemiologicalState.Is and agent.timer >= ModelParameter.gamma_s:
+        elif agent.e_state == EpidemiologicalState.Is and agent.timer >= self.params.gamma_s:
             chance = random.random()
-            if ModelParameter.psi_2 < chance <= ModelParameter.psi_3:
+            if self.params.psi_2 < chance <= self.params.psi_3:
                 agent.set_e_state(new_e_state=EpidemiologicalState.D)
                 return True, agent.id  # dead
-            elif ModelParameter.psi_1 < chance <= ModelParameter.psi_2:
+            elif self.params.psi_1 < chance <= self.params.psi_2:
                 agent.set_e_state(new_e_state=EpidemiologicalState.Rp)
             else:
                 agent.set_e_state(new_e_state=EpidemiologicalState.Rf)
-        elif agent.e_state == EpidemiologicalState.Rf and agent.timer >= ModelParameter.chi_f:
+        elif agent.e_state == EpidemiologicalState.Rf and agent.timer >= self.params.chi_f:
             agent.set_e_state(new_e_state=EpidemiologicalState.S)
-        elif agent.e_state == EpidemiologicalState.Rp and agent.timer >= ModelParameter.chi_p:
+        elif agent.e_state == EpidemiologicalState.Rp and agent.timer >= self.params.chi_p:
             agent.set_e_state(new_e_state=EpidemiologicalState.S)
         return False, agent.id  # not dead
 
@@ -195,53 +425,59 @@ class Simulator:
         """
         Run a single rummer spread step as the social model
         """
-        new_ideas = {}
-        # compute the new ideas vectors
-        with concurrent.futures.ThreadPoolExecutor(max_workers=Simulator.WORKERS) as executor:
-            future_to_url = [executor.submit(self.social_single, agent) for agent in self.graph.nodes if not agent.is_virtual]
-            for future in concurrent.futures.as_completed(future_to_url):
-                feture_result = future.result()
-                new_ideas[feture_result[0]] = feture_result[1]
-
-        # allocate them back only here to avoid miss compute in the previous loop
-        for index, agent in enumerate(self.graph.nodes):
-            if not agent.is_virtual:
-                agent.ideas = np.asarray([min([max([val, 0]), 1]) for val in new_ideas[agent.id]])
-                # check the status of the PIP of this agent
-                agent.wearing_mask = agent.ideas[0] > 0.5
-                agent.social_distance = agent.ideas[1] > 0.5
-                agent.vaccinated = agent.ideas[2] > 0.5
+        # the ideas stopped moving (see VectorizedEngine.active_social)
+        if self.engine.is_social_converged(sim=self):
+            return
+        self.engine.social(sim=self)
 
     def social_single(self,
                       agent) -> tuple:
         """
         Compute the new idea vector of a single agent
         """
-        # get influence agents
-        other_agents = self.graph.get_items(ids=self.graph.next_nodes_socio(id=agent.id))
+        # get influence agents, straight from the adjacency index and the population columns
+        other_ids = self.graph.next_nodes_socio(id=agent.id)
+        ideas = self.graph.population.ideas
+        personalities = self.graph.population.personality_vector
+        # the personality similarity of each edge and its side of the reject threshold, cached per graph
+        index = self.graph.socio_personality(personality_reject=self.params.personality_reject)
+        if index is not None:
+            similarities = index.neighbor_edge_values(name=Graph.PERSONALITY_SIMILARITY,
+                                                      id=agent.id).tolist()
+            sides = index.neighbor_edge_values(name=Graph.PERSONALITY_SIDE,
+                                               id=agent.id).tolist()
+        else:
+            similarities = [cosine_similarity_numba(agent.personality_vector, personalities[other_id]) for other_id in other_ids]
+            sides = [np.sign(self.params.personality_reject - (1 - similarity)) for similarity in similarities]
+        influencers = [(ideas[other_id], personality_similarity, side)
+                       for other_id, personality_similarity, side in zip(other_ids, similarities, sides)]
+        # the broadcasters that reach the agent are neighbors with a full personality similarity (see Broadcasters)
+        broadcasters = self.graph.broadcasters
+        if broadcasters is not None and self.graph.alive[agent.id]:
+            influencers.extend((broadcasters.ideas[broadcaster_id], 1, np.sign(self.params.personality_reject))
+                               for broadcaster_id in broadcasters.of(id=agent.id).tolist())
         # update the current ideas
         total_influence = 0
         ideas_score = []
-        if len(other_agents) > 0:
-            for i in range(len(other_agents)):
+        if len(influencers) > 0:
+            for other_ideas, personality_similarity, side in influencers:
                 # if people are too different, the ideas of one person is causing negative reaction
-                idea_similarity = 1 - cosine_similarity_numba(agent.ideas, other_agents[i].ideas)
-                personality_similarity = cosine_similarity_numba(agent.personality_vector, other_agents[
-                    i].personality_vector) if not agent.is_virtual else 1
-                personality_similarity_reject = 1 - personality_similarity
+                idea_similarity = 1 - cosine_similarity_numba(agent.ideas, other_ideas)
+                if agent.is_virtual:
+                    personality_similarity, side = 1, np.sign(self.params.personality_reject)
                 # if people we do not want to
-                if idea_similarity < ModelParameter.ideas_reject and personality_similarity_reject < ModelParameter.personality_reject:
-                    ideas_score.append(personality_similarity * other_agents[i].ideas)
+                if idea_similarity < self.params.ideas_reject and side > 0:
+                    ideas_score.append(personality_similarity * other_ideas)
                     total_influence += personality_similarity
-                elif idea_similarity < ModelParameter.ideas_reject and personality_similarity_reject > ModelParameter.personality_reject:
-                    ideas_score.append(-1 * personality_similarity * other_agents[i].ideas)
+                elif idea_similarity < self.params.ideas_reject and side < 0:
+                    ideas_score.append(-1 * personality_similarity * other_ideas)
                     total_influence += personality_similarity
-                elif idea_similarity > ModelParameter.ideas_reject and personality_similarity_reject < ModelParameter.personality_reject:
-                    ideas_score.append(-1 * personality_similarity * other_agents[i].ideas)
+                elif idea_similarity > self.params.ideas_reject and side > 0:
+                    ideas_score.append(-1 * personality_similarity * other_ideas)
                     total_influence += personality_similarity
-                elif idea_similarity > ModelParameter.ideas_reject and personality_similarity_reject > ModelParameter.personality_reject:
+                elif idea_similarity > self.params.ideas_reject and side < 0:
                     pass  # just to show we do not take into consideration this agent
-            return agent.id, agent.ideas + ModelParameter.lamda * np.sum(ideas_score, axis=0) / total_influence
+            return agent.id, agent.ideas + self.params.lamda * np.sum(ideas_score, axis=0) / total_influence
         else:
             return agent.id, agent.ideas
 
@@ -249,18 +485,17 @@ class Simulator:
         """
         Add to memory the epi state
         """
-        counters = [0 for _ in range(EpidemiologicalState.STATE_COUNT)]
-        for agent in self.graph.nodes:
-            if not agent.is_virtual:
-                counters[int(agent.e_state)] += 1
-        return counters
+        population = self.graph.population
+        return np.bincount(population.e_state[population.real_mask()],
+                           minlength=EpidemiologicalState.STATE_COUNT).tolist()
 
     def gather_ideas_state(self):
         """
         Add to memory the social state
         """
-        return np.nanmean([agent.ideas for agent in self.graph.nodes if not agent.is_virtual], axis=0), \
-               np.nanstd([agent.ideas for agent in self.graph.nodes if not agent.is_virtual], axis=0)
+        population = self.graph.population
+        ideas = population.ideas[population.real_mask()]
+        return np.nanmean(ideas, axis=0), np.nanstd(ideas, axis=0)
 
     # end - logic #
 
@@ -281,6 +516,23 @@ class Simulator:
 
     # end - analysis #
 
+    def __setstate__(self, state: dict):
+        """
+        Unpickle a simulator. A simulator pickled by older versions (without parameters, engine and trajectories) gets
+        the defaults of a new one
+        """
+        if "params" in state:
+            self.__dict__.update(state)
+            return
+        Simulator.__init__(self,
+                           graph=state["graph"],
+                           pip=state["pip"],
+                           max_time=state["max_time"])
+        self.step = state["step"]
+        self.epi_dist = Trajectory(rows=state["epi_dist"])
+        self.ideas_dist_mean = Trajectory(rows=state["ideas_dist_mean"])
+        self.ideas_dist_std = Trajectory(rows=state["ideas_dist_std"])
+
     def __repr__(self):
         return self.__str__()
 
@@ -2,11 +2,15 @@
 import os
 import math
 import random
+import numpy as np
 
 # project imports
-from epidemiological_simulator.edge import Edge
 from epidemiological_simulator.node import Node
 from epidemiological_simulator.graph import Graph
+from epidemiological_simulator.population import Population
+from epidemiological_simulator.edge_list import EdgeListLoader
+from epidemiological_simulator.adjacency import AdjacencyIndex
+from epidemiological_simulator.random_graphs import RandomGraphs
 from pips.pip import PIP
 from epidemiological_simulator.sim import Simulator
 from epidemiological_simulator.epidemiological_state import EpidemiologicalState
@@ -23,29 +27,39 @@ class SimulatorGenerator:
     @staticmethod
     def facebook(max_time: int = 200):
         random.seed(73)  # SHELDON's number so the graph will be always the same
+        return SimulatorGenerator.snap(path=os.path.join(os.path.dirname(__file__), "../data", "facebook.txt"),
+                                       max_time=max_time)
 
-        socio_edges = []
-        with open(os.path.join(os.path.dirname(__file__), "../data", "facebook.txt"), "r") as graph_edges:
-            for line in graph_edges.readlines():
-                vals = line.strip().split(" ")
-                if len(vals) == 2:
-                    socio_edges.append(Edge(s_id=int(vals[0])-1,
-                                            t_id=int(vals[1])-1,
-                                            w=1))
+    @staticmethod
+    def snap(path: str,
+             max_time: int = 200,
+             meet_chance: float = 0.1):
+        """
+        A simulator over a social graph from an edge-list file (e.g., SNAP graphs, gzip or Matrix Market).
+        The file is parsed once, later runs memory-map its binary cache
+        """
+        rng = RandomGraphs.default_rng()
+        socio_index = EdgeListLoader.load(path=path)
+        node_count = socio_index.get_size()
+        socio_sources, socio_targets = socio_index.live_edges()
         # add more physical as it happens more often than just social
-        FACEBOOK_GRAPH_NODES = 4039
-        FACEBOOK_MEET_CHANCE = 0.1
-        epi_edges = [edge.copy() for edge in socio_edges if random.random() < FACEBOOK_MEET_CHANCE]  # if friends in facebook we believe in 10% they will meet
-        epi_end_size = round(math.sqrt(2)/FACEBOOK_MEET_CHANCE * len(epi_edges))  # we assume sqrt(2) more physical than social meetings
-        while len(epi_edges) < epi_end_size:
-            s_id = random.randint(0, FACEBOOK_GRAPH_NODES - 1)
-            t_id = random.randint(0, FACEBOOK_GRAPH_NODES - 1)
-            if s_id != t_id and Edge(s_id=s_id, t_id=t_id, w=0) not in epi_edges:
-                epi_edges.append(Edge(s_id=s_id, t_id=t_id, w=1))
+        meet = rng.random(socio_sources.shape[0]) < meet_chance  # if friends in the social graph we believe in 10% they will meet
+        epi_sources, epi_targets = RandomGraphs.unique_edges(sources=socio_sources[meet],
+                                                             targets=socio_targets[meet],
+                                                             node_count=node_count)
+        epi_end_size = round(math.sqrt(2)/meet_chance * epi_sources.shape[0])  # we assume sqrt(2) more physical than social meetings
+        epi_sources, epi_targets = RandomGraphs.add_random_edges(node_count=node_count,
+                                                                 edge_count=epi_end_size,
+                                                                 sources=epi_sources,
+                                                                 targets=epi_targets,
+                                                                 rng=rng)
         # create graph
-        graph = Graph(nodes=[Node.create_random_mostly_s(id=id) for id in range(FACEBOOK_GRAPH_NODES)],
-                      socio_edges=socio_edges,
-                      epi_edges=epi_edges)
+        graph = Graph.from_indexes(population=Population.random_mostly_s(size=node_count,
+                                                                         rng=rng),
+                                   epi_index=AdjacencyIndex.from_arrays(sources=epi_sources,
+                                                                        targets=epi_targets,
+                                                                        node_count=node_count),
+                                   socio_index=socio_index)
         return Simulator(graph=graph,
                          pip=PIP(),
                          max_time=max_time)
@@ -68,28 +82,59 @@ class SimulatorGenerator:
                                    epi_edge_count: int = 1000,
                                    socio_edge_count: int = 1000,
                                    max_time: int = 200):
+        rng = RandomGraphs.default_rng()
         graph = Graph.generate_random(node_count=node_count,
                                       epi_edge_count=epi_edge_count,
-                                      socio_edge_count=socio_edge_count)
+                                      socio_edge_count=socio_edge_count,
+                                      rng=rng)
+        # the edges of all the bots are added at once, each batch rebuilds the social index
+        bot_sources = []
+        bot_targets = []
         for i in range(anti_virtual_nodes):
             s_id = node_count + i
-            graph.nodes.append(Node(id=s_id,
-                                    is_virtual=True,
-                                    ideas=[0.5, 0.5, 0],
-                                    personality_vector=[],
-                                    timer=0,
-                                    epidimiological_state=EpidemiologicalState.S))
-            socio_edges = []
-            while len(socio_edges) < round(socio_edge_count * anti_virtual_nodes / node_count):
-                t_id = random.randint(0, node_count - 1)
-                if s_id != t_id and Edge(s_id=s_id, t_id=t_id, w=0) not in socio_edges:
-                    socio_edges.append(Edge(s_id=s_id, t_id=t_id, w=1))
-            graph.socio_edges.extend(socio_edges)
+            graph.add_node(Node(id=s_id,
+                                is_virtual=True,
+                                ideas=[0.5, 0.5, 0],
+                                personality_vector=[],
+                                timer=0,
+                                epidimiological_state=EpidemiologicalState.S))
+            t_ids = rng.choice(node_count,
+                               size=min(node_count, round(socio_edge_count * anti_virtual_nodes / node_count)),
+                               replace=False)
+            bot_sources.append(np.full(t_ids.shape[0], s_id, dtype=np.int64))
+            bot_targets.append(t_ids)
+        if anti_virtual_nodes > 0:
+            graph.add_socio_edges(sources=np.concatenate(bot_sources),
+                                  targets=np.concatenate(bot_targets))
         # return answer
         return Simulator(graph=graph,
                          pip=PIP(),
                          max_time=max_time)
 
+    @staticmethod
+    def anti_vaccine_broadcast(node_count: int = 50,
+                               anti_virtual_nodes: int = 10,
+                               epi_edge_count: int = 1000,
+                               socio_edge_count: int = 1000,
+                               max_time: int = 200):
+        """
+        anti_vaccine_simple_random with the anti-vaccine bots as broadcasters that reach their targets, instead of
+        virtual nodes and edges
+        """
+        rng = RandomGraphs.default_rng()
+        graph = Graph.generate_random(node_count=node_count,
+                                      epi_edge_count=epi_edge_count,
+                                      socio_edge_count=socio_edge_count,
+                                      rng=rng)
+        for i in range(anti_virtual_nodes):
+            graph.add_broadcaster(ideas=[0.5, 0.5, 0],
+                                  targets=rng.choice(node_count,
+                                                     size=min(node_count, round(socio_edge_count * anti_virtual_nodes / node_count)),
+                                                     replace=False))
+        return Simulator(graph=graph,
+                         pip=PIP(),
+                         max_time=max_time)
+
     @staticmethod
     def full_connected(node_count: int = 50,
                        edge_count: int = 0,
@@ -0,0 +1,285 @@
+# library imports
+import os
+import json
+import pickle
+import random
+import hashlib
+import numpy as np
+
+# project imports
+from epidemiological_simulator.graph import Graph
+from epidemiological_simulator.params import SimulationParameters
+from epidemiological_simulator.topology import BlockTopology
+from epidemiological_simulator.population import Population
+from epidemiological_simulator.adjacency import AdjacencyIndex
+from epidemiological_simulator.broadcasters import Broadcasters
+from epidemiological_simulator.epidemiological_state import EpidemiologicalState
+
+
+class Snapshot:
+    """
+    A columnar on-disk format of a simulator: a folder with a manifest.json, a .npy file per array (the population
+    columns, the adjacency indexes of both layers, the broadcasters and the engine's random streams) and append-only trajectory files.
+    Loading memory-maps the arrays (copy-on-write), and saving into an existing snapshot only writes the arrays that
+    changed and the new rows of the trajectories, so it can be used as a periodic checkpoint of a long run
+    """
+
+    # CONSTS #
+    FORMAT_VERSION = 1
+    MANIFEST_FILE = "manifest.json"
+    ARRAYS_FOLDER = "arrays"
+    PIP_FILE = "pip.pkl"
+    # the trajectory lists of the simulator, with the dtype and width of their rows
+    TRAJECTORIES = {"epi_dist": (np.int64, EpidemiologicalState.STATE_COUNT),
+                    "ideas_dist_mean": (np.float64, Population.IDEAS_SIZE),
+                    "ideas_dist_std": (np.float64, Population.IDEAS_SIZE)}
+    INDEX_KINDS = {"csr": AdjacencyIndex,
+                   "block": BlockTopology}
+    # END - CONSTS #
+
+    def __init__(self,
+                 path: str,
+                 manifest: dict):
+        self.path = path
+        self.manifest = manifest
+
+    @staticmethod
+    def read(path: str):
+        with open(os.path.join(path, Snapshot.MANIFEST_FILE), "r") as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest["version"] != Snapshot.FORMAT_VERSION:
+            raise ValueError("Snapshot: format version {} is not supported".format(manifest["version"]))
+        return Snapshot(path=path,
+                        manifest=manifest)
+
+    # loading #
+
+    def get_array(self,
+                  name: str) -> np.ndarray:
+        """
+        A copy-on-write memory map of a stored array - changes stay in memory and never reach the file
+        """
+        return np.load(os.path.join(self.path, Snapshot.ARRAYS_FOLDER, self.manifest["arrays"][name]["file"]),
+                       mmap_mode="c")
+
+    def get_arrays(self,
+                   prefix: str) -> dict:
+        return {name[len(prefix) + 1:]: self.get_array(name=name)
+                for name in self.manifest["arrays"] if name.startswith(prefix + ".")}
+
+    def get_graph(self) -> Graph:
+        return Snapshot.build_graph(arrays={name: self.get_array(name=name) for name in self.manifest["arrays"]},
+                                    index_kinds=self.manifest["indexes"])
+
+    @staticmethod
+    def build_graph(arrays: dict,
+                    index_kinds: dict) -> Graph:
+        """
+        A graph over the given arrays (named as in collect_arrays), without copying them
+        """
+        population = Population(size=0)
+        for column in Population.COLUMNS:
+            setattr(population, column, arrays["population.{}".format(column)])
+        indexes = {layer: Snapshot.INDEX_KINDS[kind].from_state(arrays={field: arrays["{}.{}".format(layer, field)]
+                                                                        for field in Snapshot.INDEX_KINDS[kind].STATE_FIELDS})
+                   for layer, kind in index_kinds.items()}
+        graph = Graph.from_indexes(population=population,
+                                   epi_index=indexes["epi"],
+                                   socio_index=indexes["socio"])
+        graph.alive = np.array(arrays["graph.alive"])
+        if "broadcasters.ideas" in arrays:
+            graph.broadcasters = Broadcasters.from_state(arrays={field: arrays["broadcasters.{}".format(field)]
+                                                                 for field in Broadcasters.STATE_FIELDS})
+        return graph
+
+    def get_trajectory(self,
+                       name: str) -> np.ndarray:
+        dtype, width = Snapshot.TRAJECTORIES[name]
+        length = self.manifest["trajectory_length"]
+        if length == 0:
+            return np.zeros((0, width), dtype=dtype)
+        return np.memmap(os.path.join(self.path, Snapshot.trajectory_file(manifest=self.manifest,
+                                                                          name=name)),
+                         dtype=dtype,
+                         mode="c",
+                         shape=(length, width))
+
+    @staticmethod
+    def trajectory_file(manifest: dict,
+                        name: str) -> str:
+        """
+        The file of a trajectory (snapshots saved before the trajectory files were versioned use a fixed name)
+        """
+        return manifest.get("trajectories", {}).get(name, "{}.bin".format(name))
+
+    def get_params(self) -> SimulationParameters:
+        return SimulationParameters.default().replace(**self.manifest["parameters"])
+
+    def get_pip(self):
+        with open(os.path.join(self.path, Snapshot.PIP_FILE), "rb") as pip_file:
+            return pickle.load(pip_file)
+
+    def restore(self,
+                sim):
+        """
+        Move the run state of the snapshot (step, random streams and trajectories) into a simulator over its graph.
+        The 'random' module's state is restored as well, so a resumed run continues the same random sequence
+        """
+        sim.step = self.manifest["step"]
+        sim.max_time = self.manifest["max_time"]
+        sim.rng.bit_generator.state = self.manifest["rng"]
+        version, state, gauss = self.manifest["random"]
+        random.setstate((version, tuple(state), gauss))
+        sim.epi_dist = self.get_trajectory(name="epi_dist").tolist()
+        sim.ideas_dist_mean = list(np.array(self.get_trajectory(name="ideas_dist_mean")))
+        sim.ideas_dist_std = list(np.array(self.get_trajectory(name="ideas_dist_std")))
+        sim.engine.set_state_arrays(arrays=self.get_arrays(prefix="engine"))
+
+    # end - loading #
+
+    # saving #
+
+    @staticmethod
+    def save(sim,
+             path: str):
+        """
+        Write the simulator into the snapshot folder. If the folder already holds a snapshot, arrays whose content did
+        not change keep their files and only the new trajectory rows are appended. The manifest is replaced last,
+        so a crash during a save leaves the previous snapshot intact
+        """
+        os.makedirs(os.path.join(path, Snapshot.ARRAYS_FOLDER), exist_ok=True)
+        try:
+            previous = Snapshot.read(path=path).manifest
+        except (OSError, ValueError):
+            previous = {"arrays": {}, "generation": 0, "trajectory_length": 0, "trajectory_digest": "", "trajectories": {}}
+        generation = previous["generation"] + 1
+
+        # the arrays, written only when their content changed
+        arrays = {}
+        for name, values in Snapshot.collect_arrays(sim=sim).items():
+            digest = Snapshot.digest(values=values)
+            if name in previous["arrays"] and previous["arrays"][name]["digest"] == digest:
+                arrays[name] = previous["arrays"][name]
+                continue
+            file_name = "{}.{}.npy".format(name, generation)
+            np.save(os.path.join(path, Snapshot.ARRAYS_FOLDER, file_name), np.ascontiguousarray(values))
+            arrays[name] = {"file": file_name,
+                            "digest": digest,
+                            "dtype": str(values.dtype),
+                            "shape": list(values.shape)}
+
+        # the trajectories only grow, append the new rows past the stored length (or rewrite them all into new files if
+        # the stored ones are not a prefix), the previous manifest never reads what is written here
+        trajectories = {name: np.asarray(getattr(sim, name), dtype=dtype).reshape(-1, width)
+                        for name, (dtype, width) in Snapshot.TRAJECTORIES.items()}
+        length = len(sim.epi_dist)
+        start = previous["trajectory_length"]
+        if start > length or Snapshot.digest_all(arrays=[values[:start] for values in trajectories.values()]) != previous["trajectory_digest"]:
+            start = 0
+        trajectory_files = {}
+        for name, values in trajectories.items():
+            if start > 0:
+                trajectory_files[name] = Snapshot.trajectory_file(manifest=previous,
+                                                                  name=name)
+            else:
+                trajectory_files[name] = "{}.{}.bin".format(name, generation)
+            with open(os.path.join(path, trajectory_files[name]), "r+b" if start > 0 else "wb") as trajectory_file:
+                trajectory_file.seek(start * values.itemsize * values.shape[1])
+                trajectory_file.truncate()
+                trajectory_file.write(values[start:].tobytes())
+
+        temp_path = os.path.join(path, "{}.tmp".format(Snapshot.PIP_FILE))
+        with open(temp_path, "wb") as pip_file:
+            pickle.dump(sim.pip, pip_file)
+        os.replace(temp_path, os.path.join(path, Snapshot.PIP_FILE))
+
+        Snapshot.write_manifest(path=path,
+                                manifest={"version": Snapshot.FORMAT_VERSION,
+                                          "generation": generation,
+                                          "step": sim.step,
+                                          "max_time": sim.max_time,
+                                          "engine": sim.engine.NAME,
+                                          "rng": sim.rng.bit_generator.state,
+                                          "random": random.getstate(),
+                                          "parameters": sim.params._asdict(),
+                                          "indexes": Snapshot.index_kinds(sim=sim),
+                                          "arrays": arrays,
+                                          "trajectories": trajectory_files,
+                                          "trajectory_length": length,
+                                          "trajectory_digest": Snapshot.digest_all(arrays=list(trajectories.values()))})
+        Snapshot.remove_unused_files(path=path,
+                                     arrays=arrays,
+                                     trajectory_files=trajectory_files)
+
+    @staticmethod
+    def collect_arrays(sim) -> dict:
+        """
+        All the arrays of the simulator's state, by their name in the snapshot
+        """
+        sim.engine.sync(sim=sim)
+        population = sim.graph.population
+        arrays = {"population.{}".format(column): getattr(population, column) for column in Population.COLUMNS}
+        arrays["graph.alive"] = sim.graph.alive
+        for layer, index in (("epi", sim.graph.get_epi_index()), ("socio", sim.graph.get_socio_index())):
+            arrays.update({"{}.{}".format(layer, field): getattr(index, field) for field in type(index).STATE_FIELDS})
+        if sim.graph.broadcasters is not None:
+            arrays.update({"broadcasters.{}".format(name): values for name, values in sim.graph.broadcasters.get_state_arrays().items()})
+        arrays.update({"engine.{}".format(name): values for name, values in sim.engine.get_state_arrays().items()})
+        return arrays
+
+    @staticmethod
+    def index_kinds(sim) -> dict:
+        return {layer: Snapshot.index_kind(index=index) for layer, index in (("epi", sim.graph.get_epi_index()),
+                                                                             ("socio", sim.graph.get_socio_index()))}
+
+    @staticmethod
+    def index_kind(index) -> str:
+        for kind, index_class in Snapshot.INDEX_KINDS.items():
+            if isinstance(index, index_class):
+                return kind
+        raise ValueError("Snapshot: cannot store an index of type {}".format(type(index).__name__))
+
+    @staticmethod
+    def digest(values: np.ndarray) -> str:
+        return hashlib.blake2b(np.ascontiguousarray(values).data, digest_size=16).hexdigest()
+
+    @staticmethod
+    def digest_all(arrays: list) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        for values in arrays:
+            digest.update(np.ascontiguousarray(values).data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def write_manifest(path: str,
+                       manifest: dict):
+        temp_path = os.path.join(path, "{}.tmp".format(Snapshot.MANIFEST_FILE))
+        with open(temp_path, "w") as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(temp_path, os.path.join(path, Snapshot.MANIFEST_FILE))
+
+    @staticmethod
+    def remove_unused_files(path: str,
+                            arrays: dict,
+                            trajectory_files: dict):
+        used = {value["file"] for value in arrays.values()}
+        unused = [os.path.join(Snapshot.ARRAYS_FOLDER, file_name)
+                  for file_name in os.listdir(os.path.join(path, Snapshot.ARRAYS_FOLDER)) if file_name not in used]
+        unused += [file_name for file_name in os.listdir(path)
+                   if file_name.endswith(".bin") and file_name.split(".")[0] in Snapshot.TRAJECTORIES
+                   and file_name not in trajectory_files.values()]
+        for file_name in unused:
+            try:
+                os.remove(os.path.join(path, file_name))
+            except OSError:
+                # still mapped by a loaded simulator on some platforms, removed on a later save
+                pass
+
+    # end - saving #
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<Snapshot: {} (step {})>".format(self.path,
+                                                 self.manifest["step"])
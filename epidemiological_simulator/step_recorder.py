@@ -0,0 +1,140 @@
+# library imports
+import csv
+import json
+import time
+import tracemalloc
+import numpy as np
+from contextlib import contextmanager
+
+# project imports
+from epidemiological_simulator.epidemiological_state import EpidemiologicalState
+
+
+class StepRecorder:
+    """
+    Per-step instrumentation of a simulator (set it as the simulator's recorder): the wall-clock time of each phase of
+    the step, counters of the work done (the agents touched and edges scanned by each phase, the deaths and the
+    transitions by type) and optionally the peak memory traced by tracemalloc during each phase.
+    Each step is a flat record {name: value} (e.g., "time.social", "social.edges", "transitions.S->E") and the records
+    can be exported to JSON or CSV. A simulator without a recorder does none of this work
+    """
+
+    # CONSTS #
+    PHASES = ["epidemiological", "dead_removal", "social", "pip", "gather"]
+    # END - CONSTS #
+
+    def __init__(self,
+                 memory: bool = False):
+        self.memory = memory
+        self.records = []
+        # the record of the step being run and the states at its beginning
+        self._record = None
+        self._e_state = None
+        # whether this recorder started tracemalloc (and should stop it)
+        self._tracing = False
+
+    def begin_step(self,
+                   step: int,
+                   e_state: np.ndarray):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        self._record = {"step": step}
+        self._e_state = e_state.copy()
+
+    @contextmanager
+    def phase(self,
+              name: str):
+        """
+        Time a phase of the step (and trace its peak memory, above the memory at its beginning)
+        """
+        if self.memory:
+            memory_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.count(name="time.{}".format(name),
+                       value=time.perf_counter() - start)
+            if self.memory:
+                name = "memory.{}".format(name)
+                self._record[name] = max(self._record.get(name, 0), tracemalloc.get_traced_memory()[1] - memory_start)
+
+    def count(self,
+              name: str,
+              value):
+        """
+        Add to a counter of the step being recorded
+        """
+        if self._record is None:
+            return
+        self._record[name] = self._record.get(name, 0) + (value.item() if isinstance(value, np.generic) else value)
+
+    def end_step(self,
+                 e_state: np.ndarray,
+                 duration: float):
+        """
+        Count the transitions of the step by type and keep its record
+        """
+        changed = np.flatnonzero(self._e_state != e_state)
+        pairs = np.bincount(self._e_state[changed].astype(np.int64) * EpidemiologicalState.STATE_COUNT + e_state[changed],
+                            minlength=EpidemiologicalState.STATE_COUNT ** 2)
+        for pair in np.flatnonzero(pairs).tolist():
+            self._record["transitions.{}->{}".format(EpidemiologicalState(pair // EpidemiologicalState.STATE_COUNT).name,
+                                                     EpidemiologicalState(pair % EpidemiologicalState.STATE_COUNT).name)] = int(pairs[pair])
+        self._record["time"] = duration
+        self.records.append(self._record)
+        self._record = None
+        self._e_state = None
+
+    def close(self):
+        """
+        Stop tracemalloc if this recorder started it (a later step starts it again)
+        """
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def totals(self) -> dict:
+        """
+        The sum of each time and counter over all the recorded steps (the memory is the peak of all the steps)
+        """
+        answer = {}
+        for record in self.records:
+            for name, value in record.items():
+                if name.startswith("memory."):
+                    answer[name] = max(answer.get(name, 0), value)
+                elif name != "step":
+                    answer[name] = answer.get(name, 0) + value
+        return answer
+
+    def get_columns(self) -> list:
+        """
+        The names of all the records' values, in the order they first appear
+        """
+        return list(dict.fromkeys(name for record in self.records for name in record))
+
+    def to_json(self,
+                path: str):
+        with open(path, "w") as json_file:
+            json.dump(self.records, json_file, indent=2)
+
+    def to_csv(self,
+               path: str):
+        """
+        A row per step and a column per value, a counter that a step did not touch is 0
+        """
+        with open(path, "w", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file,
+                                    fieldnames=self.get_columns(),
+                                    restval=0)
+            writer.writeheader()
+            writer.writerows(self.records)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<StepRecorder: {} steps{}>".format(len(self.records),
+                                                   ", with memory" if self.memory else "")
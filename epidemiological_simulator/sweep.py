@@ -0,0 +1,214 @@
+# library imports
+import os
+import json
+import hashlib
+import itertools
+import numpy as np
+
+# project imports
+from epidemiological_simulator.sim import Simulator
+from epidemiological_simulator.params import SimulationParameters
+from epidemiological_simulator.multi_sim import MultiSim, run_generated_replica
+
+
+class ResultStore:
+    """
+    A persistent store of the results of sweep points, keyed by the content hash of each point.
+    An append-only JSON-lines file: each finished point is a line flushed to disk right away, so a crashed sweep keeps
+    everything it finished and a rerun skips it
+    """
+
+    # CONSTS #
+    RESULTS_FILE = "results.jsonl"
+    # END - CONSTS #
+
+    def __init__(self,
+                 path: str):
+        self.path = path
+        self.results = {}
+        os.makedirs(path, exist_ok=True)
+        try:
+            with open(os.path.join(path, ResultStore.RESULTS_FILE), "r") as results_file:
+                for line in results_file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # a line cut by a crash in the middle of a write
+                        continue
+                    self.results[record["key"]] = record
+        except FileNotFoundError:
+            pass
+
+    def put(self,
+            key: str,
+            point: dict,
+            value):
+        record = {"key": key,
+                  "point": point,
+                  "value": value}
+        with open(os.path.join(self.path, ResultStore.RESULTS_FILE), "a") as results_file:
+            results_file.write(json.dumps(record, default=ResultStore.to_json) + "\n")
+            results_file.flush()
+            os.fsync(results_file.fileno())
+        self.results[key] = json.loads(json.dumps(record, default=ResultStore.to_json))
+
+    def get(self,
+            key: str):
+        return self.results[key]["value"]
+
+    @staticmethod
+    def to_json(value):
+        # NumPy scalars and arrays
+        return value.tolist()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.results
+
+    def __len__(self):
+        return len(self.results)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<ResultStore: {} ({} results)>".format(self.path,
+                                                       len(self.results))
+
+
+class Sweep:
+    """
+    A declarative parameter sweep: a list of points, each point is a set of parameters and a seed. A parameter named as
+    a SimulationParameters field sets the model for that point and the others are passed to the simulator generator.
+    The points run in parallel (see MultiSim.stream), each result goes to a ResultStore as soon as it is ready and
+    points already in the store are skipped, so an interrupted or extended sweep only runs the missing points
+    """
+
+    def __init__(self,
+                 sim_generator_function,
+                 sim_info_extraction_function,
+                 points: list,
+                 stop_early: bool = False):
+        self.sim_generator_function = sim_generator_function
+        self.sim_info_extraction_function = sim_info_extraction_function
+        # (parameters dict, seed) pairs
+        self.points = points
+        self.stop_early = stop_early
+
+    @staticmethod
+    def grid(sim_generator_function,
+             sim_info_extraction_function,
+             parameters: dict,
+             seeds: list,
+             fixed: dict = None,
+             stop_early: bool = False):
+        """
+        All the combinations of the given parameter values, each with all the seeds. The fixed parameters are the
+        same for all the points
+        """
+        names = list(parameters)
+        return Sweep(sim_generator_function=sim_generator_function,
+                     sim_info_extraction_function=sim_info_extraction_function,
+                     points=[(dict(fixed or {}, **dict(zip(names, values))), seed)
+                             for values in itertools.product(*[parameters[name] for name in names])
+                             for seed in seeds],
+                     stop_early=stop_early)
+
+    def run(self,
+            store: ResultStore,
+            workers: int = None,
+            progress: bool = True,
+            on_result=None) -> int:
+        """
+        Run the points that are not in the store yet, calling on_result(sweep, store) after each one is stored.
+        Return the number of points that ran
+        """
+        pending = [point for point, key in zip(self.points, self.get_keys()) if key not in store]
+        tasks_arguments = []
+        for parameters, seed in pending:
+            generator_arguments, params = Sweep.split(parameters=parameters)
+            tasks_arguments.append((np.random.SeedSequence(seed), self.sim_generator_function, self.sim_info_extraction_function,
+                                    generator_arguments, params, self.stop_early, Simulator.DEBUG))
+        if len(tasks_arguments) == 0:
+            return 0
+        for index, value in MultiSim.stream(task=run_generated_replica,
+                                            tasks_arguments=tasks_arguments,
+                                            workers=workers,
+                                            progress=progress):
+            parameters, seed = pending[index]
+            store.put(key=self.point_key(parameters=parameters, seed=seed),
+                      point={"parameters": parameters, "seed": seed},
+                      value=value)
+            if on_result is not None:
+                on_result(self, store)
+        return len(pending)
+
+    @staticmethod
+    def split(parameters: dict) -> tuple:
+        """
+        The generator's arguments and the model parameters (the defaults with the point's values) of a point
+        """
+        generator_arguments = {name: value for name, value in parameters.items() if name not in SimulationParameters._fields}
+        params = SimulationParameters.default().replace(**{name: value for name, value in parameters.items()
+                                                           if name in SimulationParameters._fields})
+        return generator_arguments, params
+
+    def point_key(self,
+                  parameters: dict,
+                  seed: int) -> str:
+        """
+        The content hash of a point: the functions, the generator's arguments, all the model parameters and the seed
+        """
+        generator_arguments, params = Sweep.split(parameters=parameters)
+        content = json.dumps({"generator": Sweep.function_name(function=self.sim_generator_function),
+                              "extraction": Sweep.function_name(function=self.sim_info_extraction_function),
+                              "arguments": generator_arguments,
+                              "model": params._asdict(),
+                              "seed": seed,
+                              "stop_early": self.stop_early},
+                             sort_keys=True,
+                             default=ResultStore.to_json)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def function_name(function) -> str:
+        return "{}.{}".format(function.__module__, function.__qualname__)
+
+    def get_keys(self) -> list:
+        return [self.point_key(parameters=parameters, seed=seed) for parameters, seed in self.points]
+
+    def values(self,
+               store: ResultStore,
+               parameters: dict) -> list:
+        """
+        The stored results of all the seeds of the given point
+        """
+        return [store.get(key=key) for (point_parameters, _), key in zip(self.points, self.get_keys())
+                if point_parameters == parameters and key in store]
+
+    def table(self,
+              store: ResultStore,
+              row: str,
+              column: str,
+              statistic=np.mean) -> tuple:
+        """
+        A (rows, columns) matrix of the statistic of the stored results of each pair of values of two parameters
+        (over the seeds and any other parameter), NaN for pairs with no results yet.
+        Return the row values, the column values and the matrix
+        """
+        row_values = list(dict.fromkeys(parameters[row] for parameters, _ in self.points))
+        column_values = list(dict.fromkeys(parameters[column] for parameters, _ in self.points))
+        groups = {}
+        for (parameters, _), key in zip(self.points, self.get_keys()):
+            if key in store:
+                groups.setdefault((parameters[row], parameters[column]), []).append(store.get(key=key))
+        matrix = np.full((len(row_values), len(column_values)), np.nan)
+        for (row_value, column_value), values in groups.items():
+            matrix[row_values.index(row_value), column_values.index(column_value)] = statistic(values)
+        return row_values, column_values, matrix
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<Sweep: {} points of {}>".format(len(self.points),
+                                                 Sweep.function_name(function=self.sim_generator_function))
@@ -1,6 +1,5 @@
 # library imports
 import os
-import gc
 import json
 import numpy as np
 import pandas as pd
@@ -8,6 +7,7 @@ import pandas as pd
 # project imports
 from plotter import Plotter
 from epidemiological_simulator.sim import Simulator
+from epidemiological_simulator.sweep import Sweep, ResultStore
 from epidemiological_simulator.sim_generator import SimulatorGenerator
 
 
@@ -109,29 +109,21 @@ class TestEpiDynamics:
         samples_count = 10
         repeat_count = 5
         max_edges = node_count * node_count
-        # gather data
-        r_zeros_means = np.zeros((samples_count-1, samples_count-1), dtype=float)
-        r_zeros_stds = np.zeros((samples_count-1, samples_count-1), dtype=float)
-        for i, social_edges in enumerate(range(round(max_edges/samples_count), round(max_edges), round(max_edges/samples_count))):
-            for j, epi_edges in enumerate(range(round(max_edges/samples_count), round(max_edges), round(max_edges/samples_count))):
-                print("Working on {}X{} ({}X{})".format(social_edges, epi_edges, i, j))
-                answers = []
-                for repeat_index in range(repeat_count):
-                    print("Repeat #{}/{} ({:.2f})".format(repeat_index+1, repeat_count, (1+repeat_index)*100/repeat_count))
-                    sim = SimulatorGenerator.simple_random(node_count=node_count,
-                                                           epi_edge_count=epi_edges,
-                                                           socio_edge_count=social_edges,
-                                                           max_time=max_time)
-                    sim.run(stop_early=True)
-                    answers.append(sim.mean_r_zero())
-                    # free memory each time
-                    del sim
-                    gc.collect()
-                r_zeros_means[i][j] = np.mean(answers)
-                r_zeros_stds[i][j] = np.std(answers)
-        # save raw data
-        with open(os.path.join(TestEpiDynamics.RESULTS_FOLDER, "raw_r_zeros_results.json"), "w") as results_file:
-            json.dump({"means": r_zeros_means.tolist(), "stds": r_zeros_stds.tolist()}, results_file)
+        edge_counts = list(range(round(max_edges/samples_count), round(max_edges), round(max_edges/samples_count)))
+        sweep = Sweep.grid(sim_generator_function=SimulatorGenerator.simple_random,
+                           sim_info_extraction_function=Simulator.mean_r_zero,
+                           parameters={"socio_edge_count": edge_counts,
+                                       "epi_edge_count": edge_counts},
+                           seeds=list(range(repeat_count)),
+                           fixed={"node_count": node_count,
+                                  "max_time": max_time},
+                           stop_early=True)
+        # gather data - finished points are kept in the store, so a rerun (or a larger grid) only runs the missing ones
+        store = ResultStore(path=os.path.join(TestEpiDynamics.RESULTS_FOLDER, "r_zeros_sweep"))
+        sweep.run(store=store,
+                  on_result=TestEpiDynamics.save_r_zeros_results)
+        r_zeros_means, r_zeros_stds = TestEpiDynamics.save_r_zeros_results(sweep=sweep,
+                                                                           store=store)
         # plot heatmaps
         Plotter.sensitivity_heatmap(data=pd.DataFrame(data=r_zeros_means,
                                                       index=[round(1/samples_count*(i+1), 2) for i in range(samples_count-1)],
@@ -146,6 +138,26 @@ class TestEpiDynamics:
                                     ylabel="Epidemiological edges portion",
                                     save_path=os.path.join(TestEpiDynamics.RESULTS_FOLDER, "r_zeros_stds.png"))
 
+    @staticmethod
+    def save_r_zeros_results(sweep: Sweep,
+                             store: ResultStore) -> tuple:
+        """
+        Save the raw data of the R0 heatmaps of the points done so far (NaN for the cells with no results yet)
+        """
+        r_zeros_means = sweep.table(store=store,
+                                    row="socio_edge_count",
+                                    column="epi_edge_count",
+                                    statistic=np.mean)[2]
+        r_zeros_stds = sweep.table(store=store,
+                                   row="socio_edge_count",
+                                   column="epi_edge_count",
+                                   statistic=np.std)[2]
+        results_path = os.path.join(TestEpiDynamics.RESULTS_FOLDER, "raw_r_zeros_results.json")
+        with open(results_path + ".tmp", "w") as results_file:
+            json.dump({"means": r_zeros_means.tolist(), "stds": r_zeros_stds.tolist()}, results_file)
+        os.replace(results_path + ".tmp", results_path)
+        return r_zeros_means, r_zeros_stds
+
     @staticmethod
     def io_prepare():
         """
@@ -0,0 +1,225 @@
+# library imports
+import numpy as np
+
+# project imports
+
+
+class BlockTopology:
+    """
+    An implicit layer of the graph: the nodes are split into blocks and a node meets every (other, alive) node of the
+    blocks linked to its own block. Answers the same queries as an AdjacencyIndex in O(n) memory, without listing
+    the edges. A complete graph is a single block linked to itself, a complete bipartite graph is two blocks linked
+    to each other
+    """
+
+    # CONSTS #
+    # the arrays that hold the whole state of the topology
+    STATE_FIELDS = ["blocks", "links", "members", "block_starts", "sizes", "position", "alive"]
+    # END - CONSTS #
+
+    def __init__(self,
+                 blocks: np.ndarray,
+                 links: np.ndarray):
+        # the block of each node and whether the nodes of block a meet the nodes of block b
+        self.blocks = np.asarray(blocks, dtype=np.int64)
+        self.links = np.asarray(links, dtype=np.bool_)
+        block_count = self.links.shape[0]
+        if self.links.shape != (block_count, block_count):
+            raise ValueError("BlockTopology: links must be a square matrix")
+        if self.blocks.size > 0 and (self.blocks.min() < 0 or self.blocks.max() >= block_count):
+            raise ValueError("BlockTopology: blocks must be in [0, {})".format(block_count))
+        # the nodes grouped by block, the alive nodes of block b are members[block_starts[b]:block_starts[b] + sizes[b]]
+        self.members = np.argsort(self.blocks, kind="stable")
+        self.block_starts = np.zeros(block_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.blocks, minlength=block_count), out=self.block_starts[1:])
+        self.sizes = np.diff(self.block_starts)
+        self.position = np.empty(self.blocks.shape[0], dtype=np.int64)
+        self.position[self.members] = np.arange(self.blocks.shape[0])
+        self.alive = np.ones(self.blocks.shape[0], dtype=np.bool_)
+        self._degrees = None
+        self._reverse = None
+
+    @staticmethod
+    def from_state(arrays: dict):
+        """
+        Rebuild a topology from its STATE_FIELDS arrays (e.g., loaded from a snapshot)
+        """
+        answer = BlockTopology.__new__(BlockTopology)
+        for field in BlockTopology.STATE_FIELDS:
+            setattr(answer, field, arrays[field])
+        answer._degrees = None
+        answer._reverse = None
+        return answer
+
+    @staticmethod
+    def complete(node_count: int):
+        """
+        Everyone meets everyone
+        """
+        return BlockTopology(blocks=np.zeros(node_count, dtype=np.int64),
+                             links=np.ones((1, 1), dtype=np.bool_))
+
+    @staticmethod
+    def complete_bipartite(left_count: int,
+                           right_count: int):
+        """
+        The first left_count nodes meet all the other right_count nodes, and only them
+        """
+        return BlockTopology(blocks=np.repeat([0, 1], [left_count, right_count]),
+                             links=np.array([[False, True], [True, False]]))
+
+    @property
+    def degrees(self) -> np.ndarray:
+        if self._degrees is None:
+            # the number of alive nodes in the linked blocks, without the node itself
+            block_degrees = self.links.astype(np.int64) @ self.sizes - np.diag(self.links)
+            self._degrees = np.where(self.alive, block_degrees[self.blocks], 0).astype(np.int32)
+        return self._degrees
+
+    def get_size(self) -> int:
+        return self.blocks.shape[0]
+
+    def get_edge_count(self) -> int:
+        return int(self.degrees.sum())
+
+    def get_tombstones_count(self) -> int:
+        return 0
+
+    def neighbors(self,
+                  id: int) -> np.ndarray:
+        """
+        The out-neighbors of a node, listed on demand in O(degree)
+        """
+        if not self.alive[id]:
+            return np.zeros(0, dtype=np.int64)
+        answer = np.concatenate([self.members[self.block_starts[block]:self.block_starts[block] + self.sizes[block]]
+                                 for block in np.flatnonzero(self.links[self.blocks[id]])] + [np.zeros(0, dtype=np.int64)])
+        return answer[answer != id]
+
+    def neighbor_mask(self,
+                      ids: np.ndarray) -> np.ndarray:
+        """
+        A (len(ids), n) mask of the out-neighbors of each of the given nodes
+        """
+        mask = self.links[self.blocks[ids]][:, self.blocks] & self.alive & self.alive[ids][:, None]
+        mask[np.arange(len(ids)), ids] = False
+        return mask
+
+    def sample_neighbors(self,
+                         ids: np.ndarray,
+                         uniforms: np.ndarray) -> tuple:
+        """
+        Pick one out-neighbor for each of the given nodes using the given U(0, 1) samples.
+        Return the picked ids and a mask of the nodes that have any neighbor at all (the others pick themselves)
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        degrees = self.degrees[ids]
+        has_neighbors = degrees > 0
+        picked = ids.copy()
+        sources = ids[has_neighbors]
+        rows = np.arange(sources.shape[0])
+        own = self.blocks[sources]
+        # the k-th neighbor, counting the linked blocks in order and skipping the node itself
+        k = (uniforms[has_neighbors] * degrees[has_neighbors]).astype(np.int64)
+        counts = self.links[own] * self.sizes
+        counts[rows, own] -= self.links[own, own]
+        cumulative = np.cumsum(counts, axis=1)
+        block = (cumulative <= k[:, None]).sum(axis=1)
+        offset = k - (cumulative[rows, block] - counts[rows, block])
+        in_own = block == own
+        offset[in_own] += offset[in_own] >= self.position[sources[in_own]] - self.block_starts[own[in_own]]
+        picked[has_neighbors] = self.members[self.block_starts[block] + offset]
+        return picked, has_neighbors
+
+    def neighbor_sum(self,
+                     values: np.ndarray) -> np.ndarray:
+        """
+        The sum of the values of the out-neighbors of each node, in O(n): the sums of the linked blocks minus
+        the node's own value
+        """
+        values = np.asarray(values, dtype=np.float64)
+        block_sums = np.stack([values[self.members[self.block_starts[block]:self.block_starts[block] + self.sizes[block]]].sum(axis=0)
+                               for block in range(self.links.shape[0])])
+        self_values = values * np.diag(self.links)[self.blocks].reshape((-1,) + (1,) * (values.ndim - 1))
+        answer = np.tensordot(self.links.astype(np.float64), block_sums, axes=1)[self.blocks] - self_values
+        answer[~self.alive] = 0
+        return answer
+
+    def live_edges(self) -> tuple:
+        """
+        The (sources, targets) arrays of all the edges - O(n^2), for the places that need an explicit edge list
+        """
+        sources = []
+        targets = []
+        for a, b in zip(*np.nonzero(self.links)):
+            a_members = self.members[self.block_starts[a]:self.block_starts[a] + self.sizes[a]]
+            b_members = self.members[self.block_starts[b]:self.block_starts[b] + self.sizes[b]]
+            sources.append(np.repeat(a_members, b_members.shape[0]))
+            targets.append(np.tile(b_members, a_members.shape[0]))
+        sources = np.concatenate(sources + [np.zeros(0, dtype=np.int64)])
+        targets = np.concatenate(targets + [np.zeros(0, dtype=np.int64)])
+        no_loops = sources != targets
+        return sources[no_loops], targets[no_loops]
+
+    def get_reverse(self):
+        """
+        The topology of the in-neighbors of each node
+        """
+        if self._reverse is None:
+            if (self.links == self.links.T).all():
+                return self
+            self._reverse = BlockTopology(blocks=self.blocks,
+                                          links=self.links.T)
+            [self._reverse.remove_node(id=id) for id in np.flatnonzero(~self.alive)]
+        return self._reverse
+
+    def add_nodes(self,
+                  count: int):
+        """
+        Append nodes without edges, as a new block that is not linked to any block
+        """
+        size = self.get_size()
+        block_count = self.links.shape[0]
+        links = np.zeros((block_count + 1, block_count + 1), dtype=np.bool_)
+        links[:block_count, :block_count] = self.links
+        self.links = links
+        self.blocks = np.append(self.blocks, np.full(count, block_count, dtype=np.int64))
+        self.members = np.append(self.members, np.arange(size, size + count))
+        self.block_starts = np.append(self.block_starts, size + count)
+        self.sizes = np.append(self.sizes, count)
+        self.position = np.append(self.position, np.arange(size, size + count))
+        self.alive = np.append(self.alive, np.ones(count, dtype=np.bool_))
+        self._degrees = None
+        if self._reverse is not None:
+            self._reverse.add_nodes(count=count)
+
+    def remove_node(self,
+                    id: int):
+        """
+        Remove a node in O(1): swap it with the last alive member of its block and shrink the block
+        """
+        if not self.alive[id]:
+            return
+        block = self.blocks[id]
+        last = self.block_starts[block] + self.sizes[block] - 1
+        position = self.position[id]
+        other = self.members[last]
+        self.members[position], self.members[last] = other, id
+        self.position[other], self.position[id] = position, last
+        self.sizes[block] -= 1
+        self.alive[id] = False
+        self._degrees = None
+        if self._reverse is not None:
+            self._reverse.remove_node(id=id)
+
+    def compact(self,
+                force: bool = False):
+        pass
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<BlockTopology: V={}, blocks={}, E={}>".format(self.get_size(),
+                                                               self.links.shape[0],
+                                                               self.get_edge_count())
@@ -0,0 +1,77 @@
+# library imports
+import numpy as np
+
+# project imports
+
+
+class Trajectory:
+    """
+    A day-by-day record of the simulator (e.g., the epidemiological states' counts) that can end with a lazily
+    repeated tail: a steady state adds one row and a count instead of a copy of the row per day.
+    It reads like a list of rows (len, indexing, iteration and NumPy arrays), a row of the tail is a copy of it
+    """
+
+    def __init__(self,
+                 rows: list = None):
+        self.rows = list(rows) if rows is not None else []
+        self.tail = None
+        self.tail_length = 0
+
+    def append(self,
+               row):
+        self.materialize()
+        self.rows.append(row)
+
+    def repeat(self,
+               row,
+               count: int):
+        """
+        Add count copies of the row, without making them
+        """
+        if count <= 0:
+            return
+        self.materialize()
+        self.tail = row
+        self.tail_length = count
+
+    def materialize(self):
+        """
+        Make the copies of the tail's row
+        """
+        if self.tail_length > 0:
+            self.rows.extend(self.tail.copy() for _ in range(self.tail_length))
+        self.tail = None
+        self.tail_length = 0
+
+    def __len__(self):
+        return len(self.rows) + self.tail_length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Trajectory: index out of range")
+        if index < len(self.rows):
+            return self.rows[index]
+        return self.tail.copy()
+
+    def __iter__(self):
+        yield from self.rows
+        for _ in range(self.tail_length):
+            yield self.tail.copy()
+
+    def __array__(self, dtype=None, copy=None):
+        head = np.asarray(self.rows, dtype=dtype)
+        if self.tail_length == 0:
+            return head
+        tail = np.repeat(np.asarray(self.tail, dtype=dtype)[None], self.tail_length, axis=0)
+        return tail if len(self.rows) == 0 else np.concatenate((head, tail))
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return "<Trajectory: {} days ({} repeated)>".format(len(self),
+                                                          self.tail_length)
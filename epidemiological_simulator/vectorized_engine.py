@@ -0,0 +1,440 @@
+# library imports
+import numpy as np
+
+# project imports
+from epidemiological_simulator.graph import Graph
+from epidemiological_simulator.engine import Engine
+from epidemiological_simulator.params import SimulationParameters
+from epidemiological_simulator.population import Population
+from epidemiological_simulator.topology import BlockTopology
+from epidemiological_simulator.adjacency import AdjacencyIndex
+from epidemiological_simulator.broadcasters import Broadcasters
+from epidemiological_simulator.math_utils import cosine_similarity_matrix, cosine_similarity_rows
+from epidemiological_simulator.vaccine_reduction import vaccine_reduction_array
+from epidemiological_simulator.epidemiological_state import EpidemiologicalState
+
+
+class VectorizedEngine(Engine):
+    """
+    Compute the day's transitions of all the agents at once with array operations over the population store.
+    All the agents see the states of the beginning of the day (a synchronous update)
+    """
+
+    # CONSTS #
+    NAME = "vectorized"
+    # the number of pairs computed at once in the social step of implicit topologies
+    DENSE_BLOCK_ELEMENTS = 2 ** 22
+    # the number of edges computed at once in the social step of CSR indexes
+    SPARSE_BLOCK_EDGES = 2 ** 20
+    # with a tolerance, the social step of CSR indexes recomputes only the agents around the ones whose ideas moved by
+    # more than it (see active_social), None recomputes all the agents every day
+    SOCIAL_TOLERANCE = None
+    # END - CONSTS #
+
+    def __init__(self):
+        Engine.__init__(self)
+        self.social_tolerance = VectorizedEngine.SOCIAL_TOLERANCE
+        # the active set: the ideas and the social degrees at the beginning of the last social step, and the
+        # (population, index, parameters, broadcasters' targets) they belong to
+        self.previous_ideas = None
+        self.previous_degrees = None
+        self.social_source = None
+
+    def epidemiological(self,
+                        sim) -> list:
+        population = sim.graph.population
+        rng = sim.rng
+        params = sim.params
+        # clock tic
+        real = population.real_mask()
+        population.timer[real] += 1
+        # the states at the beginning of the day
+        e_state = population.e_state.copy()
+        timer = population.timer
+
+        # S -> E (or another vaccine dose)
+        s_ids = np.flatnonzero(real & (e_state == EpidemiologicalState.S))
+        infected, vaccinate = self.infection(population=population,
+                                             e_state=e_state,
+                                             s_ids=s_ids,
+                                             picked=sim.graph.get_epi_index().sample_neighbors(ids=s_ids,
+                                                                                               uniforms=rng.random(s_ids.size))[0],
+                                             infect_chance=rng.random(s_ids.size),
+                                             params=params)
+        VectorizedEngine.set_e_state(population=population,
+                                     ids=s_ids[infected],
+                                     new_e_state=EpidemiologicalState.E)
+        if sim.recorder is not None:
+            # each susceptible agent reads the neighbor it picked
+            Engine.count_work(sim=sim,
+                              phase="epidemiological",
+                              agents=np.count_nonzero(real),
+                              edges=s_ids.size)
+        vaccinate_ids = s_ids[vaccinate]
+        population.vaccine_count[vaccinate_ids] += 1
+        population.last_vaccinated_time[vaccinate_ids] = timer[vaccinate_ids]
+
+        # E -> Is / Ia
+        e_ids = np.flatnonzero(real & (e_state == EpidemiologicalState.E) & (timer >= params.phi))
+        to_is = rng.random(e_ids.size) < params.eta
+        VectorizedEngine.set_e_state(population=population,
+                                     ids=e_ids[to_is],
+                                     new_e_state=EpidemiologicalState.Is)
+        VectorizedEngine.set_e_state(population=population,
+                                     ids=e_ids[~to_is],
+                                     new_e_state=EpidemiologicalState.Ia)
+
+        # Ia -> Rf
+        VectorizedEngine.set_e_state(population=population,
+                                     ids=np.flatnonzero(real & (e_state == EpidemiologicalState.Ia) & (timer >= params.gamma_a)),
+                                     new_e_state=EpidemiologicalState.Rf)
+
+        # Is -> D / Rp / Rf
+        is_ids = np.flatnonzero(real & (e_state == EpidemiologicalState.Is) & (timer >= params.gamma_s))
+        chance = rng.random(is_ids.size)
+        to_d = (params.psi_2 < chance) & (chance <= params.psi_3)
+        to_rp = (params.psi_1 < chance) & (chance <= params.psi_2)
+        VectorizedEngine.set_e_state(population=population,
+                                     ids=is_ids[to_d],
+                                     new_e_state=EpidemiologicalState.D)
+        VectorizedEngine.set_e_state(population=population,
+                                     ids=is_ids[to_rp],
+                                     new_e_state=EpidemiologicalState.Rp)
+        VectorizedEngine.set_e_state(population=population,
+                                     ids=is_ids[~to_d & ~to_rp],
+                                     new_e_state=EpidemiologicalState.Rf)
+
+        # Rf / Rp -> S
+        VectorizedEngine.set_e_state(population=population,
+                                     ids=np.flatnonzero(real & (((e_state == EpidemiologicalState.Rf) & (timer >= params.chi_f)) |
+                                                                ((e_state == EpidemiologicalState.Rp) & (timer >= params.chi_p)))),
+                                     new_e_state=EpidemiologicalState.S)
+        return is_ids[to_d].tolist()
+
+    def social(self,
+               sim):
+        topology = sim.graph.get_socio_index()
+        if isinstance(topology, AdjacencyIndex) and self.social_tolerance is not None:
+            return self.active_social(sim=sim)
+        if isinstance(topology, AdjacencyIndex):
+            if sim.recorder is not None:
+                Engine.count_work(sim=sim,
+                                  phase="social",
+                                  agents=np.count_nonzero(sim.graph.population.real_mask()),
+                                  edges=topology.get_edge_count() + Engine.broadcast_pairs_count(sim=sim))
+            return VectorizedEngine.sparse_social(population=sim.graph.population,
+                                                  index=sim.graph.socio_personality(personality_reject=sim.params.personality_reject),
+                                                  params=sim.params,
+                                                  broadcasters=sim.graph.broadcasters,
+                                                  alive=sim.graph.alive)
+        if not isinstance(topology, BlockTopology):
+            return Engine.social(self, sim=sim)
+        if sim.recorder is not None:
+            # all the pairs of the updated agents are scanned
+            agents = np.count_nonzero(sim.graph.population.real_mask() & (topology.degrees > 0))
+            Engine.count_work(sim=sim,
+                              phase="social",
+                              agents=agents,
+                              edges=agents * topology.get_size() + Engine.broadcast_pairs_count(sim=sim))
+        VectorizedEngine.dense_social(population=sim.graph.population,
+                                      topology=topology,
+                                      params=sim.params,
+                                      broadcasters=sim.graph.broadcasters,
+                                      alive=sim.graph.alive)
+
+    def active_social(self,
+                      sim):
+        """
+        The social step of the agents whose new ideas can differ from their current ones by more than the tolerance:
+        the agents whose own or neighbors' ideas moved by more than it since the last step, or whose neighbors changed
+        (e.g., one of them died). The other agents are converged and keep their ideas, so with a tolerance of 0 this is
+        the same as the full step
+        """
+        population = sim.graph.population
+        index = sim.graph.socio_personality(personality_reject=sim.params.personality_reject)
+        ids = None
+        if self.is_active_set_valid(sim=sim):
+            moved = self.moved_ids(population=population)
+            active = index.degrees != self.previous_degrees
+            active[moved] = True
+            active[index.get_reverse().gather_neighbors(ids=moved)] = True
+            ids = np.flatnonzero(active)
+        self.previous_ideas = population.ideas.copy()
+        self.previous_degrees = index.degrees.copy()
+        self.social_source = (population, index, sim.params, VectorizedEngine.broadcast_targets(sim=sim))
+        if sim.recorder is not None:
+            Engine.count_work(sim=sim,
+                              phase="social",
+                              agents=ids.shape[0] if ids is not None else np.count_nonzero(population.real_mask()),
+                              edges=(index.degrees[ids].sum() if ids is not None else index.get_edge_count()) +
+                              Engine.broadcast_pairs_count(sim=sim))
+        VectorizedEngine.sparse_social(population=population,
+                                       index=index,
+                                       params=sim.params,
+                                       ids=ids,
+                                       broadcasters=sim.graph.broadcasters,
+                                       alive=sim.graph.alive)
+
+    def is_social_converged(self,
+                            sim) -> bool:
+        """
+        With the active set, the social step is converged once it recomputed no agent and nothing changed since
+        """
+        if self.social_tolerance is None or not self.is_active_set_valid(sim=sim):
+            return False
+        return self.moved_ids(population=sim.graph.population).shape[0] == 0 and \
+            np.array_equal(sim.graph.get_socio_index().degrees, self.previous_degrees)
+
+    def is_active_set_valid(self,
+                            sim) -> bool:
+        """
+        The active set is kept for the same population, social index, parameters and broadcasters only
+        """
+        return self.social_source is not None and self.social_source[0] is sim.graph.population and \
+            self.social_source[1] is sim.graph.get_socio_index() and self.social_source[2] is sim.params and \
+            self.social_source[3] is VectorizedEngine.broadcast_targets(sim=sim) and \
+            self.previous_ideas.shape == sim.graph.population.ideas.shape
+
+    @staticmethod
+    def broadcast_targets(sim):
+        """
+        The targets array of the graph's broadcasters, replaced by each added broadcaster (None without broadcasters)
+        """
+        return sim.graph.broadcasters.targets if sim.graph.broadcasters is not None else None
+
+    def moved_ids(self,
+                  population: Population) -> np.ndarray:
+        """
+        The agents whose ideas moved by more than the tolerance since the beginning of the last social step (an agent
+        whose ideas became NaN moved, one that stayed NaN did not)
+        """
+        ideas = population.ideas
+        with np.errstate(invalid="ignore"):
+            still = (np.abs(ideas - self.previous_ideas) <= self.social_tolerance) | (np.isnan(ideas) & np.isnan(self.previous_ideas))
+        return np.flatnonzero(~still.all(axis=1))
+
+    @staticmethod
+    def sparse_social(population: Population,
+                      index: AdjacencyIndex,
+                      params: SimulationParameters,
+                      ids: np.ndarray = None,
+                      broadcasters: Broadcasters = None,
+                      alive: np.ndarray = None):
+        """
+        The social step over a CSR index, edge-wise: the idea similarities of all the (agent, neighbor) edges are
+        computed at once (in blocks of edges), and each agent's influence and weighted sum of its neighbors' ideas are
+        segment sums of its edges. The personality similarities are the index's cached edge columns
+        (see Graph.socio_personality). With ids, only these agents are updated. The broadcasters' influence on their
+        live targets (alive, see Graph.alive) is added to the sums
+        """
+        ideas = population.ideas
+        size = population.get_size()
+        real = population.real_mask()
+        if ids is None:
+            slots = index.live_slots()
+            sources = np.repeat(np.arange(size, dtype=np.int32), index.degrees)
+            mask = real
+        else:
+            slots = index.row_slots(ids=ids)
+            sources = np.repeat(ids, index.degrees[ids])
+            mask = np.zeros(size, dtype=np.bool_)
+            mask[ids] = True
+            mask &= real
+        targets = index.targets[slots]
+        similarities = index.edge_columns[Graph.PERSONALITY_SIMILARITY][slots]
+        sides = index.edge_columns[Graph.PERSONALITY_SIDE][slots]
+        total_influence = np.zeros(size, dtype=np.float64)
+        score = np.zeros((size, Population.IDEAS_SIZE), dtype=np.float64)
+        for start in range(0, sources.shape[0], VectorizedEngine.SPARSE_BLOCK_EDGES):
+            block_sources = sources[start:start + VectorizedEngine.SPARSE_BLOCK_EDGES]
+            block_targets = targets[start:start + VectorizedEngine.SPARSE_BLOCK_EDGES]
+            target_ideas = ideas[block_targets]
+            personality_similarity = similarities[start:start + VectorizedEngine.SPARSE_BLOCK_EDGES]
+            sign = VectorizedEngine.influence_sign_by_side(idea_similarity=1 - cosine_similarity_rows(ideas[block_sources], target_ideas),
+                                                           personality_side=sides[start:start + VectorizedEngine.SPARSE_BLOCK_EDGES],
+                                                           params=params)
+            # ignored neighbors add nothing, even if their ideas are NaN
+            weights = np.where(sign[:, None] != 0, (sign * personality_similarity)[:, None] * target_ideas, 0)
+            total_influence += np.bincount(block_sources,
+                                           weights=np.where(sign != 0, personality_similarity, 0),
+                                           minlength=size)
+            for k in range(Population.IDEAS_SIZE):
+                score[:, k] += np.bincount(block_sources,
+                                           weights=weights[:, k],
+                                           minlength=size)
+        updated = mask & (index.degrees > 0)
+        if broadcasters is not None:
+            broadcast_influence, broadcast_score, reached = VectorizedEngine.broadcast_influence(population=population,
+                                                                                                 broadcasters=broadcasters,
+                                                                                                 alive=alive,
+                                                                                                 params=params,
+                                                                                                 mask=mask)
+            total_influence += broadcast_influence
+            score += broadcast_score
+            updated |= reached
+        new_ideas = ideas.copy()
+        # no influence at all gives NaN ideas, as in the per-agent logic
+        with np.errstate(divide="ignore", invalid="ignore"):
+            new_ideas[updated] = ideas[updated] + params.lamda * score[updated] / total_influence[updated, None]
+        population.ideas[mask] = np.clip(new_ideas[mask], 0, 1)
+        population.update_pips_from_ideas(mask=mask)
+
+    @staticmethod
+    def dense_social(population: Population,
+                     topology: BlockTopology,
+                     params: SimulationParameters,
+                     broadcasters: Broadcasters = None,
+                     alive: np.ndarray = None):
+        """
+        The social step over an implicit topology, in blocks of agents against all the agents.
+        The influence of a neighbor depends on the pair (its similarity of ideas and personality), so unlike a plain
+        neighbor sum it has no closed form - this keeps the O(n^2) work but needs only O(n) memory.
+        The broadcasters' influence on their live targets is added to the sums
+        """
+        ideas = population.ideas
+        personality = population.personality_vector
+        real = population.real_mask()
+        new_ideas = ideas.copy()
+        # agents with NaN ideas are ignored by everyone (their sign is 0), keep them out of the products
+        known_ideas = np.where(np.isnan(ideas), 0, ideas)
+        updated = real & (topology.degrees > 0)
+        broadcast_influence = np.zeros(population.get_size(), dtype=np.float64)
+        broadcast_score = np.zeros((population.get_size(), Population.IDEAS_SIZE), dtype=np.float64)
+        if broadcasters is not None:
+            broadcast_influence, broadcast_score, reached = VectorizedEngine.broadcast_influence(population=population,
+                                                                                                 broadcasters=broadcasters,
+                                                                                                 alive=alive,
+                                                                                                 params=params,
+                                                                                                 mask=real)
+            updated |= reached
+        rows = np.flatnonzero(updated)
+        block_size = max(1, VectorizedEngine.DENSE_BLOCK_ELEMENTS // max(1, population.get_size()))
+        for start in range(0, rows.shape[0], block_size):
+            ids = rows[start:start + block_size]
+            linked = topology.neighbor_mask(ids=ids)
+            personality_similarity = cosine_similarity_matrix(personality[ids], personality)
+            sign = VectorizedEngine.influence_sign(idea_similarity=1 - cosine_similarity_matrix(ideas[ids], ideas),
+                                                   personality_similarity=personality_similarity,
+                                                   params=params)
+            sign[~linked] = 0
+            total_influence = np.where(sign != 0, personality_similarity, 0).sum(axis=1) + broadcast_influence[ids]
+            score = (sign * personality_similarity) @ known_ideas + broadcast_score[ids]
+            # no influence at all gives NaN ideas, as in the per-agent logic
+            with np.errstate(divide="ignore", invalid="ignore"):
+                new_ideas[ids] = ideas[ids] + params.lamda * score / total_influence[:, None]
+        population.ideas[real] = np.clip(new_ideas[real], 0, 1)
+        population.update_pips_from_ideas(mask=real)
+
+    @staticmethod
+    def broadcast_influence(population: Population,
+                            broadcasters: Broadcasters,
+                            alive: np.ndarray,
+                            params: SimulationParameters,
+                            mask: np.ndarray) -> tuple:
+        """
+        The influence and the weighted sum of ideas the broadcasters add to each of the masked agents, and the mask of
+        the agents they reach, in one pass over the (broadcaster, target) pairs (in blocks of pairs).
+        A broadcaster has a full personality similarity to everyone, so only the ideas decide its sign
+        """
+        size = population.get_size()
+        ideas = population.ideas
+        sources, targets = broadcasters.pairs()
+        keep = mask[targets] & alive[targets]
+        sources = sources[keep]
+        targets = targets[keep]
+        total_influence = np.zeros(size, dtype=np.float64)
+        score = np.zeros((size, Population.IDEAS_SIZE), dtype=np.float64)
+        for start in range(0, targets.shape[0], VectorizedEngine.SPARSE_BLOCK_EDGES):
+            block_targets = targets[start:start + VectorizedEngine.SPARSE_BLOCK_EDGES]
+            broadcast_ideas = broadcasters.ideas[sources[start:start + VectorizedEngine.SPARSE_BLOCK_EDGES]]
+            sign = VectorizedEngine.influence_sign_by_side(idea_similarity=1 - cosine_similarity_rows(ideas[block_targets], broadcast_ideas),
+                                                           personality_side=np.sign(params.personality_reject),
+                                                           params=params)
+            total_influence += np.bincount(block_targets,
+                                           weights=sign != 0,
+                                           minlength=size)
+            for k in range(Population.IDEAS_SIZE):
+                score[:, k] += np.bincount(block_targets,
+                                           weights=sign * broadcast_ideas[:, k],
+                                           minlength=size)
+        return total_influence, score, np.bincount(targets, minlength=size) > 0
+
+    @staticmethod
+    def influence_sign(idea_similarity: np.ndarray,
+                       personality_similarity: np.ndarray,
+                       params: SimulationParameters) -> np.ndarray:
+        """
+        +1 when a neighbor pulls the agent's ideas towards its own, -1 when it pushes them away and 0 when it is ignored.
+        If people are too different, the ideas of one person is causing negative reaction
+        """
+        personality_similarity_reject = 1 - personality_similarity
+        close_ideas = idea_similarity < params.ideas_reject
+        far_ideas = idea_similarity > params.ideas_reject
+        close_personality = personality_similarity_reject < params.personality_reject
+        far_personality = personality_similarity_reject > params.personality_reject
+        return np.where(close_ideas & close_personality, 1.0, 0.0) - \
+            np.where((close_ideas & far_personality) | (far_ideas & close_personality), 1.0, 0.0)
+
+    @staticmethod
+    def influence_sign_by_side(idea_similarity: np.ndarray,
+                               personality_side: np.ndarray,
+                               params: SimulationParameters) -> np.ndarray:
+        """
+        influence_sign given the side of the personality reject threshold of each pair (1 close enough, -1 too far,
+        0 on it), as cached by Graph.socio_personality
+        """
+        close_ideas = idea_similarity < params.ideas_reject
+        far_ideas = idea_similarity > params.ideas_reject
+        return np.where(close_ideas & (personality_side > 0), 1.0, 0.0) - \
+            np.where((close_ideas & (personality_side < 0)) | (far_ideas & (personality_side > 0)), 1.0, 0.0)
+
+    @staticmethod
+    def infection(population: Population,
+                  e_state: np.ndarray,
+                  s_ids: np.ndarray,
+                  picked: np.ndarray,
+                  infect_chance: np.ndarray,
+                  params: SimulationParameters) -> tuple:
+        """
+        Decide which of the susceptible agents are infected by the neighbor they picked and which of the others take
+        another vaccine dose. Agents with no neighbors picked themselves, as in the per-agent logic
+        """
+        # ACTIVATE PIPS #
+        # Masks PIP
+        agent_mask = population.wearing_mask[s_ids]
+        picked_mask = population.wearing_mask[picked]
+        infect_chance = infect_chance * np.where(agent_mask & picked_mask,
+                                                 params.mask_si_reduce_factor,
+                                                 np.where(agent_mask,
+                                                          params.mask_s_reduce_factor,
+                                                          np.where(picked_mask,
+                                                                   params.mask_i_reduce_factor,
+                                                                   1)))
+        # social distance PIP
+        infect_chance *= np.where(population.social_distance[s_ids] | population.social_distance[picked],
+                                  params.social_distance_reduce_factor,
+                                  1)
+        # vaccination PIP
+        timer = population.timer[s_ids]
+        last_vaccinated_time = population.last_vaccinated_time[s_ids]
+        infect_chance *= vaccine_reduction_array(vaccine_count=population.vaccine_count[s_ids],
+                                                 time_since_vaccine=timer - last_vaccinated_time)
+        # END - ACTIVATE PIPS #
+
+        picked_state = e_state[picked]
+        infected = ((picked_state == EpidemiologicalState.Is) | (picked_state == EpidemiologicalState.Ia)) & \
+                   (infect_chance <= float(params.beta))
+        vaccinate = ~infected & population.vaccinated[s_ids] & \
+                    ((timer - last_vaccinated_time > params.vaccinate_delta_time) | (last_vaccinated_time == 0))
+        return infected, vaccinate
+
+    @staticmethod
+    def set_e_state(population: Population,
+                    ids: np.ndarray,
+                    new_e_state: EpidemiologicalState):
+        """
+        Move the given agents to a new state, reset their timers and record the change
+        """
+        population.e_state[ids] = new_e_state
+        population.timer[ids] = 0
+        population.e_state_counts[ids, int(new_e_state)] += 1
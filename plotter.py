@@ -69,9 +69,9 @@ class Plotter:
         """
         Plot the graph's social and epidemiological connectivity
         """
-        plt.hist([len(graph.next_nodes_epi(id=node.id)) for node in graph.nodes], bins_count, density=False,
+        plt.hist(graph.epi_degrees(), bins_count, density=False,
                  facecolor='r', alpha=0.5, label="Epidemiological")
-        plt.hist([len(graph.next_nodes_socio(id=node.id)) for node in graph.nodes], bins_count, density=False,
+        plt.hist(graph.socio_degrees(), bins_count, density=False,
                  facecolor='b', alpha=0.5, label="Social")
         plt.xlabel('Connections')
         plt.ylabel('Count')
@@ -0,0 +1,48 @@
+# library imports
+import random
+import pytest
+import numpy as np
+
+# project imports
+from pips.pip import PIP
+from epidemiological_simulator.graph import Graph
+from epidemiological_simulator.sim import Simulator
+from epidemiological_simulator.step_recorder import StepRecorder
+
+
+def run_simulator(seed: int,
+                  social_tolerance: float) -> Simulator:
+    """
+    A small random simulator on the vectorized engine, long enough for most of the ideas to converge
+    """
+    random.seed(seed)
+    graph = Graph.generate_random(node_count=300,
+                                  epi_edge_count=1200,
+                                  socio_edge_count=600,
+                                  rng=np.random.default_rng(seed))
+    sim = Simulator(graph=graph,
+                    pip=PIP(),
+                    max_time=150,
+                    engine="vectorized",
+                    seed=1000 + seed)
+    sim.engine.social_tolerance = social_tolerance
+    sim.recorder = StepRecorder()
+    sim.run(fast_forward=False)
+    return sim
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_active_set_with_no_tolerance_matches_the_full_step(seed: int):
+    """
+    With a tolerance of 0 the active set skips only agents whose ideas cannot change, so the run is the same as with
+    the full social step while it recomputes fewer agents
+    """
+    Simulator.DEBUG = False
+    full = run_simulator(seed=seed,
+                         social_tolerance=None)
+    active = run_simulator(seed=seed,
+                           social_tolerance=0.0)
+    for name in ["epi_dist", "ideas_dist_mean", "ideas_dist_std"]:
+        assert np.array_equal(np.asarray(getattr(active, name)), np.asarray(getattr(full, name)), equal_nan=True)
+    assert np.array_equal(active.graph.population.ideas, full.graph.population.ideas, equal_nan=True)
+    assert active.recorder.totals()["social.agents"] < full.recorder.totals()["social.agents"]
@@ -0,0 +1,29 @@
+# library imports
+import random
+import pytest
+import numpy as np
+
+# project imports
+from epidemiological_simulator.sim import Simulator
+from epidemiological_simulator.sim_generator import SimulatorGenerator
+from tests.test_social_step import social_ideas
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+@pytest.mark.filterwarnings("ignore:invalid value:RuntimeWarning")
+def test_broadcasters_match_across_engines(seed: int):
+    """
+    The broadcasters' influence is the same in the per-agent logic and in the vectorized and numba social steps
+    """
+    Simulator.DEBUG = False
+    random.seed(seed)
+    base = SimulatorGenerator.anti_vaccine_broadcast(node_count=200,
+                                                     anti_virtual_nodes=20,
+                                                     max_time=30)
+    python = social_ideas(base=base,
+                          engine="python")
+    for engine in ["vectorized", "numba"]:
+        ideas = social_ideas(base=base,
+                             engine=engine)
+        assert np.array_equal(np.isnan(python), np.isnan(ideas))
+        assert np.allclose(python, ideas, rtol=0, atol=1e-12, equal_nan=True)
@@ -0,0 +1,47 @@
+# library imports
+import random
+import numpy as np
+
+# project imports
+from pips.pip import PIP
+from epidemiological_simulator.graph import Graph
+from epidemiological_simulator.sim import Simulator
+from epidemiological_simulator.params import SimulationParameters
+
+
+def make_simulator(engine: str) -> Simulator:
+    """
+    A small random simulator with masks, vaccines and spread timers, so all the transitions happen in a short run
+    """
+    random.seed(1)
+    graph = Graph.generate_random(node_count=500,
+                                  epi_edge_count=4000,
+                                  socio_edge_count=0,
+                                  rng=np.random.default_rng(1))
+    graph.population.vaccinated[::7] = True
+    graph.population.wearing_mask[::5] = True
+    graph.population.timer[:] = np.random.default_rng(5).integers(0, 20, graph.get_size())
+    return Simulator(graph=graph,
+                     pip=PIP(),
+                     max_time=60,
+                     engine=engine,
+                     seed=3,
+                     params=SimulationParameters.default().replace(beta=0.3,
+                                                                   chi_f=12,
+                                                                   chi_p=9,
+                                                                   psi_2=0.9))
+
+
+def test_events_engine_matches_vectorized_engine():
+    """
+    The events engine touches only the due and susceptible agents, with the same draws as the vectorized engine
+    """
+    Simulator.DEBUG = False
+    vectorized = make_simulator(engine="vectorized")
+    vectorized.run(fast_forward=False)
+    events = make_simulator(engine="events")
+    events.run(fast_forward=False)
+    assert np.array_equal(np.asarray(vectorized.epi_dist), np.asarray(events.epi_dist))
+    for column in ["e_state", "timer", "vaccine_count", "last_vaccinated_time", "e_state_counts"]:
+        assert np.array_equal(getattr(vectorized.graph.population, column), getattr(events.graph.population, column))
+    assert np.array_equal(vectorized.graph.alive, events.graph.alive)
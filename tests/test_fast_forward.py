@@ -0,0 +1,51 @@
+# library imports
+import random
+import pytest
+import numpy as np
+
+# project imports
+from pips.pip import PIP
+from epidemiological_simulator.graph import Graph
+from epidemiological_simulator.sim import Simulator
+
+
+def run_simulator(engine: str,
+                  seed: int,
+                  fast_forward: bool) -> Simulator:
+    """
+    A small random simulator whose epidemic dies out long before max_time
+    """
+    random.seed(seed)
+    graph = Graph.generate_random(node_count=150,
+                                  epi_edge_count=600,
+                                  socio_edge_count=600,
+                                  rng=np.random.default_rng(seed))
+    graph.population.vaccinated[::3] = True
+    graph.population.wearing_mask[::4] = True
+    sim = Simulator(graph=graph,
+                    pip=PIP(),
+                    max_time=300,
+                    engine=engine,
+                    seed=1000 + seed)
+    sim.run(fast_forward=fast_forward)
+    return sim
+
+
+@pytest.mark.parametrize("engine", ["vectorized", "events"])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_fast_forward_keeps_the_trajectories(engine: str,
+                                             seed: int):
+    """
+    Advancing an extinct epidemic in closed form and filling the steady-state days gives the trajectories of a full run
+    """
+    Simulator.DEBUG = False
+    full = run_simulator(engine=engine,
+                         seed=seed,
+                         fast_forward=False)
+    fast = run_simulator(engine=engine,
+                         seed=seed,
+                         fast_forward=True)
+    assert fast.is_extinct()
+    assert fast.step == full.step
+    for name in ["epi_dist", "ideas_dist_mean", "ideas_dist_std"]:
+        assert np.array_equal(np.asarray(getattr(fast, name)), np.asarray(getattr(full, name)), equal_nan=True)
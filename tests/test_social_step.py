@@ -0,0 +1,65 @@
+# library imports
+import copy
+import random
+import pytest
+import numpy as np
+
+# project imports
+from epidemiological_simulator.sim import Simulator
+from epidemiological_simulator.sim_generator import SimulatorGenerator
+
+
+def social_ideas(base: Simulator,
+                 engine: str,
+                 days: int = 6) -> np.ndarray:
+    """
+    The ideas after a few social steps of a copy of the simulator's graph (with a few dead agents) on the engine
+    """
+    sim = Simulator(graph=copy.deepcopy(base.graph),
+                    pip=base.pip,
+                    max_time=base.max_time,
+                    engine=engine,
+                    seed=3)
+    sim.graph.remove_nodes([1, 5, 9])
+    for _ in range(days):
+        sim.social()
+    ideas = sim.graph.population.ideas.copy()
+    sim.close()
+    return ideas
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+@pytest.mark.filterwarnings("ignore:invalid value:RuntimeWarning")
+def test_sparse_social_matches_the_per_agent_logic(seed: int):
+    """
+    The edge-wise social step of CSR graphs gives the ideas of social_single, with the same NaNs
+    """
+    Simulator.DEBUG = False
+    random.seed(seed)
+    base = SimulatorGenerator.anti_vaccine_simple_random(node_count=200,
+                                                         anti_virtual_nodes=10,
+                                                         max_time=30)
+    python = social_ideas(base=base,
+                          engine="python")
+    vectorized = social_ideas(base=base,
+                              engine="vectorized")
+    assert np.array_equal(np.isnan(python), np.isnan(vectorized))
+    assert np.allclose(python, vectorized, rtol=0, atol=1e-12, equal_nan=True)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_social_kernel_matches_sparse_social(seed: int):
+    """
+    The compiled social kernel reads the same cached personality columns as the edge-wise step
+    """
+    Simulator.DEBUG = False
+    random.seed(seed)
+    base = SimulatorGenerator.anti_vaccine_simple_random(node_count=200,
+                                                         anti_virtual_nodes=10,
+                                                         max_time=30)
+    vectorized = social_ideas(base=base,
+                              engine="vectorized")
+    numba = social_ideas(base=base,
+                         engine="numba")
+    assert np.array_equal(np.isnan(numba), np.isnan(vectorized))
+    assert np.allclose(numba, vectorized, rtol=0, atol=1e-12, equal_nan=True)